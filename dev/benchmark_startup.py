@@ -0,0 +1,106 @@
+"""
+Measures import time and resident memory of the production entry point.
+
+    python -m dev.benchmark_startup --max-import-ms 1500 --max-rss-mb 150
+
+Imports `src.__main__` in fresh interpreters (without starting the pipeline), reports the median
+import time, peak RSS and the slowest modules from `python -X importtime`. Exits with a non-zero code
+when a limit is exceeded or when a module which is not needed at runtime gets imported.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_DIRECTORY = Path(__file__).parent.parent
+ENTRY_POINT_MODULE = "src.__main__"
+
+# modules which must never be loaded by the production entry point
+FORBIDDEN_MODULES = (
+    "matplotlib", "PIL", "gi.repository.Gtk", "pandas", "IPython",
+    # optional features are imported by `run_pipeline` only when enabled
+    "http.server", "src.control.server", "src.detectors.cascade", "src.gstreamer.dvr", "src.ipc.publisher",
+)
+
+MEASURE_SCRIPT = f"""
+import json, resource, sys, time
+start = time.perf_counter()
+import {ENTRY_POINT_MODULE}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+
+def measure_once() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE_SCRIPT],
+        cwd=PROJECT_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    # the entry point configures logging to stdout - the measurement is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(count: int) -> list[tuple[int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_POINT_MODULE}"],
+        cwd=PROJECT_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.removeprefix("import time:").split("|")
+        timings.append((int(cumulative), module.rstrip()))
+    return sorted(timings, reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", help="Number of fresh interpreters to measure", type=int, default=5)
+    parser.add_argument("--max-import-ms", help="Fail when the median import time is higher", type=float)
+    parser.add_argument("--max-rss-mb", help="Fail when the peak RSS after import is higher", type=float)
+    parser.add_argument("--top", help="Number of the slowest imports to show", type=int, default=15)
+    args = parser.parse_args()
+
+    measurements = [measure_once() for _ in range(args.runs)]
+    import_ms = statistics.median(measurement["import_seconds"] for measurement in measurements) * 1e3
+    rss_mb = max(measurement["max_rss_kb"] for measurement in measurements) / 1024
+    modules = measurements[0]["modules"]
+
+    print(f"Import of {ENTRY_POINT_MODULE}: median {import_ms:.1f} ms, peak RSS {rss_mb:.1f} MB, {len(modules)} modules")
+    print("Slowest imports (cumulative):")
+    for cumulative_us, module in slowest_imports(args.top):
+        print(f"{cumulative_us / 1e3:>10.1f} ms  {module}")
+
+    failures = []
+    forbidden = [
+        module for module in modules
+        if any(module == name or module.startswith(f"{name}.") for name in FORBIDDEN_MODULES)
+    ]
+    if forbidden:
+        failures.append(f"Modules not needed at runtime were imported: {', '.join(forbidden)}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"Import time {import_ms:.1f} ms exceeds {args.max_import_ms} ms")
+    if args.max_rss_mb is not None and rss_mb > args.max_rss_mb:
+        failures.append(f"Peak RSS {rss_mb:.1f} MB exceeds {args.max_rss_mb} MB")
+
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
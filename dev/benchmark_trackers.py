@@ -0,0 +1,137 @@
+"""
+Benchmarks StreakTracker against ioutrack.Sort on synthetic meteor streaks.
+
+    python -m dev.benchmark_trackers --frames 2000 --clutter 200
+
+Every frame contains a number of clutter detections (twinkling stars, noise) and occasional fast,
+small streaks. Reported are the time per frame and the accuracy of both trackers:
+- streak recall - fraction of streaks reported by at least one track
+- fragmentation - mean number of track ids reported for a single streak
+- false tracks - number of reported track ids which never matched a streak
+"""
+import argparse
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import numpy as np
+from ioutrack import Sort
+
+from src.trackers.streak import StreakTracker
+
+
+@dataclass
+class SyntheticScenario:
+    detections: list[np.ndarray] = field(default_factory=list)
+    # ground truth per frame - rows of [x0, y0, x1, y1, streak_id]
+    truth: list[np.ndarray] = field(default_factory=list)
+    streaks: int = 0
+
+
+def generate_scenario(
+        frames: int,
+        clutter: int,
+        streak_probability: float = 0.02,
+        miss_probability: float = 0.1,
+        width: int = 3840,
+        height: int = 2160,
+        seed: int = 0
+) -> SyntheticScenario:
+    rng = np.random.default_rng(seed)
+    scenario = SyntheticScenario()
+    stars = rng.uniform((0, 0), (width, height), size=(clutter, 2))
+    active_streaks = []
+
+    for _ in range(frames):
+        if rng.random() < streak_probability:
+            angle = rng.uniform(0, 2 * np.pi)
+            speed = rng.uniform(20, 60)
+            active_streaks.append({
+                "id": scenario.streaks,
+                "position": rng.uniform((width / 4, height / 4), (3 * width / 4, 3 * height / 4)),
+                "velocity": speed * np.array([np.cos(angle), np.sin(angle)]),
+                "size": rng.uniform(4, 16, size=2),
+                "frames_left": int(rng.integers(8, 25)),
+            })
+            scenario.streaks += 1
+
+        truth = []
+        for streak in active_streaks:
+            streak["position"] = streak["position"] + streak["velocity"]
+            streak["frames_left"] -= 1
+            x0, y0 = streak["position"] - streak["size"] / 2
+            x1, y1 = streak["position"] + streak["size"] / 2
+            truth.append([x0, y0, x1, y1, streak["id"]])
+        active_streaks = [streak for streak in active_streaks if streak["frames_left"] > 0]
+        truth = np.array(truth, dtype=np.float32).reshape(-1, 5)
+
+        # stars twinkle - every one of them shows up in the motion mask only sometimes
+        visible_stars = stars[rng.random(clutter) < 0.3] + rng.normal(0, 0.5, size=(1, 2))
+        star_boxes = np.concatenate([visible_stars - 2, visible_stars + 2, np.full((len(visible_stars), 1), 16)], axis=1)
+        visible_truth = truth[rng.random(len(truth)) >= miss_probability]
+        streak_boxes = visible_truth.copy()
+        streak_boxes[:, 4] = (streak_boxes[:, 2] - streak_boxes[:, 0]) * (streak_boxes[:, 3] - streak_boxes[:, 1])
+
+        scenario.detections.append(np.concatenate([star_boxes, streak_boxes]).astype(np.float32))
+        scenario.truth.append(truth)
+    return scenario
+
+
+def evaluate(tracker, scenario: SyntheticScenario) -> dict[str, float]:
+    track_to_streaks: dict[int, set[int]] = defaultdict(set)
+    reported_tracks = set()
+    start = time.perf_counter()
+    outputs = [tracker.update(detections, return_all=False) for detections in scenario.detections]
+    elapsed = time.perf_counter() - start
+
+    for output, truth in zip(outputs, scenario.truth):
+        for box in output:
+            track_id = int(box[4])
+            reported_tracks.add(track_id)
+            if len(truth) == 0:
+                continue
+            centre = (box[:2] + box[2:4]) / 2
+            truth_centres = (truth[:, :2] + truth[:, 2:4]) / 2
+            distances = np.linalg.norm(truth_centres - centre, axis=1)
+            closest = int(np.argmin(distances))
+            if distances[closest] < 10:
+                track_to_streaks[track_id].add(int(truth[closest, 4]))
+
+    streak_to_tracks: dict[int, set[int]] = defaultdict(set)
+    for track_id, streak_ids in track_to_streaks.items():
+        for streak_id in streak_ids:
+            streak_to_tracks[streak_id].add(track_id)
+
+    return {
+        "ms per frame": 1e3 * elapsed / len(scenario.detections),
+        "streak recall": len(streak_to_tracks) / max(scenario.streaks, 1),
+        "fragmentation": float(np.mean([len(tracks) for tracks in streak_to_tracks.values()]))
+        if streak_to_tracks else 0.0,
+        "false tracks": len(reported_tracks - set(track_to_streaks)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", help="Number of synthetic frames", type=int, default=2000)
+    parser.add_argument("--clutter", help="Number of twinkling stars in the scene", type=int, default=200)
+    parser.add_argument("--min-hits", help="Minimum number of successive detections of a track", type=int, default=3)
+    parser.add_argument("--max-age", help="Maximum frames without matching detections of a track", type=int, default=5)
+    parser.add_argument("--seed", help="Seed of the synthetic scenario", type=int, default=0)
+    args = parser.parse_args()
+
+    scenario = generate_scenario(frames=args.frames, clutter=args.clutter, seed=args.seed)
+    trackers = {
+        "ioutrack.Sort": Sort(min_hits=args.min_hits, max_age=args.max_age),
+        "StreakTracker": StreakTracker(min_hits=args.min_hits, max_age=args.max_age, min_speed=2.0),
+    }
+
+    print(f"{scenario.streaks} streaks in {args.frames} frames with {args.clutter} stars")
+    print(f"{'tracker':<16}" + "".join(f"{column:>16}" for column in ("ms per frame", "streak recall", "fragmentation", "false tracks")))
+    for name, tracker in trackers.items():
+        results = evaluate(tracker, scenario)
+        print(f"{name:<16}" + "".join(f"{value:>16.3f}" for value in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Builds a GIF or MP4 preview of a folder of frames, a recording or the crops of an event.
+
+    python -m dev.build_preview --video data/videos/recording.mp4 --output data/previews/recording.gif
+    python -m dev.build_preview --crops data/crops/recording-3-date-... --track 7 --output track-7.mp4
+
+Frames are streamed - memory does not depend on the length of the clip.
+"""
+import argparse
+from pathlib import Path
+
+from src.file_operations.crop_store import EventCrops
+from src.file_operations.generators import ImageGenerator, VideoGenerator
+from src.file_operations.previews import build_preview
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--images-dir", help="Directory with frames of a recording", type=Path)
+    source.add_argument("--video", help="Recorded video file", type=Path)
+    source.add_argument("--crops", help="Event directory of the crop store", type=Path)
+    parser.add_argument("--track", help="Only crops of this track (with --crops)", type=int)
+    parser.add_argument("--extension", help="Extension of the frames", type=str, default="png")
+    parser.add_argument("--output", help="Preview file, .gif or .mp4", type=Path, required=True)
+    parser.add_argument("--max-size", help="Longer side of the preview in pixels", type=int, default=480)
+    parser.add_argument("--frame-duration-ms", help="Duration of a preview frame", type=int, default=100)
+    parser.add_argument("--every-nth-frame", help="Keep only every n-th frame", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.video:
+        frames = VideoGenerator(video_path=args.video)
+    elif args.images_dir:
+        frames = ImageGenerator(images_directory=args.images_dir, image_extension=args.extension)
+    elif args.track is not None:
+        _, frames = EventCrops(args.crops).track(args.track)
+    else:
+        frames = EventCrops(args.crops)
+
+    build_preview(
+        frames,
+        args.output,
+        max_size=args.max_size,
+        frame_duration_ms=args.frame_duration_ms,
+        every_nth_frame=args.every_nth_frame
+    )
+    print(f"Preview written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compares the fast box mask modes of `get_mask` with the Gaussian mode on a recorded clip.
+
+    python -m dev.evaluate_mask_modes --images-dir data/images/dim-meteorite-full-res
+    python -m dev.evaluate_mask_modes --video data/videos/recording.mp4 --bbox-th 30
+
+The Gaussian mask and its detections are the reference. Reported per mode:
+- ms per frame - time of `get_mask` alone
+- mask IoU - mean IoU of moving pixels with the reference mask
+- recall - fraction of reference detections overlapped (IoU >= --match-iou) by a detection of the mode
+- precision - fraction of detections of the mode overlapping a reference detection
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Iterable
+
+import cv2
+import numpy as np
+
+from src.detectors.functions import get_contour_detections, get_mask, MaskMode, MaskWorkspace
+from src.file_operations.generators import ImageGenerator, VideoGenerator
+from src.non_max_supression.nms import box_iou_batch, non_max_suppression
+from src.types import NumpyImage
+
+
+def _detections(mask: np.ndarray, bbox_threshold: float, nms_threshold: float) -> np.ndarray:
+    detections = get_contour_detections(mask, bbox_threshold)
+    if len(detections) == 0:
+        return np.zeros((0, 5), dtype=np.float32)
+    return detections[non_max_suppression(detections, iou_threshold=nms_threshold)]
+
+
+def _matched(boxes: np.ndarray, other_boxes: np.ndarray, match_iou: float) -> int:
+    if len(boxes) == 0 or len(other_boxes) == 0:
+        return 0
+    return int((box_iou_batch(boxes[:, :4], other_boxes[:, :4]).max(axis=1) >= match_iou).sum())
+
+
+def evaluate_mask_modes(
+        frames: Iterable[NumpyImage],
+        bbox_threshold: float = 128,
+        nms_threshold: float = 1e-3,
+        match_iou: float = 0.3,
+        scale: float = 1.0
+) -> dict[MaskMode, dict[str, float]]:
+    workspaces = {mode: MaskWorkspace() for mode in MaskMode}
+    seconds = dict.fromkeys(MaskMode, 0.0)
+    mask_iou = dict.fromkeys(MaskMode, 0.0)
+    matched_reference = dict.fromkeys(MaskMode, 0)
+    matched_detections = dict.fromkeys(MaskMode, 0)
+    detections_count = dict.fromkeys(MaskMode, 0)
+    reference_count = 0
+    pairs = 0
+
+    previous_frame = None
+    for frame in frames:
+        if scale != 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if previous_frame is None:
+            previous_frame = frame
+            continue
+
+        masks = {}
+        for mode in MaskMode:
+            start = time.perf_counter()
+            masks[mode] = get_mask(previous_frame, frame, mode=mode, workspace=workspaces[mode])
+            seconds[mode] += time.perf_counter() - start
+        previous_frame = frame
+        pairs += 1
+
+        reference_mask = masks[MaskMode.GAUSSIAN] > 0
+        reference = _detections(masks[MaskMode.GAUSSIAN], bbox_threshold, nms_threshold)
+        reference_count += len(reference)
+        for mode, mask in masks.items():
+            moving = mask > 0
+            union = np.count_nonzero(moving | reference_mask)
+            mask_iou[mode] += np.count_nonzero(moving & reference_mask) / union if union else 1.0
+            detections = _detections(mask, bbox_threshold, nms_threshold)
+            detections_count[mode] += len(detections)
+            matched_reference[mode] += _matched(reference, detections, match_iou)
+            matched_detections[mode] += _matched(detections, reference, match_iou)
+
+    return {
+        mode: {
+            "ms per frame": 1e3 * seconds[mode] / max(pairs, 1),
+            "mask IoU": float(mask_iou[mode]) / max(pairs, 1),
+            "recall": matched_reference[mode] / reference_count if reference_count else 1.0,
+            "precision": matched_detections[mode] / detections_count[mode] if detections_count[mode] else 1.0,
+        }
+        for mode in MaskMode
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--images-dir", help="Directory with frames of a recording", type=str)
+    source.add_argument("--video", help="Recorded video file", type=str)
+    parser.add_argument("--extension", help="Extension of the frames", type=str, default="png")
+    parser.add_argument("--bbox-th", help="Bounding Box area threshold in pixels", type=int, default=128)
+    parser.add_argument("--nms-th", help="Non-Maximum Suppression threshold (IOU threshold)", type=float, default=1e-3)
+    parser.add_argument("--match-iou", help="IoU of boxes counted as the same detection", type=float, default=0.3)
+    parser.add_argument("--scale", help="Resize factor of the frames, as --scale of FrameDiffDetector", type=float,
+                        default=1.0)
+    args = parser.parse_args()
+
+    if args.video:
+        frames = VideoGenerator(video_path=Path(args.video))
+    else:
+        frames = ImageGenerator(images_directory=Path(args.images_dir), image_extension=args.extension)
+
+    results = evaluate_mask_modes(
+        frames,
+        bbox_threshold=args.bbox_th * args.scale ** 2,
+        nms_threshold=args.nms_th,
+        match_iou=args.match_iou,
+        scale=args.scale
+    )
+
+    print(f"{'mode':<18}" + "".join(f"{column:>14}" for column in ("ms per frame", "mask IoU", "recall", "precision")))
+    for mode, values in results.items():
+        print(f"{mode.value:<18}" + "".join(f"{value:>14.3f}" for value in values.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,104 @@
+"""
+Profiles the detection chain on a replay of recorded frames.
+
+    python -m dev.profile_functions --images-dir data/images/dim-meteorite-full-res --mode sampling
+
+Profiling a running pipeline is done with `python -m src --profile-dir <dir>` and `kill -USR1 <pid>`,
+both write the same per-stage `.pstats`/`.collapsed` files and `timings.txt` percentile report.
+"""
+import argparse
+import logging
+import signal
+import sys
 from pathlib import Path
-from pstats import Stats, SortKey
-from cProfile import Profile
 
-import cv2
-import numpy as np
-from PIL import Image
+from ioutrack import Sort
+
+from src.detectors.frame_diff import FrameDiffDetector
+from src.file_operations.generators import ImageGenerator
+from src.inference.inference import FrameDiffInference
+from src.metrics.camera import CameraMetrics
+from src.metrics.registry import MetricsRegistry
+from src.profiling.profiler import FrameProfiler, ProfilerMode
 
-from src.file_operations.images import draw_tracks_numpy
-from src.detectors.functions import get_detections
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger()
 
 PROJECT_DIRECTORY = Path(__file__).parent.parent
 DATA_DIRECTORY = PROJECT_DIRECTORY / "data"
 IMAGES_DIRECTORY = DATA_DIRECTORY / "images"
+PROFILES_DIRECTORY = DATA_DIRECTORY / "profiles"
 
 
-def profile_detections(frame1_bgr, frame2_bgr) -> None:
-    with Profile() as profile:
-        get_detections(
-            cv2.cvtColor(frame1_bgr, cv2.COLOR_BGR2GRAY),
-            cv2.cvtColor(frame2_bgr, cv2.COLOR_BGR2GRAY),
-            bbox_thresh=128,
-            nms_thresh=1e-3,
-            mask_kernel=np.array((16, 16), dtype=np.uint8))
-        (
-            Stats(profile)
-            .strip_dirs()
-            .sort_stats(SortKey.CALLS)
-            .print_stats()
-        )
+def profile_replay(
+        images_directory: Path,
+        output_directory: Path,
+        image_extension: str = "png",
+        frames: int | None = None,
+        mode: ProfilerMode = ProfilerMode.CPROFILE,
+        on_signal: bool = False,
+        bbox_threshold: int = 128,
+        nms_threshold: float = 1e-3,
+        tracker_min_hits: int = 3,
+        tracker_max_age: int = 5
+) -> None:
+    images = ImageGenerator(images_directory=images_directory, image_extension=image_extension)
+    profiler = FrameProfiler(
+        output_directory=output_directory,
+        mode=mode,
+        default_frames=frames or len(images)
+    )
+    inference_engine = FrameDiffInference(
+        detector=FrameDiffDetector(bbox_threshold=bbox_threshold, nms_threshold=nms_threshold),
+        tracker=Sort(min_hits=tracker_min_hits, max_age=tracker_max_age),
+        metrics=CameraMetrics(camera_id="replay", registry=MetricsRegistry(), profiler=profiler)
+    )
 
+    if on_signal:
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.arm())
+        logger.info(f"Replaying {len(images)} frames, send SIGUSR1 to profile the next {profiler.default_frames}")
+    else:
+        profiler.arm()
 
-if __name__ == '__main__':
-    video_name = "dim-meteorite-full-res"
+    for frame in images:
+        with profiler.frame():
+            inference_engine.update(frame)
+
+    profiler.wait_for_reports()
 
-    images_directory = IMAGES_DIRECTORY / video_name
 
-    first_image_path = images_directory / "011.png"
-    second_image_path = images_directory / "012.png"
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images-dir", help="Directory with frames of a recording", type=str, required=True)
+    parser.add_argument("--extension", help="Extension of the frames", type=str, default="png")
+    parser.add_argument("--output-dir", help="Directory to write profiles to", type=str, default=str(PROFILES_DIRECTORY))
+    parser.add_argument("--frames", help="Number of frames to profile (all by default)", type=int)
+    parser.add_argument(
+        "--mode",
+        help="Profiler to use",
+        choices=[mode.value for mode in ProfilerMode],
+        default=ProfilerMode.CPROFILE.value
+    )
+    parser.add_argument("--on-signal", help="Start profiling on SIGUSR1 instead of immediately", action="store_true")
+    parser.add_argument("--bbox-th", help="Bounding Box area threshold in pixels", type=int, default=128)
+    parser.add_argument("--nms-th", help="Non-Maximum Suppression threshold (IOU threshold)", type=float, default=1e-3)
+    parser.add_argument("--min-hits", help="Minimum number of successive detections of a track", type=int, default=3)
+    parser.add_argument("--max-age", help="Maximum frames without matching detections of a track", type=int, default=5)
+    args = parser.parse_args()
 
-    first_image = cv2.imread(str(first_image_path))
-    second_image = cv2.imread(str(second_image_path))
+    profile_replay(
+        images_directory=Path(args.images_dir),
+        output_directory=Path(args.output_dir),
+        image_extension=args.extension,
+        frames=args.frames,
+        mode=ProfilerMode(args.mode),
+        on_signal=args.on_signal,
+        bbox_threshold=args.bbox_th,
+        nms_threshold=args.nms_th,
+        tracker_min_hits=args.min_hits,
+        tracker_max_age=args.max_age
+    )
 
-    # detections = get_detections(
-    #     cv2.cvtColor(first_image, cv2.COLOR_BGR2GRAY),
-    #     cv2.cvtColor(second_image, cv2.COLOR_BGR2GRAY),
-    #     bbox_thresh=128,
-    #     nms_thresh=1e-3,
-    #     mask_kernel=np.array((16, 16), dtype=np.uint8))
-    #
-    # draw_tracks_numpy(first_image, detections)
-    #
-    # im = Image.fromarray(first_image)
-    # im.save("your_file.jpeg")
 
-    profile_detections(first_image, second_image)
+if __name__ == '__main__':
+    main()
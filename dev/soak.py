@@ -0,0 +1,279 @@
+"""
+Soak test of the detection pipeline with per-stage memory accounting.
+
+    python -m dev.soak --hours 6 --meteor-interval 60 --warmup-minutes 20 --output soak.json
+
+Drives `TrackerPipeline` (with the detector, tracker, recording and preview writer of production)
+from a synthetic local sky instead of a camera - frames are encoded and packetised like an RTSP stream
+and pushed as fast as the pipeline consumes them, so hours of video run in a fraction of the time.
+A meteor crosses the sky every `--meteor-interval` seconds of video and triggers a recording.
+
+RSS and tracemalloc snapshots attributed to the detector, tracker, recording and writer stages are sampled
+during the run, together with the sink-queue pre-roll level, the decoder backlog and the number of appsink
+callbacks. Exits with a non-zero code when memory grows faster than the limits (per hour of video) after
+the warm-up or a bounded structure exceeds its limit, and lists the allocation sites which grew the most.
+"""
+import argparse
+import dataclasses
+import json
+import logging
+import tempfile
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.__main__ import build_detector, build_tracker
+from src.detectors.functions import MaskMode
+from src.detectors.projection import ProjectionMode
+from src.gstreamer.detector_controller import DetectorController
+from src.gstreamer.pipeline import initialize_gstreamer, TrackerPipeline
+from src.inference.inference import FrameDiffInference
+from src.metrics.camera import CameraMetrics
+from src.profiling.memory import MemoryMonitor
+
+import gi
+
+gi.require_version('Gst', '1.0')
+gi.require_version('GLib', '2.0')
+
+from gi.repository import GLib, Gst
+
+logger = logging.getLogger(__name__)
+
+MEGABYTE = 1024 ** 2
+
+
+@dataclasses.dataclass
+class SyntheticSky:
+    """ Static starry sky crossed by a meteor every `meteor_interval_seconds` of video """
+    width: int = 640
+    height: int = 360
+    fps: int = 25
+    meteor_interval_seconds: float = 60.0
+    meteor_frames: int = 20
+    seed: int = 0
+
+    _background: np.ndarray = dataclasses.field(init=False)
+
+    def __post_init__(self):
+        rng = np.random.default_rng(self.seed)
+        gray = np.full((self.height, self.width), 12, dtype=np.uint8)
+        stars = rng.integers(0, (self.height, self.width), size=(150, 2))
+        gray[stars[:, 0], stars[:, 1]] = rng.integers(80, 255, size=len(stars), dtype=np.uint8)
+        self._background = cv2.cvtColor(cv2.GaussianBlur(gray, (3, 3), 0), cv2.COLOR_GRAY2BGR)
+
+    @property
+    def frame_duration(self) -> int:
+        return Gst.SECOND // self.fps
+
+    def frame(self, index: int) -> np.ndarray:
+        frame = self._background.copy()
+        meteor_index = index % round(self.meteor_interval_seconds * self.fps)
+        if meteor_index < self.meteor_frames:
+            x = self.width // 8 + meteor_index * self.width // (self.meteor_frames + 8)
+            y = self.height // 6 + meteor_index * self.height // (self.meteor_frames + 8)
+            cv2.line(frame, (x, y), (x + 30, y + 15), (230, 230, 230), 3)
+        return frame
+
+
+class SyntheticSourcePipeline(TrackerPipeline):
+    """ Pipeline reading H.264 RTP packets of a `SyntheticSky` instead of a camera """
+
+    def __init__(self, sky: SyntheticSky, total_frames: int, *args, **kwargs):
+        self._sky = sky
+        self._total_frames = total_frames
+        self._appsrc = None
+        self._feeder: threading.Thread | None = None
+        self._stop_feeding = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def _create_source(self) -> Gst.Element:
+        # named like the rtspsrc, so that its errors are handled as errors of the camera stream
+        source = Gst.Bin.new("rtsp-source")
+        self._appsrc = Gst.ElementFactory.make("appsrc", "synthetic-sky")
+        videoconvert = Gst.ElementFactory.make("videoconvert", "synthetic-convert")
+        encoder = Gst.ElementFactory.make("x264enc", "synthetic-encoder")
+        payloader = Gst.ElementFactory.make("rtph264pay", "synthetic-payloader")
+        assert self._appsrc and videoconvert and encoder and payloader
+
+        self._appsrc.set_property("caps", Gst.Caps.from_string(
+            f"video/x-raw, format=BGR, width={self._sky.width}, height={self._sky.height}, "
+            f"framerate={self._sky.fps}/1"
+        ))
+        self._appsrc.set_property("format", Gst.Format.TIME)
+        self._appsrc.set_property("is-live", False)
+        # push-buffer blocks while a few frames are queued - the pipeline sets the pace
+        self._appsrc.set_property("block", True)
+        self._appsrc.set_property("max-bytes", 4 * self._sky.width * self._sky.height * 3)
+        Gst.util_set_object_arg(encoder, "speed-preset", "ultrafast")
+        Gst.util_set_object_arg(encoder, "tune", "zerolatency")
+        encoder.set_property("key-int-max", 2 * self._sky.fps)
+        payloader.set_property("config-interval", -1)
+
+        for element in (self._appsrc, videoconvert, encoder, payloader):
+            source.add(element)
+        assert self._appsrc.link(videoconvert)
+        assert videoconvert.link(encoder)
+        assert encoder.link(payloader)
+        source.add_pad(Gst.GhostPad.new("src", payloader.get_static_pad("src")))
+        return source
+
+    def initialize_pipeline(self) -> None:
+        super().initialize_pipeline()
+        # the source has a static pad - there is no pad-added signal to link it from
+        assert self._rtsp_source.link(self._rtp_queue)
+        # a synchronised fake sink would hold the whole file branch back to real time
+        self._fake_sink.set_property("sync", False)
+
+    def start_feeding(self) -> None:
+        self._feeder = threading.Thread(target=self._feed, name="synthetic-sky", daemon=True)
+        self._feeder.start()
+
+    def stop_feeding(self) -> None:
+        self._stop_feeding.set()
+
+    def _feed(self) -> None:
+        for index in range(self._total_frames):
+            if self._stop_feeding.is_set():
+                break
+            buffer = Gst.Buffer.new_wrapped(self._sky.frame(index).tobytes())
+            buffer.pts = index * self._sky.frame_duration
+            buffer.duration = self._sky.frame_duration
+            if self._appsrc.emit("push-buffer", buffer) != Gst.FlowReturn.OK:
+                logger.warning(f"Synthetic sky stopped after {index} frames")
+                break
+        self._appsrc.emit("end-of-stream")
+
+    def gauges(self, controller: DetectorController) -> dict[str, float]:
+        return {
+            "sink_queue_buffers": self._sink_queue.get_property("current-level-buffers"),
+            "decoder_backlog_frames": self.frames_entering_inference - controller.inference_frame_num,
+            "new_sample_callbacks": len(self._new_sample_callbacks),
+            "recordings": len(list(self._recordings_directory.glob("recording-*.mp4"))),
+        }
+
+
+def run_soak(args: argparse.Namespace, data_dir: Path) -> bool:
+    initialize_gstreamer()
+    main_loop = GLib.MainLoop()
+
+    sky = SyntheticSky(fps=args.fps, meteor_interval_seconds=args.meteor_interval)
+    metrics = CameraMetrics(camera_id="soak")
+    pipeline = SyntheticSourcePipeline(
+        sky,
+        round(args.hours * 3600 * args.fps),
+        camera_id="soak",
+        rtsp_url="synthetic://sky",
+        recordings_directory=data_dir,
+        recording_buffer=int(args.recording_buffer * Gst.SECOND),
+        metrics=metrics
+    )
+    detector = build_detector(
+        bbox_threshold=args.bbox_th,
+        nms_threshold=1e-3,
+        mask_mode=MaskMode.GAUSSIAN,
+        stack_window=None,
+        stack_projection=ProjectionMode.MAX,
+        stack_scale=0.5
+    )
+    controller = DetectorController(
+        inference_engine=FrameDiffInference(
+            detector=detector,
+            tracker=build_tracker(args.tracker, min_hits=3, max_age=5),
+            metrics=metrics
+        ),
+        pipeline=pipeline,
+        image_output_directory=data_dir,
+        metrics=metrics
+    )
+    pipeline.add_callback_probe(controller.switch_on_record_manager_callback)
+    pipeline.add_app_sink_new_sample_callback(controller.update_with_frame)
+
+    monitor = MemoryMonitor(
+        warmup_seconds=args.warmup_minutes * 60,
+        max_rss_growth_per_hour=args.max_rss_growth_mb * MEGABYTE,
+        max_stage_growth_per_hour=args.max_stage_growth_mb * MEGABYTE,
+        gauge_limits={
+            # the pre-roll plus a group of pictures, whatever the speed
+            "sink_queue_buffers": (args.recording_buffer + 2) * args.fps * 2,
+            "new_sample_callbacks": 1,
+        },
+        top_sites=args.top
+    )
+
+    def sample() -> bool:
+        running_time = pipeline.last_frame_running_time
+        memory_sample = monitor.sample(
+            elapsed_seconds=0.0 if running_time is None else running_time / Gst.SECOND,
+            gauges=pipeline.gauges(controller)
+        )
+        logger.info(
+            f"{memory_sample.elapsed_seconds / 3600:.2f} h of video: RSS {memory_sample.rss_bytes / MEGABYTE:.1f} MB, "
+            + ", ".join(f"{stage} {size / MEGABYTE:.2f} MB" for stage, size in memory_sample.stage_bytes.items())
+            + ", " + ", ".join(f"{gauge} {value:g}" for gauge, value in memory_sample.gauges.items())
+        )
+        return True
+
+    monitor.start()
+    GLib.timeout_add_seconds(args.sample_seconds, sample)
+    pipeline.start_pipeline(main_loop)
+    pipeline.start_feeding()
+    try:
+        # quits on the EOS of the synthetic sky
+        main_loop.run()
+    finally:
+        pipeline.stop_feeding()
+        pipeline.terminate()
+        controller.close()
+        monitor.stop()
+
+    report = monitor.report()
+    print(report.format())
+    if args.output is not None:
+        args.output.write_text(json.dumps(dataclasses.asdict(report), indent=2))
+    return report.passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", help="Hours of video to run through the pipeline", type=float, default=4.0)
+    parser.add_argument("--fps", help="Frame rate of the synthetic sky", type=int, default=25)
+    parser.add_argument("--meteor-interval", help="Seconds of video between meteors", type=float, default=60.0)
+    parser.add_argument("--recording-buffer", help="Pre- and post-roll of recordings in seconds", type=float,
+                        default=3.0)
+    parser.add_argument("--bbox-th", help="Bounding Box area threshold in pixels", type=int, default=64)
+    parser.add_argument("--tracker", help="Tracker of detections", choices=["sort", "streak"], default="sort")
+    parser.add_argument("--warmup-minutes", help="Minutes of video ignored by the checks", type=float, default=20.0)
+    parser.add_argument("--sample-seconds", help="Wall-clock seconds between samples", type=int, default=15)
+    parser.add_argument(
+        "--max-rss-growth-mb",
+        help="Fail when RSS grows faster (MB per hour of video) after the warm-up",
+        type=float,
+        default=32.0
+    )
+    parser.add_argument(
+        "--max-stage-growth-mb",
+        help="Fail when memory traced in a stage grows faster (MB per hour of video) after the warm-up",
+        type=float,
+        default=8.0
+    )
+    parser.add_argument("--top", help="Number of the most growing allocation sites to show", type=int, default=10)
+    parser.add_argument("--data-dir", help="Directory for recordings and previews (temporary when not set)",
+                        type=Path)
+    parser.add_argument("--output", help="Write the samples and the report as JSON", type=Path)
+    args = parser.parse_args()
+
+    # the pipeline logs every recording decision at the debug level
+    logging.getLogger().setLevel(logging.INFO)
+    if args.data_dir is not None:
+        passed = run_soak(args, args.data_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="meteor-soak-") as data_dir:
+            passed = run_soak(args, Path(data_dir))
+    raise SystemExit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Sweeps the parameters of the frame difference detection chain over labelled clips.
+
+    python -m dev.sweep_parameters --clip data/videos/meteor.mp4 --clip data/images/dim-meteorite-full-res \
+        --bbox-th 32 64 128 256 --nms-th 1e-3 0.1 --kernel default 3x3 9x9 --mask-mode gaussian box --scale 1 0.5
+
+Labels of a clip are read from `<video>.labels.csv` (or `labels.csv` inside a directory of frames),
+one box per row: `frame,x0,y0,x1,y1` in full resolution, `frame` is the index of the later frame of a pair.
+Clips without labels only report the number of detections.
+
+Every intermediate of the chain (grayscale frame, difference, blurred difference, thresholded mask,
+closed mask per kernel, contour boxes) is computed once and shared by all combinations which depend on it,
+through an LRU cache bounded by --cache-mb in every worker process. Changing the box area threshold or
+the NMS threshold therefore only re-runs the cheap filtering at the end of the chain.
+Clips are split into chunks of frames processed by a pool of --workers processes.
+
+Reported per combination:
+- recall - fraction of labelled boxes overlapped (IoU >= --match-iou) by a detection
+- FP per frame - detections not overlapping any label per frame pair
+- frames/s - frame pairs per second of a single process running only this combination,
+  summed from the measured cost of every stage it depends on
+"""
+import argparse
+import csv
+import itertools
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Hashable
+
+import cv2
+import numpy as np
+
+from src.detectors.functions import (
+    blur_difference,
+    close_mask,
+    get_contour_detections,
+    MaskMode,
+    threshold_blurred_difference
+)
+from src.file_operations.images import get_image_paths
+from src.non_max_supression.nms import box_iou_batch, non_max_suppression
+
+# the kernel used by `get_detections` unless another one is given
+DEFAULT_KERNEL = "default"
+
+
+@dataclass(frozen=True)
+class Clip:
+    path: Path
+    labels_path: Path | None = None
+    image_extension: str = "png"
+
+    @classmethod
+    def from_path(cls, path: Path, image_extension: str = "png") -> "Clip":
+        labels_path = path / "labels.csv" if path.is_dir() else path.with_name(f"{path.name}.labels.csv")
+        return cls(path, labels_path if labels_path.exists() else None, image_extension)
+
+    def frame_count(self) -> int:
+        if self.path.is_dir():
+            return len(get_image_paths(images_dir=self.path, image_extension=self.image_extension))
+        capture = cv2.VideoCapture(str(self.path))
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+        return frame_count
+
+    def read_frames(self, start: int, stop: int) -> list[np.ndarray]:
+        if self.path.is_dir():
+            image_paths = get_image_paths(images_dir=self.path, image_extension=self.image_extension)
+            return [cv2.imread(str(image_path)) for image_path in image_paths[start:stop]]
+        capture = cv2.VideoCapture(str(self.path))
+        try:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+            frames = []
+            for _ in range(start, stop):
+                success, frame = capture.read()
+                if not success:
+                    break
+                frames.append(frame)
+            return frames
+        finally:
+            capture.release()
+
+    def read_labels(self) -> dict[int, np.ndarray] | None:
+        if self.labels_path is None:
+            return None
+        boxes = defaultdict(list)
+        with self.labels_path.open() as file:
+            for row in csv.DictReader(file):
+                boxes[int(row["frame"])].append([float(row[name]) for name in ("x0", "y0", "x1", "y1")])
+        return {frame: np.array(frame_boxes, dtype=np.float32) for frame, frame_boxes in boxes.items()}
+
+
+@dataclass(frozen=True)
+class SweepParameters:
+    scale: float
+    mask_mode: MaskMode
+    kernel: str
+    bbox_threshold: float
+    nms_threshold: float
+
+
+@dataclass
+class SweepCounts:
+    pairs: int = 0
+    labels: int = 0
+    matched_labels: int = 0
+    detections: int = 0
+    false_positives: int = 0
+    # cost of all stages a combination depends on, whether they were computed for it or taken from the cache
+    seconds: float = 0.0
+    # only clips with labels count towards the recall
+    labelled_pairs: int = 0
+
+    def add(self, other: "SweepCounts") -> None:
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    @property
+    def recall(self) -> float:
+        return self.matched_labels / self.labels if self.labels else float("nan")
+
+    @property
+    def false_positives_per_frame(self) -> float:
+        return self.false_positives / self.labelled_pairs if self.labelled_pairs else float("nan")
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.pairs / self.seconds if self.seconds else float("inf")
+
+
+@dataclass
+class LruCache:
+    """ Least recently used intermediates, evicted once their total size exceeds `max_bytes` """
+    max_bytes: int
+    hits: int = field(init=False, default=0)
+    misses: int = field(init=False, default=0)
+    evictions: int = field(init=False, default=0)
+    size_bytes: int = field(init=False, default=0)
+    # key -> (value, seconds it took to compute, size in bytes)
+    _entries: OrderedDict = field(init=False, default_factory=OrderedDict)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> tuple[Any, float]:
+        """ Returns the value and the time it took to compute it """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+        self.misses += 1
+        start = time.perf_counter()
+        value = compute()
+        seconds = time.perf_counter() - start
+
+        size = _size_bytes(value)
+        if size <= self.max_bytes:
+            self._entries[key] = (value, seconds, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+        return value, seconds
+
+
+def _size_bytes(value: Any) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return 64
+
+
+def parse_kernel(kernel: str) -> np.ndarray:
+    if kernel == DEFAULT_KERNEL:
+        return np.array((9, 9), dtype=np.uint8)
+    width, height = (int(size) for size in kernel.lower().split("x"))
+    return np.ones((height, width), dtype=np.uint8)
+
+
+def _frame_pair_stages(
+        cache: LruCache,
+        clip: Clip,
+        frames: dict[int, np.ndarray],
+        frame_index: int,
+        parameters: SweepParameters
+) -> tuple[np.ndarray, float]:
+    """ Contour boxes (of any area) of a frame pair and the summed cost of all stages they depend on """
+    seconds = 0.0
+    scale, mode = parameters.scale, parameters.mask_mode
+
+    def stage(key: tuple, compute: Callable[[], Any]) -> Any:
+        nonlocal seconds
+        value, stage_seconds = cache.get_or_compute((clip.path, frame_index, scale) + key, compute)
+        seconds += stage_seconds
+        return value
+
+    def grayscale(index: int) -> Callable[[], np.ndarray]:
+        def compute() -> np.ndarray:
+            frame = frames[index]
+            if scale != 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return compute
+
+    # grayscale of a frame is shared by two pairs, only the later frame is counted for this pair
+    previous_gray, _ = cache.get_or_compute(
+        (clip.path, frame_index - 1, scale, "gray"), grayscale(frame_index - 1)
+    )
+    gray = stage(("gray",), grayscale(frame_index))
+    difference = stage(("difference",), lambda: cv2.subtract(gray, previous_gray))
+    # the Gaussian and the box mode blur the difference in the same way
+    blurred = mode != MaskMode.BOX_SINGLE_BLUR
+    blurred_difference = stage(("blurred", blurred), lambda: blur_difference(difference, mode))
+    mask = stage(("threshold", mode), lambda: threshold_blurred_difference(blurred_difference, mode))
+    closed_mask = stage(
+        ("closed", mode, parameters.kernel),
+        lambda: close_mask(mask, parse_kernel(parameters.kernel))
+    )
+    boxes = stage(
+        ("contours", mode, parameters.kernel),
+        lambda: get_contour_detections(closed_mask, thresh=0).reshape(-1, 5).astype(np.float32)
+    )
+    return boxes, seconds
+
+
+def _filter_boxes(boxes: np.ndarray, parameters: SweepParameters) -> np.ndarray:
+    """ Box area threshold and NMS of `get_mask_detections`, boxes are returned in full resolution """
+    detections = boxes[boxes[:, 4] > parameters.bbox_threshold * parameters.scale ** 2]
+    if len(detections) > 0:
+        detections = detections[non_max_suppression(detections, iou_threshold=parameters.nms_threshold)]
+    return detections[:, :4] / parameters.scale
+
+
+def _count(detections: np.ndarray, labels: np.ndarray | None, match_iou: float) -> SweepCounts:
+    counts = SweepCounts(pairs=1, detections=len(detections))
+    if labels is None:
+        return counts
+    counts.labelled_pairs = 1
+    counts.labels = len(labels)
+    if len(labels) == 0 or len(detections) == 0:
+        counts.false_positives = len(detections)
+        return counts
+    overlaps = box_iou_batch(labels, detections) >= match_iou
+    counts.matched_labels = int(overlaps.any(axis=1).sum())
+    counts.false_positives = int((~overlaps.any(axis=0)).sum())
+    return counts
+
+
+_worker_cache: LruCache | None = None
+
+
+def _initialize_worker(cache_bytes: int) -> None:
+    global _worker_cache
+    _worker_cache = LruCache(max_bytes=cache_bytes)
+
+
+def sweep_chunk(
+        clip: Clip,
+        start: int,
+        stop: int,
+        grid: list[SweepParameters],
+        match_iou: float = 0.3,
+        cache: LruCache | None = None
+) -> dict[SweepParameters, SweepCounts]:
+    """ Evaluates all combinations on the frame pairs (start - 1, start) ... (stop - 2, stop - 1) of a clip """
+    cache = cache or _worker_cache or LruCache(max_bytes=1 << 30)
+    first_frame = max(start - 1, 0)
+    frames = dict(enumerate(clip.read_frames(first_frame, stop), start=first_frame))
+    labels = clip.read_labels()
+    results = {parameters: SweepCounts() for parameters in grid}
+
+    for frame_index in range(max(start, 1), first_frame + len(frames)):
+        frame_labels = None if labels is None else labels.get(frame_index, np.zeros((0, 4), dtype=np.float32))
+        # combinations sharing the upstream parameters follow each other, so the intermediates are still cached
+        for parameters in grid:
+            boxes, seconds = _frame_pair_stages(cache, clip, frames, frame_index, parameters)
+            start_filter = time.perf_counter()
+            detections = _filter_boxes(boxes, parameters)
+            counts = _count(detections, frame_labels, match_iou)
+            counts.seconds = seconds + time.perf_counter() - start_filter
+            results[parameters].add(counts)
+    return results
+
+
+def build_grid(
+        scales: list[float],
+        mask_modes: list[MaskMode],
+        kernels: list[str],
+        bbox_thresholds: list[float],
+        nms_thresholds: list[float]
+) -> list[SweepParameters]:
+    # ordered from the most upstream parameter to the most downstream one
+    return [
+        SweepParameters(scale, mode, kernel, bbox_threshold, nms_threshold)
+        for scale, mode, kernel, bbox_threshold, nms_threshold in itertools.product(
+            scales, mask_modes, kernels, bbox_thresholds, nms_thresholds
+        )
+    ]
+
+
+def sweep(
+        clips: list[Clip],
+        grid: list[SweepParameters],
+        workers: int = 4,
+        chunk_frames: int = 200,
+        cache_bytes: int = 1 << 30,
+        match_iou: float = 0.3
+) -> dict[SweepParameters, SweepCounts]:
+    chunks = [
+        (clip, start, min(start + chunk_frames, frame_count))
+        for clip in clips
+        for frame_count in [clip.frame_count()]
+        for start in range(1, frame_count, chunk_frames)
+    ]
+    results = {parameters: SweepCounts() for parameters in grid}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker, initargs=(cache_bytes,)) as pool:
+        futures = [pool.submit(sweep_chunk, clip, start, stop, grid, match_iou) for clip, start, stop in chunks]
+        for future in futures:
+            for parameters, counts in future.result().items():
+                results[parameters].add(counts)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clip", help="Video file or directory of frames, can be repeated", type=Path,
+                        action="append", required=True)
+    parser.add_argument("--extension", help="Extension of the frames", type=str, default="png")
+    parser.add_argument("--bbox-th", help="Bounding Box area thresholds in pixels", type=float, nargs="+",
+                        default=[128])
+    parser.add_argument("--nms-th", help="Non-Maximum Suppression thresholds (IOU threshold)", type=float,
+                        nargs="+", default=[1e-3])
+    parser.add_argument("--kernel", help=f"Closing kernels, WxH or '{DEFAULT_KERNEL}'", type=str, nargs="+",
+                        default=[DEFAULT_KERNEL])
+    parser.add_argument("--mask-mode", help="Local adaptive threshold modes", type=MaskMode, nargs="+",
+                        choices=list(MaskMode), default=[MaskMode.GAUSSIAN])
+    parser.add_argument("--scale", help="Resize factors of the frames", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--match-iou", help="IoU of a detection counted as a labelled box", type=float, default=0.3)
+    parser.add_argument("--workers", help="Number of worker processes", type=int, default=4)
+    parser.add_argument("--chunk-frames", help="Number of frames processed by a worker at once", type=int,
+                        default=200)
+    parser.add_argument("--cache-mb", help="Budget of cached intermediates per worker", type=int, default=1024)
+    parser.add_argument("--sort", help="Column the table is sorted by", type=str, default="recall",
+                        choices=("recall", "fp", "fps"))
+    args = parser.parse_args()
+
+    clips = [Clip.from_path(path, args.extension) for path in args.clip]
+    grid = build_grid(args.scale, args.mask_mode, args.kernel, args.bbox_th, args.nms_th)
+
+    start = time.perf_counter()
+    results = sweep(
+        clips,
+        grid,
+        workers=args.workers,
+        chunk_frames=args.chunk_frames,
+        cache_bytes=args.cache_mb << 20,
+        match_iou=args.match_iou
+    )
+    elapsed = time.perf_counter() - start
+
+    sort_keys = {
+        "recall": lambda item: (-np.nan_to_num(item[1].recall), item[1].false_positives_per_frame),
+        "fp": lambda item: (item[1].false_positives_per_frame, -np.nan_to_num(item[1].recall)),
+        "fps": lambda item: -item[1].frames_per_second,
+    }
+    columns = ("scale", "mode", "kernel", "bbox th", "nms th", "recall", "FP per frame", "detections", "frames/s")
+    print(f"{len(grid)} combinations on {len(clips)} clips in {elapsed:.1f} s")
+    print("".join(f"{column:>16}" for column in columns))
+    for parameters, counts in sorted(results.items(), key=sort_keys[args.sort]):
+        print(
+            f"{parameters.scale:>16.2f}{parameters.mask_mode.value:>16}{parameters.kernel:>16}"
+            f"{parameters.bbox_threshold:>16.0f}{parameters.nms_threshold:>16.4f}"
+            f"{counts.recall:>16.3f}{counts.false_positives_per_frame:>16.3f}"
+            f"{counts.detections:>16}{counts.frames_per_second:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
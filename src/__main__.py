@@ -1,17 +1,36 @@
 import argparse
 import logging
+import signal
 import sys
 from pathlib import Path
+from typing import Callable, TYPE_CHECKING
 
 from ioutrack import Sort
 
+from src.detectors.base import BaseDetector
+from src.detectors.ensemble import EnsembleMode
 from src.detectors.frame_diff import FrameDiffDetector
+from src.detectors.functions import MaskMode
+from src.detectors.projection import ProjectionMode
+from src.file_operations.async_writer import PreviewFormat
 from src.gstreamer.detector_controller import DetectorController
 from src.gstreamer.pipeline import initialize_gstreamer, TrackerPipeline
+from src.gstreamer.reconnect import ReconnectSupervisor
+from src.gstreamer.utils import RecordingState
 
 import gi
 
 from src.inference.inference import FrameDiffInference
+from src.metrics.camera import CameraMetrics
+from src.profiling.profiler import FrameProfiler, ProfilerMode
+
+if TYPE_CHECKING:
+    # optional features are imported in `run_pipeline` only when enabled - start-up stays fast and lean
+    from src.detectors.ensemble import EnsembleDetector
+    from src.detectors.stacking import StackingDetector
+    from src.detectors.suppression import SuppressionMap
+    from src.qos.controller import DegradationLevel
+    from src.trackers.streak import StreakTracker
 
 gi.require_version('Gst', '1.0')
 gi.require_version('GLib', '2.0')
@@ -28,48 +47,298 @@ VIDEOS_DIRECTORY = DATA_DIRECTORY / "videos"
 OUTPUT_DIRECTORY = DATA_DIRECTORY / "output"
 
 
+def build_degradation_levels(detector_factory: Callable[[float], BaseDetector]) -> list["DegradationLevel"]:
+    """ `detector_factory` builds the configured detector for frames resized by the given scale """
+    from src.qos.controller import DegradationLevel
+
+    half_resolution_detector = detector_factory(0.5)
+    return [
+        DegradationLevel(name="full"),
+        DegradationLevel(name="half-resolution", detector=half_resolution_detector),
+        DegradationLevel(name="half-resolution-every-2nd-frame", detector=half_resolution_detector, frame_stride=2),
+        DegradationLevel(
+            name="quarter-resolution-every-3rd-frame",
+            detector=detector_factory(0.25),
+            frame_stride=3
+        ),
+    ]
+
+
+def build_tracker(tracker_name: str, min_hits: int, max_age: int) -> "Sort | StreakTracker":
+    match tracker_name:
+        case "sort":
+            return Sort(min_hits=min_hits, max_age=max_age)
+        case "streak":
+            from src.trackers.streak import StreakTracker
+
+            return StreakTracker(min_hits=min_hits, max_age=max_age, min_speed=2.0)
+    raise ValueError(f"Unknown tracker {tracker_name}")
+
+
+def build_detector(
+        bbox_threshold: int,
+        nms_threshold: float,
+        mask_mode: MaskMode,
+        stack_window: int | None,
+        stack_projection: ProjectionMode,
+        stack_scale: float,
+        suppression: "SuppressionMap | None" = None,
+        ensemble_mode: EnsembleMode | None = None,
+        metrics: CameraMetrics | None = None,
+        scale: float = 1.0
+) -> "FrameDiffDetector | StackingDetector | EnsembleDetector":
+    frame_diff_detector = FrameDiffDetector(
+        bbox_threshold=bbox_threshold,
+        nms_threshold=nms_threshold,
+        scale=scale,
+        mask_mode=mask_mode,
+        suppression=suppression
+    )
+    if stack_window is None and ensemble_mode is None:
+        return frame_diff_detector
+    from src.detectors.stacking import StackingDetector
+
+    stacking_detector = StackingDetector(
+        bbox_threshold=bbox_threshold,
+        nms_threshold=nms_threshold,
+        window=stack_window or 8,
+        projection=stack_projection,
+        scale=stack_scale * scale,
+        mask_mode=mask_mode,
+        # learned per detector - masks of the two detectors differ
+        suppression=suppression if ensemble_mode is None else None
+    )
+    if ensemble_mode is None:
+        return stacking_detector
+    from src.detectors.ensemble import EnsembleDetector
+
+    # both read from one shared frame graph - at different scales the stacking member only downscales the gray
+    # of the frame-diff member, its differences and masks are its own (fully shared with --stack-scale 1)
+    return EnsembleDetector(
+        detectors={"frame-diff": frame_diff_detector, "stacking": stacking_detector},
+        mode=ensemble_mode,
+        nms_threshold=nms_threshold,
+        metrics=metrics
+    )
+
+
 def run_pipeline(
         rtsp_url: str,
         data_dir: Path,
+        camera_id: str = "some-camera-id",
         bbox_threshold: int = 128,
         nms_threshold: float = 1e-3,
         tracker_min_hits: int = 3,
         tracker_max_age: int = 5,
-        recording_buffer: int = 3000000000
+        recording_buffer: int = 3000000000,
+        metrics_port: int | None = None,
+        metrics_host: str = "127.0.0.1",
+        profile_dir: Path | None = None,
+        profile_frames: int = 250,
+        profile_mode: ProfilerMode = ProfilerMode.CPROFILE,
+        qos_max_lag: int | None = None,
+        preview_format: PreviewFormat = PreviewFormat.JPEG,
+        preview_quality: int = 85,
+        preview_max_size: int | None = 1280,
+        idle_keyframes_after: float | None = None,
+        tracker_name: str = "sort",
+        reconnect_max_backoff: float = 30.0,
+        stall_timeout: float = 10.0,
+        mask_mode: MaskMode = MaskMode.GAUSSIAN,
+        stack_window: int | None = None,
+        stack_projection: ProjectionMode = ProjectionMode.MAX,
+        stack_scale: float = 0.5,
+        verify_candidates: bool = False,
+        verifier_budget_ms: float = 20.0,
+        crops_dir: Path | None = None,
+        crop_size: int = 64,
+        dvr_dir: Path | None = None,
+        dvr_budget_gb: float = 20.0,
+        dvr_segment_seconds: float = 10.0,
+        events_socket: Path | None = None,
+        control_socket: Path | None = None,
+        latitude: float | None = None,
+        longitude: float | None = None,
+        twilight_altitude: float = -6.0,
+        suppress_hot_pixels: bool = False,
+        suppression_threshold: float = 0.3,
+        ensemble_mode: EnsembleMode | None = None
 ) -> None:
+    if events_socket is not None and control_socket is not None and events_socket.resolve() == control_socket.resolve():
+        # both servers replace an existing socket file - the one started first would be unreachable
+        raise ValueError(f"Events and control sockets must be different files, both are {events_socket}")
     initialize_gstreamer()
     main_loop = GLib.MainLoop()
 
+    profiler = None
+    if profile_dir is not None:
+        profiler = FrameProfiler(output_directory=profile_dir, mode=profile_mode, default_frames=profile_frames)
+    metrics = CameraMetrics(camera_id=camera_id, profiler=profiler)
+
     logger.info(f"Creating TrackingPipeline for stream {rtsp_url}")
     pipeline = TrackerPipeline(
-        camera_id="some-camera-id",
+        camera_id=camera_id,
         rtsp_url=rtsp_url,
         recordings_directory=data_dir,
-        recording_buffer=recording_buffer
+        # rolling segments replace the pre-roll queue of the file branch
+        recording_buffer=recording_buffer if dvr_dir is None else 0,
+        metrics=metrics
     )
     logger.info(f"Successfully created TrackingPipeline for stream {rtsp_url}")
 
-    inference_engine = FrameDiffInference(
-        detector=FrameDiffDetector(
+    metrics_server = None
+    if metrics_port is not None:
+        from src.metrics.server import MetricsServer
+
+        metrics_server = MetricsServer(port=metrics_port, host=metrics_host, health_function=pipeline.health)
+        metrics_server.start()
+
+    reconnect_supervisor = ReconnectSupervisor(
+        pipeline=pipeline,
+        max_backoff_seconds=reconnect_max_backoff,
+        stall_timeout_seconds=stall_timeout
+    )
+    reconnect_supervisor.start()
+
+    def configured_detector(scale: float = 1.0) -> "FrameDiffDetector | StackingDetector | EnsembleDetector":
+        suppression = None
+        if suppress_hot_pixels:
+            from src.detectors.suppression import SuppressionMap
+
+            # learned per resolution - the map is reallocated when the shape of the mask changes
+            suppression = SuppressionMap(threshold=suppression_threshold, metrics=metrics)
+        return build_detector(
             bbox_threshold=bbox_threshold,
-            nms_threshold=nms_threshold
-        ),
-        tracker=Sort(
-            min_hits=tracker_min_hits,
-            max_age=tracker_max_age
+            nms_threshold=nms_threshold,
+            mask_mode=mask_mode,
+            stack_window=stack_window,
+            stack_projection=stack_projection,
+            stack_scale=stack_scale,
+            suppression=suppression,
+            ensemble_mode=ensemble_mode,
+            metrics=metrics,
+            scale=scale
+        )
+
+    detector = configured_detector()
+    if verify_candidates:
+        from src.detectors.cascade import CascadeDetector
+
+        detector = CascadeDetector(
+            proposer=detector,
+            latency_budget_seconds=verifier_budget_ms / 1e3,
+            metrics=metrics
         )
+    inference_engine = FrameDiffInference(
+        detector=detector,
+        tracker=build_tracker(tracker_name, tracker_min_hits, tracker_max_age),
+        metrics=metrics
     )
 
+    qos = None
+    if qos_max_lag is not None:
+        from src.qos.controller import QosController
+
+        qos = QosController(
+            camera_id=camera_id,
+            # degraded levels keep the configured detector, suppression and ensemble - at lower resolutions
+            levels=build_degradation_levels(configured_detector),
+            degrade_lag_frames=qos_max_lag,
+            recover_lag_frames=qos_max_lag // 5
+        )
+
+    decode_mode = None
+    if idle_keyframes_after is not None:
+        from src.gstreamer.decode_mode import DecodeModeController
+
+        decode_mode = DecodeModeController(
+            camera_id=camera_id,
+            set_mode_function=pipeline.set_decode_mode,
+            idle_after_seconds=idle_keyframes_after
+        )
+
+    recorder = None
+    if dvr_dir is not None:
+        from src.gstreamer.dvr import DvrRecorder
+
+        recorder = DvrRecorder(
+            pipeline=pipeline,
+            segments_directory=dvr_dir,
+            clips_directory=data_dir,
+            segment_seconds=dvr_segment_seconds,
+            budget_bytes=int(dvr_budget_gb * 1024 ** 3),
+            pre_roll_seconds=recording_buffer / 1e9,
+            post_roll_seconds=recording_buffer / 1e9
+        )
+        recorder.attach()
+
+    publisher = None
+    if events_socket is not None:
+        from src.ipc.publisher import EventPublisher
+
+        publisher = EventPublisher(socket_path=events_socket, camera_id=camera_id)
+        publisher.start()
+
+    crop_store = None
+    if crops_dir is not None:
+        from src.file_operations.crop_store import CropStore
+
+        crop_store = CropStore(output_directory=crops_dir, camera_id=camera_id, crop_size=crop_size)
+
     controller = DetectorController(
         inference_engine=inference_engine,
         pipeline=pipeline,
         image_output_directory=data_dir,
+        preview_format=preview_format,
+        preview_quality=preview_quality,
+        preview_max_size=preview_max_size,
+        metrics=metrics,
+        profiler=profiler,
+        qos=qos,
+        decode_mode=decode_mode,
+        crop_store=crop_store,
+        recorder=recorder,
+        publisher=publisher
     )
 
+    if profiler is not None:
+        # `kill -USR1 <pid>` profiles the next `profile_frames` frames
+        GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, lambda: profiler.arm() or True)
+        logger.info(f"Send SIGUSR1 to profile the next {profile_frames} frames into {profile_dir}")
+
+    if latitude is not None and longitude is not None:
+        from src.gstreamer.night_schedule import NightScheduler
+
+        night_scheduler = NightScheduler(
+            camera_id=camera_id,
+            latitude=latitude,
+            longitude=longitude,
+            set_suspended_function=controller.set_detection_suspended,
+            twilight_altitude_degrees=twilight_altitude,
+            # a recording in progress is stopped by the detector before detection is suspended
+            can_suspend_function=lambda: controller.get_pipeline_state() in (
+                RecordingState.NOT_STARTED, RecordingState.STOPPED
+            )
+        )
+        night_scheduler.update()
+        GLib.timeout_add_seconds(60, night_scheduler.update)
+
+    control_server = None
+    if control_socket is not None:
+        from src.control.server import ControlServer
+
+        control_server = ControlServer(socket_path=control_socket, commands=controller.control_commands())
+        control_server.start()
+
     pipeline.add_callback_probe(controller.switch_on_record_manager_callback)
+    controller.schedule_state_reports()
 
     pipeline.add_app_sink_new_sample_callback(controller.update_with_frame)
 
+    # supervisor stops and restarts workers with SIGTERM - finalise open recordings first
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGTERM, pipeline.shutdown)
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGINT, pipeline.shutdown)
+
     pipeline.start_pipeline(main_loop)
 
     try:
@@ -77,35 +346,240 @@ def run_pipeline(
     except Exception as e:
         logger.error(f"Exception during pipeline execution. Error = {e}")
         raise e
+    finally:
+        if control_server is not None:
+            control_server.stop()
+        controller.close()
+        if metrics_server is not None:
+            metrics_server.stop()
 
 
 def main() -> None:
     parser = argparse.ArgumentParser()
 
+    parser.add_argument("--camera-id", help="Identifier of the camera used in metrics and logs", type=str,
+                        default="some-camera-id")
     parser.add_argument("--rtsp-url", help="RTSP URL of camera stream", type=str)
     parser.add_argument("--data-dir", help="Directory to save data to", type=str)
-    parser.add_argument("--bbox-th", help="Bounding Box area threshold in pixels", type=int)
-    parser.add_argument("--nms-th", help="Non-Maximum Suppression threshold (IOU threshold)", type=float)
+    # defaults are the ones of the Docker image, see Dockerfile-small
+    parser.add_argument("--bbox-th", help="Bounding Box area threshold in pixels", type=int, default=128)
+    parser.add_argument(
+        "--nms-th",
+        help="Non-Maximum Suppression threshold (IOU threshold)",
+        type=float,
+        default=0.001
+    )
     parser.add_argument(
         "--min-hits",
         help="Minimum number of successive detections to start recording",
-        type=int
+        type=int,
+        default=3
     )
     parser.add_argument(
         "--max-age",
         help="Maximum frames without matching detections before stopping recording",
+        type=int,
+        default=5
+    )
+    parser.add_argument(
+        "--metrics-port",
+        help="Port of the local HTTP endpoint exposing metrics in Prometheus format (disabled when not set)",
         type=int
     )
+    parser.add_argument(
+        "--metrics-host",
+        help="Address the metrics endpoint binds to",
+        type=str,
+        default="127.0.0.1"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="Directory for profiles, enables profiling of N frames on SIGUSR1 when set",
+        type=str
+    )
+    parser.add_argument("--profile-frames", help="Number of frames profiled per session", type=int, default=250)
+    parser.add_argument(
+        "--profile-mode",
+        help="Profiler used for profiling sessions",
+        choices=[mode.value for mode in ProfilerMode],
+        default=ProfilerMode.CPROFILE.value
+    )
+    parser.add_argument(
+        "--qos-max-lag",
+        help="Inference lag (in frames) above which detection is gradually degraded (disabled when not set)",
+        type=int
+    )
+    parser.add_argument(
+        "--preview-format",
+        help="Format of preview images saved when recording starts",
+        choices=[image_format.value for image_format in PreviewFormat],
+        default=PreviewFormat.JPEG.value
+    )
+    parser.add_argument("--preview-quality", help="Encoding quality of preview images (0-100)", type=int, default=85)
+    parser.add_argument(
+        "--preview-max-size",
+        help="Longer side of preview images in pixels, previews are downscaled to fit it",
+        type=int,
+        default=1280
+    )
+    parser.add_argument(
+        "--idle-keyframes-after",
+        help="Seconds without candidate detections after which only key frames are decoded "
+             "(full decoding all the time when not set)",
+        type=float
+    )
+    parser.add_argument(
+        "--tracker",
+        help="Tracker associating detections between frames, 'streak' is tuned for small and fast objects",
+        choices=["sort", "streak"],
+        default="sort"
+    )
+    parser.add_argument(
+        "--reconnect-max-backoff",
+        help="Maximum delay (in seconds) between attempts to reconnect to the camera stream",
+        type=float,
+        default=30.0
+    )
+    parser.add_argument(
+        "--stall-timeout",
+        help="Seconds without data from the camera after which the stream is reconnected",
+        type=float,
+        default=10.0
+    )
+    parser.add_argument(
+        "--mask-mode",
+        help="Local adaptive threshold of the motion mask, box modes are faster and slightly less accurate "
+             "(compare them on a recording with dev.evaluate_mask_modes)",
+        choices=[mode.value for mode in MaskMode],
+        default=MaskMode.GAUSSIAN.value
+    )
+    parser.add_argument(
+        "--stack-window",
+        help="Detect on a projection of the last N frame differences at a lower resolution, "
+             "more sensitive to dim meteors than a single difference (disabled when not set)",
+        type=int
+    )
+    parser.add_argument(
+        "--stack-projection",
+        help="Projection of the stacked differences, 'sum' favours slow and faint objects",
+        choices=[mode.value for mode in ProjectionMode],
+        default=ProjectionMode.MAX.value
+    )
+    parser.add_argument("--stack-scale", help="Resize factor of frames before stacking", type=float, default=0.5)
+    parser.add_argument(
+        "--verify-candidates",
+        help="Pass only candidates which look like a streak to the tracker, verified on crops on a worker thread",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--verifier-budget-ms",
+        help="Time to wait for verification of the previous frame, later candidates are passed unverified",
+        type=float,
+        default=20.0
+    )
+    parser.add_argument(
+        "--crops-dir",
+        help="Directory to store crops around confirmed tracks of every recording into (disabled when not set)",
+        type=str
+    )
+    parser.add_argument("--crop-size", help="Side of the stored crops in pixels", type=int, default=64)
+    parser.add_argument(
+        "--dvr-dir",
+        help="Record the stream continuously into rolling segments in this directory and cut event clips "
+             "out of them instead of relinking the file branch (disabled when not set)",
+        type=str
+    )
+    parser.add_argument("--dvr-budget-gb", help="Disk budget of the rolling segments", type=float, default=20.0)
+    parser.add_argument("--dvr-segment-seconds", help="Length of a rolling segment", type=float, default=10.0)
+    parser.add_argument(
+        "--events-socket",
+        help="Unix socket to stream tracked detections and recording state changes to local subscribers "
+             "(disabled when not set)",
+        type=str
+    )
+    parser.add_argument(
+        "--control-socket",
+        help="Unix socket accepting commands (status, start/stop recording, thresholds, stride) "
+             "of `python -m src.control` (disabled when not set)",
+        type=str
+    )
+
+    parser.add_argument(
+        "--latitude",
+        help="Latitude of the camera in degrees, detection is suspended in daylight when set with --longitude",
+        type=float
+    )
+    parser.add_argument("--longitude", help="Longitude of the camera in degrees, east positive", type=float)
+    parser.add_argument(
+        "--twilight-altitude",
+        help="Sun altitude in degrees below which detection runs (-6 civil, -12 nautical, -18 astronomical twilight)",
+        type=float,
+        default=-6.0
+    )
+
+    parser.add_argument(
+        "--suppress-hot-pixels",
+        help="Learn cells of the motion mask which are active most of the time (hot pixels, twinkling stars, "
+             "compression artefacts) and clear them before contours are extracted",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--suppression-threshold",
+        help="Share of sampled frames in which a cell has to be active to be suppressed",
+        type=float,
+        default=0.3
+    )
+
+    parser.add_argument(
+        "--ensemble-mode",
+        help="Run the single difference and the stacked (--stack-window) detector together on shared intermediates, "
+             "'union' merges their detections, 'primary' uses the single difference one and only counts "
+             "detections of the stacked one for comparison (disabled when not set)",
+        choices=[mode.value for mode in EnsembleMode]
+    )
 
     args = parser.parse_args()
 
     run_pipeline(
         rtsp_url=args.rtsp_url,
         data_dir=Path(args.data_dir),
+        camera_id=args.camera_id,
         bbox_threshold=args.bbox_th,
         nms_threshold=args.nms_th,
         tracker_min_hits=args.min_hits,
-        tracker_max_age=args.max_age
+        tracker_max_age=args.max_age,
+        metrics_port=args.metrics_port,
+        metrics_host=args.metrics_host,
+        profile_dir=Path(args.profile_dir) if args.profile_dir else None,
+        profile_frames=args.profile_frames,
+        profile_mode=ProfilerMode(args.profile_mode),
+        qos_max_lag=args.qos_max_lag,
+        preview_format=PreviewFormat(args.preview_format),
+        preview_quality=args.preview_quality,
+        preview_max_size=args.preview_max_size,
+        idle_keyframes_after=args.idle_keyframes_after,
+        tracker_name=args.tracker,
+        reconnect_max_backoff=args.reconnect_max_backoff,
+        stall_timeout=args.stall_timeout,
+        mask_mode=MaskMode(args.mask_mode),
+        stack_window=args.stack_window,
+        stack_projection=ProjectionMode(args.stack_projection),
+        stack_scale=args.stack_scale,
+        verify_candidates=args.verify_candidates,
+        verifier_budget_ms=args.verifier_budget_ms,
+        crops_dir=Path(args.crops_dir) if args.crops_dir else None,
+        crop_size=args.crop_size,
+        dvr_dir=Path(args.dvr_dir) if args.dvr_dir else None,
+        dvr_budget_gb=args.dvr_budget_gb,
+        dvr_segment_seconds=args.dvr_segment_seconds,
+        events_socket=Path(args.events_socket) if args.events_socket else None,
+        control_socket=Path(args.control_socket) if args.control_socket else None,
+        latitude=args.latitude,
+        longitude=args.longitude,
+        twilight_altitude=args.twilight_altitude,
+        suppress_hot_pixels=args.suppress_hot_pixels,
+        suppression_threshold=args.suppression_threshold,
+        ensemble_mode=EnsembleMode(args.ensemble_mode) if args.ensemble_mode else None
     )
 
 
@@ -0,0 +1,21 @@
+import math
+import random
+
+
+def compute_backoff(
+        attempt: int,
+        initial_seconds: float,
+        max_seconds: float,
+        multiplier: float,
+        jitter: float,
+        rng: random.Random
+) -> float:
+    """ Exponential backoff with +-`jitter` relative jitter, so that many cameras do not reconnect in lockstep """
+    if multiplier > 1.0:
+        # the cap is reached after this many attempts - larger powers overflow floats after ~1000 attempts
+        if 0.0 < initial_seconds < max_seconds:
+            attempt = min(attempt, math.ceil(math.log(max_seconds / initial_seconds, multiplier)))
+        else:
+            attempt = 0
+    delay = min(max_seconds, initial_seconds * multiplier ** attempt)
+    return max(0.0, delay * (1.0 + rng.uniform(-jitter, jitter)))
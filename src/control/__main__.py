@@ -0,0 +1,33 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from src.control.client import send_command
+
+
+def _parse_argument(argument: str) -> tuple[str, object]:
+    name, _, value = argument.partition("=")
+    try:
+        return name.replace("-", "_"), json.loads(value)
+    except ValueError:
+        return name.replace("-", "_"), value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Sends a command to a running pipeline, e.g. `set-thresholds bbox_threshold=64`"
+    )
+    parser.add_argument("--socket", help="Control socket of the pipeline (--control-socket)", type=str, required=True)
+    parser.add_argument("command", help="status, start-recording, stop-recording, set-thresholds or set-stride")
+    parser.add_argument("arguments", help="Arguments of the command as name=value", nargs="*")
+    args = parser.parse_args()
+
+    response = send_command(Path(args.socket), args.command, **dict(map(_parse_argument, args.arguments)))
+    print(json.dumps(response, indent=2))
+    if not response["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
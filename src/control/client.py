@@ -0,0 +1,14 @@
+import json
+import socket
+from pathlib import Path
+from typing import Any
+
+
+def send_command(socket_path: Path, command: str, timeout: float = 10.0, **arguments: Any) -> dict[str, Any]:
+    """ Sends a single command to a `ControlServer` and returns its response, {"ok": bool, "result" | "error": ...} """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(str(socket_path))
+        connection.sendall(json.dumps({"command": command, **arguments}).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as responses:
+            return json.loads(responses.readline())
@@ -0,0 +1,8 @@
+from typing import Any, Callable
+
+# handles the arguments of a command on the main loop, returns a JSON serializable result
+CommandHandler = Callable[[dict[str, Any]], dict[str, Any]]
+
+
+class CommandError(Exception):
+    """ Raised by command handlers for invalid commands - the message is returned to the client """
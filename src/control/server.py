@@ -0,0 +1,121 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+# command handlers do not need asyncio - they are defined apart from the server
+from src.control.commands import CommandError, CommandHandler
+
+logger = logging.getLogger(__name__)
+
+# schedules a function on the thread owning the pipeline, e.g. `GLib.idle_add`
+DispatchFunction = Callable[[Callable[[], bool]], Any]
+
+
+def _glib_idle_add(function: Callable[[], bool]) -> Any:
+    import gi
+    gi.require_version('GLib', '2.0')
+    from gi.repository import GLib
+
+    return GLib.idle_add(function)
+
+
+@dataclass
+class ControlServer:
+    """
+    Controls a running pipeline over a Unix domain socket, one JSON object per line:
+
+        {"command": "set-thresholds", "bbox_threshold": 64}
+        {"ok": true, "result": {"bbox_threshold": 64.0, "nms_threshold": 0.001}}
+
+    Connections are served by an asyncio loop on its own daemon thread. Handlers never run there -
+    every command is passed to `dispatch_function` (`GLib.idle_add` by default), so commands run
+    on the GLib main loop between its other callbacks and never on (or block) a GStreamer streaming thread.
+    """
+    socket_path: Path
+    commands: dict[str, CommandHandler]
+    dispatch_function: DispatchFunction = _glib_idle_add
+    command_timeout_seconds: float = 5.0
+
+    _loop: asyncio.AbstractEventLoop | None = field(init=False, default=None)
+    _server: asyncio.AbstractServer | None = field(init=False, default=None)
+    _thread: threading.Thread | None = field(init=False, default=None)
+
+    def start(self) -> None:
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            # left behind by a previous run
+            self.socket_path.unlink()
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_unix_server(self._handle_connection, path=str(self.socket_path))
+        )
+        self._thread = threading.Thread(target=self._loop.run_forever, name="control-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Accepting control commands on {self.socket_path}")
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close_server(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+        self.socket_path.unlink(missing_ok=True)
+
+    async def _close_server(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                response = await self._respond(line)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line: bytes) -> dict[str, Any]:
+        try:
+            request = json.loads(line)
+            name = request.pop("command")
+        except (ValueError, KeyError, AttributeError, TypeError):
+            return {"ok": False, "error": "Expected a JSON object with a 'command'"}
+        handler = self.commands.get(name)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command {name}, available: {', '.join(sorted(self.commands))}"}
+
+        try:
+            result = await asyncio.wait_for(self._run_dispatched(handler, request), self.command_timeout_seconds)
+        except CommandError as e:
+            return {"ok": False, "error": str(e)}
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": f"Command {name} did not run within {self.command_timeout_seconds} s"}
+        except Exception as e:
+            logger.exception(f"Control command {name} failed")
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": True, "result": result}
+
+    def _run_dispatched(self, handler: CommandHandler, arguments: dict[str, Any]) -> asyncio.Future:
+        future = concurrent.futures.Future()
+
+        def run() -> bool:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(handler(arguments))
+                except Exception as e:
+                    future.set_exception(e)
+            # runs once
+            return False
+
+        self.dispatch_function(run)
+        return asyncio.wrap_future(future)
@@ -7,3 +7,11 @@ class BaseDetector(ABC):
     @abstractmethod
     def update(self, frame: NumpyImage) -> BBoxList:
         pass
+
+    def reset(self) -> None:
+        """ Forgets previous frames - called when the detector is (re)activated after frames it has not seen """
+
+    @property
+    def latency_frames(self) -> int:
+        """ Number of frames by which the detections returned by `update` lag behind the frame passed to it """
+        return 0
@@ -0,0 +1,108 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from src.detectors.base import BaseDetector
+from src.detectors.verifier import StreakVerifier
+from src.metrics.camera import CameraMetrics
+from src.types import NumpyImage, BBoxList
+
+logger = logging.getLogger(__name__)
+
+
+def _empty() -> BBoxList:
+    return np.zeros((0, 5), dtype=np.float32)
+
+
+@dataclass
+class CascadeDetector(BaseDetector):
+    """
+    Two-tier detection - the cheap `proposer` proposes candidates, the `verifier` checks crops
+    of them on a worker thread and only verified candidates are returned.
+
+    Verification of frame N overlaps with decoding of frame N + 1, so `update` returns candidates
+    of the previous frame (`latency_frames`) - waiting for them at most `latency_budget_seconds`.
+    Candidates of a verification which missed the budget are passed on unverified (or dropped when
+    `pass_unverified` is False), and so are new candidates while the worker is still busy with it.
+    """
+    proposer: BaseDetector
+    verifier: StreakVerifier = field(default_factory=StreakVerifier)
+    latency_budget_seconds: float = 0.02
+    pass_unverified: bool = True
+    # frames with more candidates (e.g. a lighting change) only have the largest ones verified
+    max_candidates: int = 32
+    metrics: Optional[CameraMetrics] = None
+
+    _previous_frame: Optional[NumpyImage] = field(init=False, default=None)
+    _pending: Optional[Future] = field(init=False, default=None)
+    _pending_candidates: BBoxList = field(init=False, default_factory=_empty)
+    _late: Optional[Future] = field(init=False, default=None)
+    _executor: ThreadPoolExecutor = field(init=False)
+
+    def __post_init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="candidate-verifier")
+
+    @property
+    def latency_frames(self) -> int:
+        return 1
+
+    def update(self, frame: NumpyImage) -> BBoxList:
+        verified = self._collect()
+
+        candidates = np.asarray(self.proposer.update(frame), dtype=np.float32).reshape(-1, 5)
+        previous_frame = self._previous_frame
+        self._previous_frame = frame
+        if len(candidates) == 0 or previous_frame is None or previous_frame.shape != frame.shape:
+            return verified
+
+        self._pending_candidates = candidates
+        if self._late is not None and not self._late.done():
+            # returned unverified with the next frame, like verified ones
+            return verified
+        self._late = None
+
+        candidates = candidates[np.argsort(-candidates[:, 4])[:self.max_candidates]]
+        crops = [self.verifier.crop(frame, previous_frame, box) for box in candidates]
+        self._pending = self._executor.submit(self._verify, candidates, crops)
+        self._pending_candidates = candidates
+        return verified
+
+    def reset(self) -> None:
+        self.proposer.reset()
+        # candidates of frames before the gap are dropped, a late verification only keeps the worker busy
+        self._previous_frame = None
+        self._pending = None
+        self._pending_candidates = _empty()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _collect(self) -> BBoxList:
+        candidates, self._pending_candidates = self._pending_candidates, _empty()
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return self._unverified(candidates) if len(candidates) > 0 else candidates
+        try:
+            return pending.result(timeout=self.latency_budget_seconds)
+        except TimeoutError:
+            logger.debug(f"Verification of {len(candidates)} candidates missed the latency budget")
+            self._late = pending
+            return self._unverified(candidates)
+
+    def _unverified(self, candidates: BBoxList) -> BBoxList:
+        if self.metrics is not None:
+            self.metrics.candidates("unverified" if self.pass_unverified else "expired").inc(len(candidates))
+        return candidates if self.pass_unverified else _empty()
+
+    def _verify(self, candidates: BBoxList, crops: list[tuple[NumpyImage, NumpyImage]]) -> BBoxList:
+        start = time.perf_counter()
+        accepted = np.array([self.verifier.verify(crop, previous_crop) for crop, previous_crop in crops], dtype=bool)
+        if self.metrics is not None:
+            self.metrics.stage_duration("verifier").observe(time.perf_counter() - start)
+            self.metrics.candidates("accepted").inc(int(accepted.sum()))
+            self.metrics.candidates("rejected").inc(int((~accepted).sum()))
+        return candidates[accepted]
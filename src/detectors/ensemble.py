@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Optional
+
+import numpy as np
+
+from src.detectors.base import BaseDetector
+from src.detectors.preprocessing import FrameGraph, GraphDetector, Intermediate
+from src.metrics.camera import CameraMetrics
+from src.non_max_supression.nms import non_max_suppression
+from src.types import NumpyImage, BBoxList
+
+
+class EnsembleMode(Enum):
+    # detections of all detectors, overlapping ones merged by non-maximum suppression
+    UNION = "union"
+    # detections of the first detector only - the others run on the same frames for comparison (A/B)
+    PRIMARY = "primary"
+
+
+@dataclass
+class EnsembleDetector(BaseDetector):
+    """
+    Runs several detectors on every frame and merges their detections before tracking.
+
+    Detectors reading from a `FrameGraph` (`GraphDetector`) share its intermediates - grayscale frames,
+    differences and masks are computed once per frame and scale, not once per detector.
+    Intermediates declared by the detectors are computed every frame, so that differences stay available
+    even for detectors which skip some of them. Other detectors get the frame itself.
+    Detections of each detector are counted in `meteor_detector_detections_total` by its name.
+    """
+    detectors: dict[str, BaseDetector]
+    mode: EnsembleMode = EnsembleMode.UNION
+    nms_threshold: float = 1e-3
+    metrics: Optional[CameraMetrics] = None
+
+    graph: FrameGraph = field(init=False, default_factory=FrameGraph)
+    # detections of every detector on the last frame, before merging
+    last_detections: dict[str, BBoxList] = field(init=False, default_factory=dict)
+
+    def __post_init__(self):
+        assert self.detectors, "At least one detector is required"
+
+    @property
+    def intermediates(self) -> frozenset[Intermediate]:
+        return frozenset().union(*(
+            detector.intermediates for detector in self.detectors.values() if isinstance(detector, GraphDetector)
+        ))
+
+    def update(self, frame: NumpyImage) -> BBoxList:
+        self.graph.next_frame(frame)
+        self.graph.compute(self.intermediates)
+        for name, detector in self.detectors.items():
+            if self.metrics is None:
+                bboxes = self._detect(detector, frame)
+            else:
+                with self.metrics.time_stage(f"detector-{name}"):
+                    bboxes = self._detect(detector, frame)
+                self.metrics.detector_detections(name).inc(len(bboxes))
+            self.last_detections[name] = np.asarray(bboxes, dtype=np.float32).reshape(-1, 5)
+        return self._merge()
+
+    def reset(self) -> None:
+        self.graph.reset()
+        for detector in self.detectors.values():
+            detector.reset()
+
+    def _detect(self, detector: BaseDetector, frame: NumpyImage) -> BBoxList:
+        if isinstance(detector, GraphDetector):
+            return detector.detect(self.graph)
+        return detector.update(frame)
+
+    def _merge(self) -> BBoxList:
+        if self.mode == EnsembleMode.PRIMARY:
+            return self.last_detections[next(iter(self.detectors))]
+        detections = np.concatenate(list(self.last_detections.values()))
+        if len(detections) < 2:
+            return detections
+        return detections[non_max_suppression(detections, iou_threshold=self.nms_threshold)]
@@ -1,29 +1,56 @@
 from dataclasses import field, dataclass
 from typing import Optional
 
-import cv2
 import numpy as np
 
-from src.detectors.base import BaseDetector
-from src.detectors.functions import get_detections
+from src.detectors.functions import get_mask_detections, MaskMode
+from src.detectors.preprocessing import FrameGraph, GraphDetector, Intermediate, IntermediateKind
+from src.detectors.suppression import SuppressionMap
 from src.types import NumpyImage, BBoxList
 
 
 @dataclass
-class FrameDiffDetector(BaseDetector):
+class FrameDiffDetector(GraphDetector):
     bbox_threshold: float = 100
     nms_threshold: float = 1e-3
-    _previous_frame: Optional[NumpyImage] = field(init=False, default=None)
+    # frames are resized by this factor before detection, bboxes are returned in full resolution
+    scale: float = 1.0
+    # local adaptive threshold of the motion mask, box modes trade some accuracy for speed
+    mask_mode: MaskMode = MaskMode.GAUSSIAN
+    # clears cells of the motion mask which are active most of the time before contours are extracted
+    suppression: Optional[SuppressionMap] = None
+    # intermediates of frames passed to `update`, buffers are reallocated only when the frame shape changes
+    _graph: FrameGraph = field(init=False, default_factory=FrameGraph)
+    # copy of the shared (read-only) mask cleared by the suppression map
+    _suppressed_mask: Optional[np.ndarray] = field(init=False, default=None)
+
+    @property
+    def intermediates(self) -> frozenset[Intermediate]:
+        return frozenset({Intermediate(IntermediateKind.MASK, self.scale, self.mask_mode)})
 
     def update(self, frame: NumpyImage) -> BBoxList:
-        if self._previous_frame is None:
-            bboxes = np.zeros((0, 5), dtype=np.float32)
-        else:
-            bboxes = get_detections(
-                frame1=cv2.cvtColor(self._previous_frame, cv2.COLOR_BGR2GRAY),
-                frame2=cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
-                bbox_thresh=self.bbox_threshold,
-                nms_thresh=self.nms_threshold
-            )
-        self._previous_frame = frame
-        return bboxes.astype(np.float32)
+        return self.detect(self._graph.next_frame(frame))
+
+    def reset(self) -> None:
+        self._graph.reset()
+
+    def detect(self, graph: FrameGraph) -> BBoxList:
+        mask = graph.mask(self.scale, self.mask_mode)
+        if mask is None:
+            return np.zeros((0, 5), dtype=np.float32)
+        if self.suppression is not None:
+            if self._suppressed_mask is None or self._suppressed_mask.shape != mask.shape:
+                self._suppressed_mask = np.empty_like(mask)
+            np.copyto(self._suppressed_mask, mask)
+            mask = self.suppression.apply(self._suppressed_mask)
+
+        bboxes = get_mask_detections(
+            mask,
+            bbox_thresh=self.bbox_threshold * self.scale ** 2,
+            nms_thresh=self.nms_threshold
+        )
+        bboxes = bboxes.astype(np.float32, copy=False)
+        if self.scale != 1.0 and len(bboxes) > 0:
+            bboxes[:, :4] /= self.scale
+            bboxes[:, 4] /= self.scale ** 2
+        return bboxes
@@ -1,8 +1,46 @@
+from dataclasses import dataclass, field
+from enum import Enum
+
 import cv2
 import numpy as np
 
 from src.non_max_supression.nms import non_max_suppression
 
+ADAPTIVE_THRESHOLD_BLOCK_SIZE = 11
+ADAPTIVE_THRESHOLD_C = 3
+
+
+class MaskMode(Enum):
+    # Gaussian weighted local mean, median blur of the difference and of the mask
+    GAUSSIAN = "gaussian"
+    # box (running sum) local mean - about half the cost of the Gaussian window, saving ~10-30% of the whole mask
+    BOX = "box"
+    # box local mean and a single median blur of the mask only
+    BOX_SINGLE_BLUR = "box-single-blur"
+
+
+@dataclass
+class MaskWorkspace:
+    """ Preallocated intermediate images of `get_mask`, reallocated only when the frame shape changes """
+    shape: tuple[int, ...] = field(init=False, default=())
+    difference: np.ndarray = field(init=False)
+    blurred_difference: np.ndarray = field(init=False)
+    local_mean: np.ndarray = field(init=False)
+    shifted_difference: np.ndarray = field(init=False)
+    threshold_mask: np.ndarray = field(init=False)
+    blurred_mask: np.ndarray = field(init=False)
+    mask: np.ndarray = field(init=False)
+
+    def ensure_shape(self, shape: tuple[int, ...]) -> None:
+        if shape == self.shape:
+            return
+        self.shape = shape
+        for name in (
+                "difference", "blurred_difference", "local_mean", "shifted_difference",
+                "threshold_mask", "blurred_mask", "mask"
+        ):
+            setattr(self, name, np.empty(shape, dtype=np.uint8))
+
 
 def get_contour_detections(mask, thresh=400):
     """ Obtains initial proposed detections from contours discoverd on the mask.
@@ -27,38 +65,118 @@ def get_contour_detections(mask, thresh=400):
     return np.array(detections)
 
 
-def get_mask(frame1, frame2, kernel=np.array((9, 9), dtype=np.uint8)):
+def get_mask(frame1, frame2, kernel=np.array((9, 9), dtype=np.uint8), mode=MaskMode.GAUSSIAN, workspace=None):
     """ Obtains image mask
         Inputs:
             frame1 - Grayscale frame at time t
             frame2 - Grayscale frame at time t + 1
             kernel - (NxN) array for Morphological Operations
+            mode - MaskMode of the local adaptive threshold
+            workspace - MaskWorkspace reused between frames, the returned mask is a view of it
+                and is overwritten by the next call
         Outputs:
             mask - Thresholded mask for moving pixels
         """
-    frame_diff = cv2.subtract(frame2, frame1)
+    workspace = workspace or MaskWorkspace()
+    workspace.ensure_shape(frame1.shape)
+    frame_diff = cv2.subtract(frame2, frame1, dst=workspace.difference)
 
-    # blur the frame difference
-    frame_diff = cv2.medianBlur(frame_diff, 3)
+    return threshold_difference(frame_diff, kernel, mode, workspace)
 
-    mask = cv2.adaptiveThreshold(
-        frame_diff,
-        255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY_INV,
-        11,
-        3
-    )
 
-    mask = cv2.medianBlur(mask, 3)
-
-    # morphological operations
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+def threshold_difference(frame_diff, kernel=np.array((9, 9), dtype=np.uint8), mode=MaskMode.GAUSSIAN, workspace=None):
+    """ Obtains image mask from a difference image
+        Inputs:
+            frame_diff - Grayscale difference (or projection of differences) of frames
+            kernel - (NxN) array for Morphological Operations
+            mode - MaskMode of the local adaptive threshold
+            workspace - MaskWorkspace reused between frames, the returned mask is a view of it
+                and is overwritten by the next call
+        Outputs:
+            mask - Thresholded mask for moving pixels
+        """
+    workspace = workspace or MaskWorkspace()
+    workspace.ensure_shape(frame_diff.shape)
+
+    frame_diff = blur_difference(frame_diff, mode, workspace)
+    mask = threshold_blurred_difference(frame_diff, mode, workspace)
+    return close_mask(mask, kernel, workspace)
+
+
+def blur_difference(frame_diff, mode=MaskMode.GAUSSIAN, workspace=None):
+    """ Median blur of the difference image, MaskMode.BOX_SINGLE_BLUR returns it unchanged """
+    if mode == MaskMode.BOX_SINGLE_BLUR:
+        return frame_diff
+    workspace = workspace or MaskWorkspace()
+    workspace.ensure_shape(frame_diff.shape)
+    return cv2.medianBlur(frame_diff, 3, dst=workspace.blurred_difference)
+
+
+def threshold_blurred_difference(frame_diff, mode=MaskMode.GAUSSIAN, workspace=None):
+    """ Local adaptive threshold of the (blurred) difference followed by a median blur of the mask """
+    workspace = workspace or MaskWorkspace()
+    workspace.ensure_shape(frame_diff.shape)
+
+    block_size = (ADAPTIVE_THRESHOLD_BLOCK_SIZE, ADAPTIVE_THRESHOLD_BLOCK_SIZE)
+    border_type = cv2.BORDER_REPLICATE | cv2.BORDER_ISOLATED
+    if mode == MaskMode.GAUSSIAN:
+        # the local mean of cv2.adaptiveThreshold(ADAPTIVE_THRESH_GAUSSIAN_C), which would allocate it on every call
+        local_mean = cv2.GaussianBlur(frame_diff, block_size, 0, dst=workspace.local_mean, borderType=border_type)
+    else:
+        # local mean from running sums - constant cost per pixel regardless of the block size
+        local_mean = cv2.boxFilter(
+            frame_diff,
+            -1,
+            block_size,
+            dst=workspace.local_mean,
+            normalize=True,
+            borderType=border_type
+        )
+    # THRESH_BINARY_INV of adaptiveThreshold: diff <= mean - C  <=>  diff + C - 1 < mean
+    # the addition saturates at 255, which is never below the mean, so saturated sums fail like the exact ones
+    # (diff + C <= mean would wrongly hold for differences of 253 and more where the mean is 255)
+    shifted = cv2.add(frame_diff, ADAPTIVE_THRESHOLD_C - 1, dst=workspace.shifted_difference)
+    mask = cv2.compare(shifted, local_mean, cv2.CMP_LT, dst=workspace.threshold_mask)
+
+    return cv2.medianBlur(mask, 3, dst=workspace.blurred_mask)
+
+
+def close_mask(mask, kernel=np.array((9, 9), dtype=np.uint8), workspace=None):
+    """ Morphological closing of the thresholded mask """
+    workspace = workspace or MaskWorkspace()
+    workspace.ensure_shape(mask.shape)
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, dst=workspace.mask, iterations=1)
+
+
+def get_mask_detections(mask, bbox_thresh=400, nms_thresh=1e-3):
+    """ Obtains detections from contours of the mask suppressing overlapping ones
+        Inputs:
+            mask - thresholded image mask
+            bbox_thresh - Minimum threshold area for declaring a bounding box
+            nms_thresh - IOU threshold for computing Non-Maximal Supression
+        Outputs:
+            detections - array of bounding boxes and scores [[x1,y1,x2,y2,s]]
+        """
+    # get initially proposed detections from contours
+    detections = get_contour_detections(mask, bbox_thresh)
 
-    return mask
+    # separate bboxes and scores
+    if len(detections) > 0:
+        # perform Non-Maximal Suppression on initial detections
+        indices_to_keep = non_max_suppression(detections, iou_threshold=nms_thresh)
+        return detections[indices_to_keep]
+    return np.zeros((len(detections), 5), dtype=np.float32)
 
 
-def get_detections(frame1, frame2, bbox_thresh=400, nms_thresh=1e-3, mask_kernel=np.array((9,9), dtype=np.uint8)):
+def get_detections(
+        frame1,
+        frame2,
+        bbox_thresh=400,
+        nms_thresh=1e-3,
+        mask_kernel=np.array((9,9), dtype=np.uint8),
+        mask_mode=MaskMode.GAUSSIAN,
+        mask_workspace=None
+):
     """ Main function to get detections via Frame Differencing
         Inputs:
             frame1 - Grayscale frame at time t
@@ -66,22 +184,16 @@ def get_detections(frame1, frame2, bbox_thresh=400, nms_thresh=1e-3, mask_kernel
             bbox_thresh - Minimum threshold area for declaring a bounding box
             nms_thresh - IOU threshold for computing Non-Maximal Supression
             mask_kernel - kernel for morphological operations on motion mask
+            mask_mode - MaskMode of the local adaptive threshold
+            mask_workspace - MaskWorkspace reused between frames by the box modes
         Outputs:
             detections - list with bounding box locations of all detections
                 bounding boxes are in the form of: (xmin, ymin, xmax, ymax)
         """
     # get image mask for moving pixels
-    mask = get_mask(frame1, frame2, mask_kernel)
+    mask = get_mask(frame1, frame2, mask_kernel, mask_mode, mask_workspace)
 
-    # get initially proposed detections from contours
-    detections = get_contour_detections(mask, bbox_thresh)
-
-    # separate bboxes and scores
-    if len(detections) > 0:
-        # perform Non-Maximal Suppression on initial detections
-        indices_to_keep = non_max_suppression(detections, iou_threshold=nms_thresh)
-        return detections[indices_to_keep]
-    return np.zeros((len(detections), 5), dtype=np.float32)
+    return get_mask_detections(mask, bbox_thresh, nms_thresh)
 
 
 def detections_to_numpy_array(detections: list[tuple]) -> np.array:
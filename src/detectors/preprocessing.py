@@ -0,0 +1,198 @@
+import collections
+from abc import abstractmethod
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Iterable, Optional
+
+import cv2
+import numpy as np
+
+from src.detectors.base import BaseDetector
+from src.detectors.functions import close_mask, MaskMode, MaskWorkspace, threshold_blurred_difference
+from src.types import BBoxList, NumpyImage
+
+
+class IntermediateKind(Enum):
+    # grayscale frame resized by the scale
+    GRAY = "gray"
+    # brightening against the previous frame (saturated subtraction)
+    DIFFERENCE = "difference"
+    # median blurred difference
+    BLURRED_DIFFERENCE = "blurred-difference"
+    # motion mask of `get_mask` - needs a mask mode
+    MASK = "mask"
+
+
+@dataclass(frozen=True)
+class Intermediate:
+    kind: IntermediateKind
+    scale: float = 1.0
+    mask_mode: MaskMode | None = None
+
+
+@dataclass
+class _ScaleBuffers:
+    resized: Optional[np.ndarray]
+    gray: np.ndarray
+    previous_gray: np.ndarray
+    difference: np.ndarray
+    blurred_difference: np.ndarray
+    masks: dict[MaskMode, MaskWorkspace] = field(default_factory=dict)
+    # gray was computed for the current frame
+    gray_computed: bool = False
+    # `previous_gray` holds the gray of the previous frame
+    has_previous: bool = False
+
+
+@dataclass
+class FrameGraph:
+    """
+    Intermediates of the current frame shared by several detectors - each is computed at most once per frame,
+    on first request, into buffers preallocated per scale. Returned arrays are read-only views
+    and are overwritten by the next frame.
+
+    The difference needs the gray of the previous frame at the same scale - it is available when the gray
+    was requested on the previous frame too (`compute` requests all declared intermediates up front).
+    When the full resolution gray of the frame is computed, grays of other scales are downscaled from it
+    instead of from the colour frame - about ten times cheaper. Differences and masks are computed per scale.
+    """
+    # number of times each intermediate was computed
+    computations: collections.Counter = field(init=False, default_factory=collections.Counter)
+    _frame: Optional[NumpyImage] = field(init=False, default=None)
+    _frame_shape: tuple[int, ...] = field(init=False, default=())
+    _scales: dict[float, _ScaleBuffers] = field(init=False, default_factory=dict)
+    _values: dict[Intermediate, Optional[np.ndarray]] = field(init=False, default_factory=dict)
+
+    def next_frame(self, frame: NumpyImage) -> "FrameGraph":
+        if frame.shape != self._frame_shape:
+            # buffers are reallocated for the new shape on first request
+            self._frame_shape = frame.shape
+            self._scales.clear()
+        for buffers in self._scales.values():
+            buffers.has_previous = buffers.gray_computed
+            if buffers.gray_computed:
+                buffers.gray, buffers.previous_gray = buffers.previous_gray, buffers.gray
+            buffers.gray_computed = False
+        self._frame = frame
+        self._values.clear()
+        return self
+
+    def reset(self) -> None:
+        """ Forgets the previous frame, so that the next frame has no difference - buffers are kept """
+        for buffers in self._scales.values():
+            buffers.gray_computed = False
+            buffers.has_previous = False
+        self._values.clear()
+
+    @property
+    def frame(self) -> NumpyImage:
+        return self._frame
+
+    def compute(self, intermediates: Iterable[Intermediate]) -> None:
+        # full resolution first, so that grays of the other scales are derived from its gray on every frame
+        for intermediate in sorted(intermediates, key=lambda intermediate: intermediate.scale != 1.0):
+            self.get(intermediate)
+
+    def get(self, intermediate: Intermediate) -> Optional[np.ndarray]:
+        match intermediate.kind:
+            case IntermediateKind.GRAY:
+                return self.gray(intermediate.scale)
+            case IntermediateKind.DIFFERENCE:
+                return self.difference(intermediate.scale)
+            case IntermediateKind.BLURRED_DIFFERENCE:
+                return self.blurred_difference(intermediate.scale)
+            case IntermediateKind.MASK:
+                return self.mask(intermediate.scale, intermediate.mask_mode)
+        raise ValueError(f"Unknown intermediate {intermediate}")
+
+    def gray(self, scale: float = 1.0) -> np.ndarray:
+        key = Intermediate(IntermediateKind.GRAY, scale)
+        if key not in self._values:
+            buffers = self._buffers(scale)
+            full_gray = self._values.get(Intermediate(IntermediateKind.GRAY)) if scale != 1.0 else None
+            if full_gray is not None:
+                cv2.resize(full_gray, None, dst=buffers.gray, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            else:
+                frame = self._frame
+                if scale != 1.0:
+                    frame = cv2.resize(
+                        frame, None, dst=buffers.resized, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+                    )
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffers.gray)
+            buffers.gray_computed = True
+            self._store(key, buffers.gray)
+        return self._values[key]
+
+    def difference(self, scale: float = 1.0) -> Optional[np.ndarray]:
+        """ None on the first frame (of a new shape) """
+        key = Intermediate(IntermediateKind.DIFFERENCE, scale)
+        if key not in self._values:
+            gray = self.gray(scale)
+            buffers = self._scales[scale]
+            if not buffers.has_previous:
+                self._values[key] = None
+            else:
+                self._store(key, cv2.subtract(gray, buffers.previous_gray, dst=buffers.difference))
+        return self._values[key]
+
+    def blurred_difference(self, scale: float = 1.0) -> Optional[np.ndarray]:
+        key = Intermediate(IntermediateKind.BLURRED_DIFFERENCE, scale)
+        if key not in self._values:
+            difference = self.difference(scale)
+            if difference is None:
+                self._values[key] = None
+            else:
+                buffers = self._scales[scale]
+                self._store(key, cv2.medianBlur(difference, 3, dst=buffers.blurred_difference))
+        return self._values[key]
+
+    def mask(self, scale: float = 1.0, mode: MaskMode = MaskMode.GAUSSIAN) -> Optional[np.ndarray]:
+        """ The mask of `get_mask` (with its default kernel) """
+        key = Intermediate(IntermediateKind.MASK, scale, mode)
+        if key not in self._values:
+            difference = self.difference(scale) if mode == MaskMode.BOX_SINGLE_BLUR else self.blurred_difference(scale)
+            if difference is None:
+                self._values[key] = None
+            else:
+                buffers = self._scales[scale]
+                workspace = buffers.masks.get(mode)
+                if workspace is None:
+                    workspace = buffers.masks[mode] = MaskWorkspace()
+                    workspace.ensure_shape(difference.shape)
+                mask = threshold_blurred_difference(difference, mode, workspace)
+                self._store(key, close_mask(mask, workspace=workspace))
+        return self._values[key]
+
+    def _store(self, key: Intermediate, value: np.ndarray) -> None:
+        view = value.view()
+        view.flags.writeable = False
+        self._values[key] = view
+        self.computations[key] += 1
+
+    def _buffers(self, scale: float) -> _ScaleBuffers:
+        buffers = self._scales.get(scale)
+        if buffers is None:
+            height, width = self._frame_shape[:2]
+            # size of cv2.resize with fx / fy
+            small_shape = (round(height * scale), round(width * scale))
+            buffers = self._scales[scale] = _ScaleBuffers(
+                resized=np.empty((*small_shape, *self._frame_shape[2:]), dtype=np.uint8) if scale != 1.0 else None,
+                gray=np.empty(small_shape, dtype=np.uint8),
+                previous_gray=np.empty(small_shape, dtype=np.uint8),
+                difference=np.empty(small_shape, dtype=np.uint8),
+                blurred_difference=np.empty(small_shape, dtype=np.uint8)
+            )
+        return buffers
+
+
+class GraphDetector(BaseDetector):
+    """ Detector which reads its inputs from a `FrameGraph`, so that an ensemble can share them """
+
+    @property
+    @abstractmethod
+    def intermediates(self) -> frozenset[Intermediate]:
+        """ Intermediates the detector reads every frame """
+
+    @abstractmethod
+    def detect(self, graph: FrameGraph) -> BBoxList:
+        """ Detections of the current frame of the graph, the graph must not be modified """
@@ -0,0 +1,123 @@
+from dataclasses import dataclass, field
+from enum import Enum
+
+import numpy as np
+
+
+class ProjectionMode(Enum):
+    # brightest value of every pixel in the window - the trail of a moving object
+    MAX = "max"
+    # saturated sum of the window - accumulates faint, slowly moving signal
+    SUM = "sum"
+
+
+@dataclass
+class SlidingMaxProjection:
+    """
+    Maximum of the last `window` images in a constant number of passes per image - at most four maxima and a copy,
+    whatever the window length (van Herk / Gil-Werman with the suffix maxima computed incrementally).
+
+    Time is split into blocks of `window // 2` images. The window ending at position p of the current block is
+    max(suffix maximum of the block before the previous one from p + 1 (p for an odd window), maximum of
+    the whole previous block, prefix maximum of the current block up to p). Suffix maxima of a block are computed
+    in place one per image during the following block, so they are complete by the time they are read -
+    there is no periodic rebuild on the streaming thread. Raw images of the current block overwrite suffix maxima
+    which have already been read.
+    All planes are preallocated - `push` allocates nothing and returns a view which is overwritten by the next call.
+    """
+    window: int
+    shape: tuple[int, ...]
+    dtype: type = np.uint8
+
+    # suffix maxima of the block before the previous one, overwritten by raw images of the current block
+    _suffixes: np.ndarray = field(init=False)
+    # raw images of the previous block, turned into suffix maxima from the end one image at a time
+    _pending: np.ndarray = field(init=False)
+    _previous_block_max: np.ndarray = field(init=False)
+    _prefix: np.ndarray = field(init=False)
+    _projection: np.ndarray = field(init=False)
+    _block: int = field(init=False)
+    _position: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        if self.window < 1:
+            raise ValueError(f"Window has to contain at least one image, got {self.window}")
+        self._block = self.window // 2
+        self._suffixes = np.zeros((self._block, *self.shape), dtype=self.dtype)
+        self._pending = np.zeros((self._block, *self.shape), dtype=self.dtype)
+        self._previous_block_max = np.zeros(self.shape, dtype=self.dtype)
+        self._prefix = np.zeros(self.shape, dtype=self.dtype)
+        self._projection = np.zeros(self.shape, dtype=self.dtype)
+
+    def push(self, image: np.ndarray) -> np.ndarray:
+        if self._block == 0:
+            self._projection[...] = image
+            return self._projection
+
+        position = self._position
+        if position == 0:
+            self._prefix[...] = image
+        else:
+            np.maximum(self._prefix, image, out=self._prefix)
+        np.maximum(self._prefix, self._previous_block_max, out=self._projection)
+        # an odd window reaches one image further into the block before the previous one
+        suffix_start = position + 1 - self.window % 2
+        if suffix_start < self._block:
+            np.maximum(self._projection, self._suffixes[suffix_start], out=self._projection)
+
+        # suffix maxima up to `suffix_start` have been read
+        self._suffixes[position] = image
+        pending_index = self._block - 1 - position
+        if pending_index < self._block - 1:
+            np.maximum(self._pending[pending_index], self._pending[pending_index + 1], out=self._pending[pending_index])
+
+        if position == self._block - 1:
+            # the current block becomes the previous one, the suffix maxima of the previous one are complete
+            self._prefix, self._previous_block_max = self._previous_block_max, self._prefix
+            self._suffixes, self._pending = self._pending, self._suffixes
+        self._position = (position + 1) % self._block
+        return self._projection
+
+
+@dataclass
+class SlidingSumProjection:
+    """
+    Sum of the last `window` images saturated to the image type, updated with one addition and one eviction per image.
+    The running sum is kept in 32 bits, all planes are preallocated and `push` returns a view which is
+    overwritten by the next call.
+    """
+    window: int
+    shape: tuple[int, ...]
+    dtype: type = np.uint8
+
+    _planes: np.ndarray = field(init=False)
+    _sum: np.ndarray = field(init=False)
+    _projection: np.ndarray = field(init=False)
+    _position: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        if self.window < 1:
+            raise ValueError(f"Window has to contain at least one image, got {self.window}")
+        self._planes = np.zeros((self.window, *self.shape), dtype=self.dtype)
+        self._sum = np.zeros(self.shape, dtype=np.int32)
+        self._projection = np.zeros(self.shape, dtype=self.dtype)
+
+    def push(self, image: np.ndarray) -> np.ndarray:
+        evicted = self._planes[self._position]
+        np.subtract(self._sum, evicted, out=self._sum)
+        np.add(self._sum, image, out=self._sum)
+        evicted[...] = image
+        self._position = (self._position + 1) % self.window
+        np.minimum(self._sum, np.iinfo(self.dtype).max, out=self._projection, casting="unsafe")
+        return self._projection
+
+
+def create_projection(
+        mode: ProjectionMode, window: int, shape: tuple[int, ...]
+) -> SlidingMaxProjection | SlidingSumProjection:
+    match mode:
+        case ProjectionMode.MAX:
+            return SlidingMaxProjection(window=window, shape=shape)
+        case ProjectionMode.SUM:
+            return SlidingSumProjection(window=window, shape=shape)
+    raise ValueError(f"Unknown projection {mode}")
@@ -0,0 +1,68 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from src.detectors.functions import get_mask_detections, MaskMode, MaskWorkspace, threshold_difference
+from src.detectors.preprocessing import FrameGraph, GraphDetector, Intermediate, IntermediateKind
+from src.detectors.projection import create_projection, ProjectionMode, SlidingMaxProjection, SlidingSumProjection
+from src.detectors.suppression import SuppressionMap
+from src.types import NumpyImage, BBoxList
+
+
+@dataclass
+class StackingDetector(GraphDetector):
+    """
+    Detects on a projection of the last `window` frame differences instead of a single one.
+
+    A dim meteor barely passes the threshold in a single difference and leaves only a few pixels in the mask.
+    The max projection of the differences contains its whole trail over the window, large enough
+    to pass `bbox_threshold` - so detection can run at a lower resolution (`scale`) and a higher threshold.
+    Boxes cover the trail within the window and are returned in full resolution.
+    """
+    bbox_threshold: float = 100
+    nms_threshold: float = 1e-3
+    window: int = 8
+    projection: ProjectionMode = ProjectionMode.MAX
+    # frames are resized by this factor before differencing
+    scale: float = 0.5
+    mask_mode: MaskMode = MaskMode.BOX
+    # clears cells of the projected mask which are active most of the time, see `SuppressionMap`
+    suppression: Optional[SuppressionMap] = None
+
+    _graph: FrameGraph = field(init=False, default_factory=FrameGraph)
+    _projection: SlidingMaxProjection | SlidingSumProjection | None = field(init=False, default=None)
+    _mask_workspace: MaskWorkspace = field(init=False, default_factory=MaskWorkspace)
+
+    @property
+    def intermediates(self) -> frozenset[Intermediate]:
+        return frozenset({Intermediate(IntermediateKind.DIFFERENCE, self.scale)})
+
+    def update(self, frame: NumpyImage) -> BBoxList:
+        return self.detect(self._graph.next_frame(frame))
+
+    def reset(self) -> None:
+        self._graph.reset()
+        # the window holds differences of frames which are no longer current
+        self._projection = None
+
+    def detect(self, graph: FrameGraph) -> BBoxList:
+        difference = graph.difference(self.scale)
+        if difference is None:
+            return np.zeros((0, 5), dtype=np.float32)
+        if self._projection is None or self._projection.shape != difference.shape:
+            self._projection = create_projection(self.projection, self.window, difference.shape)
+
+        projection = self._projection.push(difference)
+        mask = threshold_difference(projection, mode=self.mask_mode, workspace=self._mask_workspace)
+        if self.suppression is not None:
+            self.suppression.apply(mask)
+        bboxes = get_mask_detections(
+            mask,
+            bbox_thresh=self.bbox_threshold * self.scale ** 2,
+            nms_thresh=self.nms_threshold
+        ).astype(np.float32)
+        if self.scale != 1.0 and len(bboxes) > 0:
+            bboxes[:, :4] /= self.scale
+            bboxes[:, 4] /= self.scale ** 2
+        return bboxes
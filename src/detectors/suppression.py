@@ -0,0 +1,104 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from src.metrics.camera import CameraMetrics
+
+
+def _count_contours(mask: np.ndarray) -> int:
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return len(contours)
+
+
+@dataclass
+class SuppressionMap:
+    """
+    Learns cells of the motion mask which are active most of the time - hot pixels, twinkling stars,
+    compression artefacts around static edges - and clears them from the mask before contours are extracted.
+
+    Every frame the mask is reduced to cells of `cell_size` pixels (a single `cv2.resize`) and the active cells
+    are collected. Every `update_every_n_frames` frames the share of such windows in which each cell was active
+    is updated as an exponential moving average (`decay` per window), so cells are released again once
+    the artefact goes away. Cells active in more than `threshold` of the windows are suppressed.
+    A meteor crosses a cell within a few frames and never gets close to it.
+    """
+    cell_size: int = 8
+    update_every_n_frames: int = 10
+    # weight of the history per window - 0.98 halves the influence of a window after ~35 windows
+    decay: float = 0.98
+    threshold: float = 0.3
+    metrics: Optional[CameraMetrics] = None
+
+    # share of contours of the last sampled mask which were suppressed
+    suppressed_contour_share: float = field(init=False, default=0.0)
+    suppressed_cells: int = field(init=False, default=0)
+    _frame_num: int = field(init=False, default=0)
+    _mask_shape: tuple[int, ...] = field(init=False, default=())
+    _cells: Optional[np.ndarray] = field(init=False, default=None)
+    # max of the cells over the current window
+    _window: Optional[np.ndarray] = field(init=False, default=None)
+    _frequency: Optional[np.ndarray] = field(init=False, default=None)
+    # 0 on suppressed pixels, 255 elsewhere - in the resolution of the mask
+    _keep: Optional[np.ndarray] = field(init=False, default=None)
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """ Number of cell rows and columns """
+        return () if self._frequency is None else self._frequency.shape
+
+    @property
+    def frequency(self) -> Optional[np.ndarray]:
+        return self._frequency
+
+    def apply(self, mask: np.ndarray) -> np.ndarray:
+        """ Learns from the mask and clears its suppressed cells in place """
+        if mask.shape != self._mask_shape:
+            self._allocate(mask.shape)
+
+        rows, columns = self._frequency.shape
+        cv2.resize(mask, (columns, rows), dst=self._cells, interpolation=cv2.INTER_AREA)
+        cv2.max(self._cells, self._window, dst=self._window)
+        self._frame_num += 1
+        learn = self._frame_num % self.update_every_n_frames == 0
+        if learn:
+            self._learn()
+
+        if not self.suppressed_cells:
+            return mask
+        contours_before = _count_contours(mask) if learn else 0
+        cv2.bitwise_and(mask, self._keep, dst=mask)
+        if learn:
+            self._report(contours_before, _count_contours(mask))
+        return mask
+
+    def _learn(self) -> None:
+        self._frequency *= self.decay
+        self._frequency[self._window > 0] += 1.0 - self.decay
+        self._window.fill(0)
+
+        suppressed = self._frequency > self.threshold
+        self.suppressed_cells = int(np.count_nonzero(suppressed))
+        if self.suppressed_cells:
+            keep = np.where(suppressed, 0, 255).astype(np.uint8)
+            cv2.resize(keep, self._keep.shape[::-1], dst=self._keep, interpolation=cv2.INTER_NEAREST)
+        else:
+            self._report(0, 0)
+
+    def _report(self, contours_before: int, contours_after: int) -> None:
+        self.suppressed_contour_share = 1.0 - contours_after / contours_before if contours_before else 0.0
+        if self.metrics is not None:
+            self.metrics.suppressed_cells.set(self.suppressed_cells)
+            self.metrics.suppressed_contour_share.set(self.suppressed_contour_share)
+
+    def _allocate(self, shape: tuple[int, ...]) -> None:
+        self._mask_shape = shape
+        cells_shape = (max(1, shape[0] // self.cell_size), max(1, shape[1] // self.cell_size))
+        self._cells = np.empty(cells_shape, dtype=np.uint8)
+        self._window = np.zeros(cells_shape, dtype=np.uint8)
+        self._frequency = np.zeros(cells_shape, dtype=np.float32)
+        self._keep = np.full(shape, 255, dtype=np.uint8)
+        self.suppressed_cells = 0
+        if self.metrics is not None:
+            self.metrics.suppression_map_cells.set(cells_shape[0] * cells_shape[1])
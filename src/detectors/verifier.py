@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from src.types import NumpyImage
+
+
+@dataclass(frozen=True)
+class StreakVerifier:
+    """
+    Checks whether the change inside a candidate box looks like a meteor streak.
+
+    The brightening between the previous and the current crop has to be strong enough (`min_contrast`)
+    and its bright pixels have to lie along a line - the ratio of the principal axes of their
+    intensity weighted distribution is at least `min_elongation`. Sensor noise, twinkling stars
+    and most insects form compact blobs and fail the check.
+    Only crops are touched, so the cost does not depend on the frame resolution.
+    """
+    # pixels around the candidate box included in the crop
+    margin: int = 8
+    # longer side of the analysed crop, larger crops are downscaled
+    max_crop_size: int = 128
+    min_contrast: float = 12.0
+    min_pixels: int = 4
+    min_elongation: float = 2.0
+
+    def crop(self, frame: NumpyImage, previous_frame: NumpyImage, box: np.ndarray) -> tuple[NumpyImage, NumpyImage]:
+        """ Copies the candidate area of both frames, the copies can be verified on another thread """
+        height, width = frame.shape[:2]
+        x0 = max(0, int(box[0]) - self.margin)
+        y0 = max(0, int(box[1]) - self.margin)
+        x1 = min(width, int(np.ceil(box[2])) + self.margin)
+        y1 = min(height, int(np.ceil(box[3])) + self.margin)
+        return frame[y0:y1, x0:x1].copy(), previous_frame[y0:y1, x0:x1].copy()
+
+    def verify(self, crop: NumpyImage, previous_crop: NumpyImage) -> bool:
+        if crop.size == 0:
+            return False
+        if crop.ndim == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            previous_crop = cv2.cvtColor(previous_crop, cv2.COLOR_BGR2GRAY)
+        difference = cv2.subtract(crop, previous_crop)
+
+        longer_side = max(difference.shape)
+        if longer_side > self.max_crop_size:
+            scale = self.max_crop_size / longer_side
+            difference = cv2.resize(difference, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        background = float(np.median(difference))
+        contrast = float(difference.max()) - background
+        if contrast < self.min_contrast:
+            return False
+
+        ys, xs = np.nonzero(difference >= background + contrast / 2)
+        if len(xs) < self.min_pixels:
+            return False
+        weights = difference[ys, xs].astype(np.float64) - background
+        coordinates = np.stack([xs, ys]).astype(np.float64)
+        covariance = np.cov(coordinates, aweights=weights)
+        minor, major = np.linalg.eigvalsh(covariance)
+        # a single-pixel wide line still has some spread across its axis
+        return np.sqrt(major / max(minor, 1.0 / 12)) >= self.min_elongation
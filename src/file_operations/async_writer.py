@@ -0,0 +1,102 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.file_operations.images import draw_tracks_numpy
+from src.metrics.camera import CameraMetrics
+from src.types import NumpyImage, BBoxList
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewFormat(Enum):
+    JPEG = "jpg"
+    WEBP = "webp"
+
+    @property
+    def quality_flag(self) -> int:
+        match self:
+            case PreviewFormat.JPEG:
+                return cv2.IMWRITE_JPEG_QUALITY
+            case PreviewFormat.WEBP:
+                return cv2.IMWRITE_WEBP_QUALITY
+
+
+@dataclass
+class AsyncImageWriter:
+    """
+    Writes preview images on a small thread pool so that the streaming thread never waits for encoding.
+
+    The calling thread only downscales the frame (which is also the copy the workers own),
+    drawing and `cv2.imencode` happen on the workers. When `max_pending` images are already waiting
+    new previews are dropped instead of queued.
+    """
+    output_directory: Path
+    image_format: PreviewFormat = PreviewFormat.JPEG
+    quality: int = 85
+    # longer side of the preview image in pixels, `None` keeps the original resolution
+    max_size: int | None = 1280
+    max_pending: int = 8
+    workers: int = 2
+    metrics: CameraMetrics | None = None
+    _image_number: int = field(init=False, default=0)
+    _pending: threading.BoundedSemaphore = field(init=False)
+    _executor: ThreadPoolExecutor = field(init=False)
+
+    def __post_init__(self):
+        self.output_directory.mkdir(parents=True, exist_ok=True)
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preview-writer")
+
+    def save_preview(self, frame: NumpyImage, bboxes: BBoxList) -> bool:
+        """ Returns False when the preview has been dropped because the queue is full """
+        if not self._pending.acquire(blocking=False):
+            logger.warning("Preview writer queue is full - dropping preview image")
+            if self.metrics is not None:
+                self.metrics.previews_dropped.inc()
+            return False
+
+        scale = self._get_scale(frame)
+        if scale < 1.0:
+            small_frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            small_frame = np.copy(frame)
+        scaled_bboxes = np.array(bboxes, dtype=np.float32).reshape(-1, 5)
+        scaled_bboxes[:, :4] *= scale
+
+        output_path = self.output_directory / f"{self._image_number}.{self.image_format.value}"
+        self._image_number += 1
+        self._executor.submit(self._write, small_frame, scaled_bboxes, output_path)
+        return True
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _get_scale(self, frame: NumpyImage) -> float:
+        if self.max_size is None:
+            return 1.0
+        return min(1.0, self.max_size / max(frame.shape[:2]))
+
+    def _write(self, frame: NumpyImage, bboxes: BBoxList, output_path: Path) -> None:
+        try:
+            # previews are scaled down, so the box outline is scaled as well
+            painted_frame = draw_tracks_numpy(frame, bboxes, thickness=2, copy=False)
+            success, encoded = cv2.imencode(
+                f".{self.image_format.value}",
+                painted_frame,
+                [self.image_format.quality_flag, self.quality]
+            )
+            if not success:
+                logger.error(f"Unable to encode preview image {output_path}")
+                return
+            encoded.tofile(str(output_path))
+        except Exception as e:
+            logger.error(f"Unable to write preview image {output_path}. Error = {e}")
+        finally:
+            self._pending.release()
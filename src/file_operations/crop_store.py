@@ -0,0 +1,236 @@
+import collections
+import json
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from src.types import NumpyImage, BBoxList
+
+logger = logging.getLogger(__name__)
+
+INDEX_DTYPE = np.dtype([
+    ("pts", np.int64),
+    ("track_id", np.int64),
+    # track box in frame coordinates
+    ("bbox", np.float32, (4,)),
+    # top left corner of the crop in the frame
+    ("origin", np.int32, (2,)),
+])
+INDEX_FILE_NAME = "index.npy"
+METADATA_FILE_NAME = "metadata.json"
+PTS_NONE = -1
+
+
+def crop_around(frame: NumpyImage, bbox: np.ndarray, size: int) -> tuple[NumpyImage, tuple[int, int]]:
+    """ Copies a `size` x `size` crop centred on the box, shifted to stay inside the frame """
+    height, width = frame.shape[:2]
+    centre_x = int((bbox[0] + bbox[2]) / 2)
+    centre_y = int((bbox[1] + bbox[3]) / 2)
+    x0 = min(max(0, centre_x - size // 2), max(0, width - size))
+    y0 = min(max(0, centre_y - size // 2), max(0, height - size))
+    crop = np.zeros((size, size, *frame.shape[2:]), dtype=frame.dtype)
+    region = frame[y0:y0 + size, x0:x0 + size]
+    crop[:region.shape[0], :region.shape[1]] = region
+    return crop, (x0, y0)
+
+
+@dataclass
+class EventCrops:
+    """
+    Reads crops of a single event without loading them - every chunk is memory-mapped.
+
+        crops = EventCrops(Path("data/crops/recording-3-date-..."))
+        for entry, crop in zip(crops.index, crops):
+            ...
+    """
+    directory: Path
+    index: np.ndarray = field(init=False)
+    chunk_size: int = field(init=False)
+    _chunks: list[np.ndarray] = field(init=False)
+
+    def __post_init__(self):
+        metadata = json.loads((self.directory / METADATA_FILE_NAME).read_text())
+        self.chunk_size = metadata["chunk_size"]
+        self.index = np.load(self.directory / INDEX_FILE_NAME)
+        self._chunks = [
+            np.load(self.directory / name, mmap_mode="r") for name in metadata["chunks"]
+        ]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, position: int) -> np.ndarray:
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return self._chunks[position // self.chunk_size][position % self.chunk_size]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for chunk in self._chunks:
+            yield from chunk
+
+    def track(self, track_id: int) -> tuple[np.ndarray, list[np.ndarray]]:
+        """ Index entries and crops of a single track """
+        positions = np.flatnonzero(self.index["track_id"] == track_id)
+        return self.index[positions], [self[position] for position in positions]
+
+
+@dataclass
+class _EventWriter:
+    directory: Path
+    crop_size: int
+    chunk_size: int
+    metadata: dict
+    _chunk: np.ndarray | None = field(init=False, default=None)
+    _chunk_names: list[str] = field(init=False, default_factory=list)
+    _rows_in_chunk: int = field(init=False, default=0)
+    _index: list[tuple] = field(init=False, default_factory=list)
+
+    def __post_init__(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def add(self, crop: NumpyImage, entry: tuple) -> None:
+        if self._chunk is None or self._rows_in_chunk == self.chunk_size:
+            self._flush_chunk()
+            name = f"crops-{len(self._chunk_names):05d}.npy"
+            self._chunk_names.append(name)
+            self._chunk = np.lib.format.open_memmap(
+                self.directory / name,
+                mode="w+",
+                dtype=crop.dtype,
+                shape=(self.chunk_size, *crop.shape)
+            )
+            self._rows_in_chunk = 0
+        self._chunk[self._rows_in_chunk] = crop
+        self._rows_in_chunk += 1
+        self._index.append(entry)
+
+    def close(self) -> None:
+        self._flush_chunk(last=True)
+        np.save(self.directory / INDEX_FILE_NAME, np.array(self._index, dtype=INDEX_DTYPE))
+        metadata = {
+            **self.metadata,
+            "crop_size": self.crop_size,
+            "chunk_size": self.chunk_size,
+            "chunks": self._chunk_names,
+            "count": len(self._index),
+        }
+        (self.directory / METADATA_FILE_NAME).write_text(json.dumps(metadata, indent=2))
+
+    def _flush_chunk(self, last: bool = False) -> None:
+        if self._chunk is None:
+            return
+        self._chunk.flush()
+        if last and self._rows_in_chunk < self.chunk_size:
+            # trim the unused rows of the last chunk
+            rows = np.array(self._chunk[:self._rows_in_chunk])
+            path = Path(self._chunk.filename)
+            del self._chunk
+            np.save(path, rows)
+        self._chunk = None
+
+
+@dataclass
+class CropStore:
+    """
+    Stores fixed-size crops around confirmed tracks, so that classification or photometry of an event
+    reads kilobytes instead of decoding the whole recording.
+
+    Crops of an event are written into chunks of `chunk_size` crops (`crops-00000.npy`, ... memory-mappable
+    `.npy` files) with an `index.npy` of PTS, track id and boxes, read them with `EventCrops`.
+    The calling thread only copies the crops, files are written by a background thread. Crops of the last
+    `pre_event_frames` frames are kept in memory and written at the beginning of the next event,
+    so the frames which triggered it are not lost. When the writer falls behind, crops are dropped.
+    """
+    output_directory: Path
+    camera_id: str
+    crop_size: int = 64
+    chunk_size: int = 1024
+    pre_event_frames: int = 30
+    max_pending: int = 256
+
+    _event_open: bool = field(init=False, default=False)
+    _recent: collections.deque = field(init=False)
+    _queue: queue.Queue = field(init=False)
+    _thread: threading.Thread = field(init=False)
+    dropped_crops: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self._recent = collections.deque(maxlen=self.pre_event_frames)
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._thread = threading.Thread(target=self._run, name="crop-store", daemon=True)
+        self._thread.start()
+
+    def add(self, frame: NumpyImage, tracks: BBoxList, pts: int | None) -> None:
+        """ `tracks` in the Sort output format - [[x0, y0, x1, y1, track_id]] """
+        if tracks.size == 0:
+            self._recent.append(None)
+            return
+        crops = []
+        for track in tracks:
+            crop, origin = crop_around(frame, track, self.crop_size)
+            crops.append((crop, (PTS_NONE if pts is None else pts, int(track[4]), track[:4], origin)))
+        if self._event_open:
+            self._put(("crops", crops))
+        else:
+            self._recent.append(crops)
+
+    def begin_event(self, name: str) -> None:
+        if self._event_open:
+            self.end_event()
+        self._put(("begin", name))
+        self._event_open = True
+        for crops in self._recent:
+            if crops is not None:
+                self._put(("crops", crops))
+        self._recent.clear()
+
+    def end_event(self) -> None:
+        if not self._event_open:
+            return
+        self._event_open = False
+        # an event has to be closed even when the writer is behind
+        self._queue.put(("end", None))
+
+    def close(self) -> None:
+        self.end_event()
+        self._queue.put(("stop", None))
+        self._thread.join()
+
+    def _put(self, message: tuple) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            if message[0] == "crops":
+                self.dropped_crops += len(message[1])
+                logger.warning("Crop store is behind - dropping crops")
+            else:
+                self._queue.put(message)
+
+    def _run(self) -> None:
+        writer = None
+        while True:
+            kind, payload = self._queue.get()
+            try:
+                if kind == "begin":
+                    writer = _EventWriter(
+                        directory=self.output_directory / payload,
+                        crop_size=self.crop_size,
+                        chunk_size=self.chunk_size,
+                        metadata={"camera": self.camera_id, "event": payload}
+                    )
+                elif kind == "crops" and writer is not None:
+                    for crop, entry in payload:
+                        writer.add(crop, entry)
+                elif kind in ("end", "stop") and writer is not None:
+                    writer.close()
+                    writer = None
+                if kind == "stop":
+                    return
+            except OSError as e:
+                logger.error(f"Could not write crops: {e}")
+                writer = None
@@ -28,3 +28,25 @@ class ImageGenerator:
 
     def __len__(self) -> int:
         return len(self.image_paths)
+
+
+@dataclass
+class VideoGenerator:
+    video_path: Path
+
+    def __iter__(self) -> Iterator[NumpyImage]:
+        capture = cv2.VideoCapture(str(self.video_path))
+        try:
+            while True:
+                success, frame = capture.read()
+                if not success:
+                    break
+                yield frame
+        finally:
+            capture.release()
+
+    def __len__(self) -> int:
+        capture = cv2.VideoCapture(str(self.video_path))
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+        return frame_count
@@ -4,38 +4,43 @@ from glob import glob
 from pathlib import Path
 
 import numpy as np
-from PIL import Image
 
 import cv2
-from matplotlib import pyplot as plt
 
 from src.types import NumpyImage, BBoxList
 
+# PIL and matplotlib are imported inside the functions using them,
+# the production entry point only needs `draw_tracks_numpy` and loads neither of them
+
 
 def get_image_paths(images_dir: Path, image_extension: str) -> list[str]:
     image_paths = sorted(glob(f"{images_dir}/*.{image_extension}"),
-                         key=lambda x: float(re.findall(r"(\d+)", x)[0]))
+                         key=lambda x: float(re.findall(r"(\d+)", Path(x).name)[0]))
     return image_paths
 
 
-def draw_tracks_numpy(frame: NumpyImage, tracks: BBoxList) -> NumpyImage:
-    frame_copy = np.copy(frame)
+def draw_tracks_numpy(frame: NumpyImage, tracks: BBoxList, thickness: int = 3, copy: bool = True) -> NumpyImage:
+    frame_copy = np.copy(frame) if copy else frame
     for det in tracks:
         cv2.rectangle(
             frame_copy,
             (int(det[0]),int(det[1])),
             (int(det[2]),int(det[3])),
-            (0,255,0), 3
+            (0,255,0), thickness
         )
     return frame_copy
 
 
 def save_numpy_image(image: NumpyImage, image_output_path: Path) -> None:
+    from PIL import Image
+
     im = Image.fromarray(image)
     im.save(str(image_output_path.absolute()))
 
 
 def save_as_plot(image: NumpyImage, image_output_path: Path) -> None:
+    from matplotlib import pyplot as plt
+
     fig = plt.figure(figsize=(15, 7))
     plt.imshow(image)
     plt.axis('off')
@@ -44,7 +49,7 @@ def save_as_plot(image: NumpyImage, image_output_path: Path) -> None:
 
 
 def create_gif_from_images(save_path : str, image_path : str, ext : str) -> None:
-    """ Creates a GIF from a folder of images
+    """ Creates a GIF from a folder of images, streaming them one at a time
         Inputs:
             save_path - path to save GIF
             image_path - path where images are located
@@ -52,10 +57,12 @@ def create_gif_from_images(save_path : str, image_path : str, ext : str) -> None
         Outputs:
             None
     """
+    from src.file_operations.previews import GifWriter
+
     ext = ext.replace('.', '')
     image_paths = sorted(glob(os.path.join(image_path, f'*.{ext}')))
     image_paths.sort(key=lambda f: int(''.join(filter(str.isdigit, f))))
-    pil_images = [Image.open(im_path) for im_path in image_paths]
 
-    pil_images[0].save(save_path, format='GIF', append_images=pil_images,
-                       save_all=True, duration=50, loop=0)
+    with GifWriter(Path(save_path), frame_duration_ms=50) as writer:
+        for im_path in image_paths:
+            writer.write(cv2.imread(im_path))
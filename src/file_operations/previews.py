@@ -0,0 +1,235 @@
+import io
+import logging
+import struct
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+import cv2
+import numpy as np
+
+from src.types import NumpyImage
+
+logger = logging.getLogger(__name__)
+
+GIF_TRAILER = b"\x3b"
+GIF_EXTENSION = 0x21
+GIF_IMAGE_DESCRIPTOR = 0x2c
+
+
+class ClipPreviewFormat(Enum):
+    GIF = "gif"
+    # small H.264 file encoded by GStreamer
+    MP4 = "mp4"
+
+    @classmethod
+    def from_path(cls, path: Path) -> "ClipPreviewFormat":
+        return cls(path.suffix.lstrip(".").lower())
+
+
+def fit_preview_size(shape: tuple[int, ...], max_size: int | None, even: bool = False) -> tuple[int, int]:
+    """ (width, height) of a frame downscaled so that its longer side is at most `max_size` """
+    height, width = shape[:2]
+    scale = 1.0 if max_size is None else min(1.0, max_size / max(height, width))
+    width, height = max(1, round(width * scale)), max(1, round(height * scale))
+    if even:
+        # 4:2:0 chroma subsampling of H.264 needs even dimensions
+        width, height = max(2, width - width % 2), max(2, height - height % 2)
+    return width, height
+
+
+def resize_to(frame: NumpyImage, size: tuple[int, int]) -> NumpyImage:
+    if (frame.shape[1], frame.shape[0]) == size:
+        return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def to_bgr(frame: NumpyImage) -> NumpyImage:
+    if frame.ndim == 2 or frame.shape[2] == 1:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    return frame
+
+
+@dataclass
+class GifWriter:
+    """
+    Appends frames to an animated GIF one at a time - memory does not grow with the number of frames.
+
+    Every frame is palette-quantised on its own (local colour table) and LZW-encoded by Pillow as a
+    single-frame GIF, its image block is then copied into the output file.
+    The size of the animation is taken from the first frame, later frames are resized to it.
+
+        with GifWriter(Path("preview.gif"), frame_duration_ms=100) as writer:
+            for frame in frames:
+                writer.write(frame)
+    """
+    output_path: Path
+    frame_duration_ms: int = 100
+    colors: int = 256
+    # 0 repeats the animation forever
+    loop: int = 0
+    frames_written: int = field(init=False, default=0)
+    _size: tuple[int, int] | None = field(init=False, default=None)
+    _file: BinaryIO | None = field(init=False, default=None)
+
+    def __enter__(self) -> "GifWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, frame: NumpyImage) -> None:
+        """ Appends a BGR (or grayscale) frame """
+        if self._file is None:
+            self._size = (frame.shape[1], frame.shape[0])
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.output_path.open("wb")
+            self._write_header()
+        frame = resize_to(to_bgr(frame), self._size)
+        self._file.write(self._graphic_control_extension())
+        self._file.write(self._encode_image_block(frame))
+        self.frames_written += 1
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._file.write(GIF_TRAILER)
+        self._file.close()
+        self._file = None
+
+    def _write_header(self) -> None:
+        width, height = self._size
+        # logical screen without a global colour table - every frame carries its own palette
+        self._file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0, 0, 0))
+        self._file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", self.loop) + b"\x00")
+
+    def _graphic_control_extension(self) -> bytes:
+        # disposal method 1 (keep the frame), no transparency
+        delay = max(1, round(self.frame_duration_ms / 10))
+        return b"\x21\xf9\x04" + struct.pack("<BHB", 1 << 2, delay, 0) + b"\x00"
+
+    def _encode_image_block(self, frame: NumpyImage) -> bytes:
+        from PIL import Image
+
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        image = image.quantize(colors=self.colors, method=Image.Quantize.FASTOCTREE)
+        single_frame = io.BytesIO()
+        image.save(single_frame, format="GIF")
+        return _image_block_with_local_palette(single_frame.getvalue())
+
+
+def _skip_sub_blocks(data: bytes, position: int) -> int:
+    while data[position] != 0:
+        position += data[position] + 1
+    return position + 1
+
+
+def _image_block_with_local_palette(gif: bytes) -> bytes:
+    """ Image descriptor, colour table and image data of a single-frame GIF, its global palette made local """
+    screen_flags = gif[10]
+    position = 13
+    palette = b""
+    palette_size_bits = 0
+    if screen_flags & 0x80:
+        palette_size_bits = screen_flags & 0x07
+        palette_length = 3 * 2 ** (palette_size_bits + 1)
+        palette = gif[position:position + palette_length]
+        position += palette_length
+
+    while gif[position] == GIF_EXTENSION:
+        position = _skip_sub_blocks(gif, position + 2)
+    if gif[position] != GIF_IMAGE_DESCRIPTOR:
+        raise ValueError("GIF without an image")
+
+    descriptor = bytearray(gif[position:position + 10])
+    image_flags = descriptor[9]
+    position += 10
+    if image_flags & 0x80:
+        # the frame already has a local colour table
+        palette_length = 3 * 2 ** ((image_flags & 0x07) + 1)
+        palette = gif[position:position + palette_length]
+        position += palette_length
+    else:
+        # keep the interlace and sort flags
+        descriptor[9] = 0x80 | (image_flags & 0x60) | palette_size_bits
+
+    # LZW minimum code size followed by the data sub-blocks
+    data_end = _skip_sub_blocks(gif, position + 1)
+    return bytes(descriptor) + palette + gif[position:data_end]
+
+
+def build_preview(
+        frames: Iterable[NumpyImage],
+        output_path: Path,
+        preview_format: ClipPreviewFormat | None = None,
+        max_size: int | None = 480,
+        frame_duration_ms: int = 100,
+        every_nth_frame: int = 1
+) -> Path:
+    """
+    Streams frames (an ImageGenerator, VideoGenerator, EventCrops, ...) into a GIF or MP4 preview.
+    Only a single frame is held in memory at a time.
+    """
+    preview_format = preview_format or ClipPreviewFormat.from_path(output_path)
+    if preview_format == ClipPreviewFormat.MP4:
+        from src.gstreamer.preview_encoder import Mp4PreviewWriter
+
+        writer = Mp4PreviewWriter(output_path, frame_duration_ms=frame_duration_ms)
+    else:
+        writer = GifWriter(output_path, frame_duration_ms=frame_duration_ms)
+
+    size = None
+    with writer:
+        for frame_number, frame in enumerate(frames):
+            if frame_number % every_nth_frame != 0:
+                continue
+            if size is None:
+                size = fit_preview_size(frame.shape, max_size, even=preview_format == ClipPreviewFormat.MP4)
+            writer.write(resize_to(np.ascontiguousarray(frame), size))
+    return output_path
+
+
+@dataclass
+class PreviewBuilder:
+    """
+    Builds clip previews on a background thread - `submit` returns right away.
+    Frames are read lazily by the worker, so a source must not be consumed by anybody else meanwhile.
+    """
+    max_size: int | None = 480
+    frame_duration_ms: int = 100
+    every_nth_frame: int = 1
+    workers: int = 1
+    _executor: ThreadPoolExecutor = field(init=False)
+
+    def __post_init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preview-builder")
+
+    def submit(
+            self,
+            frames: Iterable[NumpyImage],
+            output_path: Path,
+            preview_format: ClipPreviewFormat | None = None
+    ) -> Future:
+        """ Future of the preview path, failures are logged and re-raised by `Future.result` """
+        return self._executor.submit(self._build, frames, output_path, preview_format)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _build(self, frames: Iterable[NumpyImage], output_path: Path, preview_format: ClipPreviewFormat | None) -> Path:
+        try:
+            build_preview(
+                frames,
+                output_path,
+                preview_format=preview_format,
+                max_size=self.max_size,
+                frame_duration_ms=self.frame_duration_ms,
+                every_nth_frame=self.every_nth_frame
+            )
+        except Exception as e:
+            logger.error(f"Unable to build preview {output_path}. Error = {e}")
+            raise
+        logger.info(f"Preview {output_path} has been built")
+        return output_path
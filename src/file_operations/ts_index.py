@@ -0,0 +1,231 @@
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+PTS_CLOCK_HZ = 90000
+PTS_WRAP = 1 << 33
+INDEX_SUFFIX = ".idx.json"
+
+
+class Clock(Enum):
+    # pipeline running time in nanoseconds - valid within a single run of the pipeline
+    RUNNING_TIME = "running_time"
+    # UNIX time in seconds - valid across restarts
+    EPOCH = "epoch"
+
+
+@dataclass
+class Keyframe:
+    # byte offset of the first TS packet of the key frame
+    offset: int
+    pts: int
+
+
+def _pes_pts(packet: np.ndarray) -> int | None:
+    adaptation_field_control = (packet[3] >> 4) & 0x3
+    start = 4
+    if adaptation_field_control & 0x2:
+        start += 1 + int(packet[4])
+    if not adaptation_field_control & 0x1 or start + 14 > TS_PACKET_SIZE:
+        return None
+    pes = packet[start:]
+    if pes[0] != 0 or pes[1] != 0 or pes[2] != 1 or not pes[7] & 0x80:
+        return None
+    pts_bytes = pes[9:14].astype(np.int64)
+    return int(
+        ((pts_bytes[0] >> 1) & 0x7) << 30
+        | pts_bytes[1] << 22
+        | (pts_bytes[2] >> 1) << 15
+        | pts_bytes[3] << 7
+        | pts_bytes[4] >> 1
+    )
+
+
+def scan_keyframes(data: bytes) -> list[Keyframe]:
+    """
+    Finds key frames in an MPEG-TS stream - packets starting a PES packet with the random access indicator set
+    (mpegtsmux sets it for key frames). Packets are inspected vectorised, PES headers are parsed for key frames only.
+    """
+    packet_count = len(data) // TS_PACKET_SIZE
+    packets = np.frombuffer(data, dtype=np.uint8, count=packet_count * TS_PACKET_SIZE).reshape(-1, TS_PACKET_SIZE)
+    if packet_count == 0:
+        return []
+    payload_unit_start = (packets[:, 1] & 0x40) != 0
+    has_adaptation_field = ((packets[:, 3] >> 4) & 0x2) != 0
+    random_access = has_adaptation_field & (packets[:, 4] > 0) & ((packets[:, 5] & 0x40) != 0)
+    candidates = np.flatnonzero((packets[:, 0] == TS_SYNC_BYTE) & payload_unit_start & random_access)
+
+    keyframes = []
+    for index in candidates:
+        pts = _pes_pts(packets[index])
+        if pts is not None:
+            keyframes.append(Keyframe(offset=int(index) * TS_PACKET_SIZE, pts=pts))
+    return keyframes
+
+
+@dataclass
+class SegmentIndex:
+    """ Key frames of a single MPEG-TS segment with their time in both clocks """
+    path: Path
+    run_id: str
+    start_running_time: int
+    end_running_time: int
+    start_epoch: float
+    size: int
+    keyframes: list[Keyframe] = field(default_factory=list)
+
+    @classmethod
+    def build(
+            cls, path: Path, run_id: str, start_running_time: int, end_running_time: int, start_epoch: float
+    ) -> "SegmentIndex":
+        data = path.read_bytes()
+        keyframes = scan_keyframes(data)
+        if not keyframes:
+            logger.warning(f"No key frame at the start of segment {path}, clips cut at its boundaries only")
+        return cls(
+            path=path,
+            run_id=run_id,
+            start_running_time=start_running_time,
+            end_running_time=end_running_time,
+            start_epoch=start_epoch,
+            size=len(data),
+            keyframes=keyframes
+        )
+
+    @classmethod
+    def load(cls, index_path: Path) -> "SegmentIndex":
+        values = json.loads(index_path.read_text())
+        values["path"] = Path(values["path"])
+        values["keyframes"] = [Keyframe(**keyframe) for keyframe in values["keyframes"]]
+        return cls(**values)
+
+    @property
+    def index_path(self) -> Path:
+        return self.path.with_name(self.path.name + INDEX_SUFFIX)
+
+    def save(self) -> None:
+        values = asdict(self)
+        values["path"] = str(self.path)
+        self.index_path.write_text(json.dumps(values))
+
+    def start(self, clock: Clock) -> float:
+        return self.start_running_time if clock == Clock.RUNNING_TIME else self.start_epoch
+
+    def end(self, clock: Clock) -> float:
+        if clock == Clock.RUNNING_TIME:
+            return self.end_running_time
+        return self.start_epoch + (self.end_running_time - self.start_running_time) / 1e9
+
+    def keyframe_time(self, keyframe: Keyframe, clock: Clock) -> float:
+        # the segment starts with its first key frame, later ones are placed by their PTS distance from it
+        elapsed_ns = ((keyframe.pts - self.keyframes[0].pts) % PTS_WRAP) * 1e9 / PTS_CLOCK_HZ
+        if clock == Clock.RUNNING_TIME:
+            return self.start_running_time + elapsed_ns
+        return self.start_epoch + elapsed_ns / 1e9
+
+    def header(self) -> bytes:
+        """ PAT/PMT packets written by the muxer in front of the first key frame """
+        if not self.keyframes:
+            return b""
+        with self.path.open("rb") as file:
+            return file.read(self.keyframes[0].offset)
+
+
+@dataclass
+class DvrIndex:
+    """
+    Index of rolling MPEG-TS segments in `directory` under a disk budget.
+
+    Segments are evicted oldest first once their total size exceeds `budget_bytes`. Clips are cut
+    at key frames by copying bytes - no decoding or re-muxing - starting at the last key frame before
+    the requested start and ending in front of the first key frame after the requested end.
+    Not thread safe - owned by a single worker.
+    """
+    directory: Path
+    budget_bytes: int
+    segments: list[SegmentIndex] = field(init=False, default_factory=list)
+
+    def __post_init__(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for index_path in sorted(self.directory.glob(f"*{INDEX_SUFFIX}")):
+            try:
+                segment = SegmentIndex.load(index_path)
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Ignoring broken segment index {index_path}: {e}")
+                continue
+            if segment.path.exists():
+                self.segments.append(segment)
+        self.segments.sort(key=lambda segment: segment.start_epoch)
+
+    @property
+    def size(self) -> int:
+        return sum(segment.size for segment in self.segments)
+
+    def add(self, segment: SegmentIndex) -> list[SegmentIndex]:
+        """ Adds a closed segment and returns the evicted ones """
+        segment.save()
+        self.segments.append(segment)
+        evicted = []
+        while len(self.segments) > 1 and self.size > self.budget_bytes:
+            oldest = self.segments.pop(0)
+            oldest.path.unlink(missing_ok=True)
+            oldest.index_path.unlink(missing_ok=True)
+            evicted.append(oldest)
+        return evicted
+
+    def covers(self, end: float, clock: Clock, run_id: str | None = None) -> bool:
+        """ Whether the indexed segments already reach `end` - later requests have to wait for more segments """
+        return any(segment.end(clock) >= end for segment in self._segments(clock, run_id))
+
+    def extract_clip(
+            self, start: float, end: float, output_path: Path, clock: Clock = Clock.EPOCH, run_id: str | None = None
+    ) -> bool:
+        """ Returns False when no indexed segment overlaps the range """
+        segments = [
+            segment for segment in self._segments(clock, run_id)
+            if segment.end(clock) > start and segment.start(clock) < end
+        ]
+        if not segments:
+            return False
+        if segments[0].start(clock) > start:
+            logger.warning(f"Start of the clip {output_path.name} has already been evicted")
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with output_path.open("wb") as output:
+            output.write(segments[0].header())
+            for position, segment in enumerate(segments):
+                first_offset = self._start_offset(segment, start, clock) if position == 0 else 0
+                last_offset = self._end_offset(segment, end, clock) if position == len(segments) - 1 else segment.size
+                with segment.path.open("rb") as file:
+                    file.seek(first_offset)
+                    output.write(file.read(last_offset - first_offset))
+        return True
+
+    def _segments(self, clock: Clock, run_id: str | None) -> list[SegmentIndex]:
+        if clock == Clock.RUNNING_TIME:
+            return [segment for segment in self.segments if segment.run_id == run_id]
+        return self.segments
+
+    @staticmethod
+    def _start_offset(segment: SegmentIndex, start: float, clock: Clock) -> int:
+        offset = segment.keyframes[0].offset if segment.keyframes else 0
+        for keyframe in segment.keyframes:
+            if segment.keyframe_time(keyframe, clock) > start:
+                break
+            offset = keyframe.offset
+        return offset
+
+    @staticmethod
+    def _end_offset(segment: SegmentIndex, end: float, clock: Clock) -> int:
+        for keyframe in segment.keyframes[1:]:
+            if segment.keyframe_time(keyframe, clock) > end:
+                return keyframe.offset
+        return segment.size
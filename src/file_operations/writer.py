@@ -1,8 +1,8 @@
 from dataclasses import dataclass
 from pathlib import Path
 
-from src.file_operations.images import save_numpy_image, save_as_plot
-from src.types import NumpyImage
+from src.file_operations.images import save_numpy_image, save_as_plot, draw_tracks_numpy
+from src.types import NumpyImage, BBoxList
 
 
 @dataclass
@@ -24,3 +24,7 @@ class ImageWriter:
                 image_output_path=self.output_directory / f"{self._image_number}.{self.image_extension}",
             )
         self._image_number += 1
+
+    def save_preview(self, frame: NumpyImage, bboxes: BBoxList) -> bool:
+        self.save(draw_tracks_numpy(frame, bboxes))
+        return True
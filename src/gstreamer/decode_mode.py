@@ -0,0 +1,69 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable
+
+from src.metrics.registry import MetricsRegistry, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class DecodeMode(Enum):
+    # every frame is decoded and passed to the detector
+    FULL = "FULL"
+    # only key frames are decoded, delta frames are dropped in front of the decoder
+    KEYFRAMES = "KEYFRAMES"
+
+
+@dataclass
+class DecodeModeController:
+    """
+    Keeps the inference branch decoding key frames only while nothing moves in the scene.
+
+    Any candidate detection switches the pipeline to full decoding immediately,
+    it goes back to key frames after `idle_after_seconds` without candidates.
+    """
+    camera_id: str
+    set_mode_function: Callable[[DecodeMode], None]
+    idle_after_seconds: float = 10.0
+    registry: MetricsRegistry = field(default_factory=lambda: REGISTRY)
+    clock: Callable[[], float] = time.monotonic
+
+    mode: DecodeMode = field(init=False, default=DecodeMode.KEYFRAMES)
+    _last_candidate_time: float = field(init=False, default=0.0)
+    _mode_since: float = field(init=False, default=0.0)
+
+    def __post_init__(self):
+        mode_seconds = self.registry.counter(
+            "meteor_decode_mode_seconds_total",
+            "Time spent decoding in the given mode",
+            ("camera", "mode")
+        )
+        self._mode_seconds = {
+            mode: mode_seconds.labels(camera=self.camera_id, mode=mode.value) for mode in DecodeMode
+        }
+        self._mode_since = self.clock()
+        self.set_mode_function(self.mode)
+
+    def update(self, candidates_detected: bool) -> DecodeMode:
+        now = self.clock()
+        if candidates_detected:
+            self._last_candidate_time = now
+            if self.mode == DecodeMode.KEYFRAMES:
+                self._switch_mode(DecodeMode.FULL)
+        elif self.mode == DecodeMode.FULL and now - self._last_candidate_time > self.idle_after_seconds:
+            self._switch_mode(DecodeMode.KEYFRAMES)
+        return self.mode
+
+    def account_time(self) -> None:
+        """ Adds time spent in the current mode to the metrics, called periodically and on every switch """
+        now = self.clock()
+        self._mode_seconds[self.mode].inc(now - self._mode_since)
+        self._mode_since = now
+
+    def _switch_mode(self, mode: DecodeMode) -> None:
+        self.account_time()
+        logger.info(f"[Camera = {self.camera_id}] Switching decoding from {self.mode.value} to {mode.value}")
+        self.mode = mode
+        self.set_mode_function(mode)
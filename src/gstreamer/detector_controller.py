@@ -1,22 +1,36 @@
+import collections
 import logging
 import sys
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Any, TYPE_CHECKING
 
 import numpy as np
 from ioutrack import Sort
 
+from src.control.commands import CommandError, CommandHandler
 from src.detectors.frame_diff import FrameDiffDetector
-from src.file_operations.writer import ImageWriter
+from src.file_operations.async_writer import AsyncImageWriter, PreviewFormat
 from src.gstreamer.pipeline import initialize_gstreamer, TrackerPipeline
 
 import gi
 
+from src.detectors.base import BaseDetector
+from src.detectors.ensemble import EnsembleDetector
 from src.gstreamer.record_manager import RecordManager
 from src.gstreamer.utils import RecordingState
 from src.inference.base import BaseInferenceEngine
 from src.inference.inference import FrameDiffInference
+from src.metrics.camera import CameraMetrics
+from src.profiling.profiler import FrameProfiler
+
+if TYPE_CHECKING:
+    # optional features - imported by the entry point only when enabled
+    from src.file_operations.crop_store import CropStore
+    from src.gstreamer.decode_mode import DecodeModeController
+    from src.gstreamer.dvr import DvrRecorder
+    from src.ipc.publisher import EventPublisher
+    from src.qos.controller import QosController, DegradationLevel
 
 gi.require_version('Gst', '1.0')
 gi.require_version('GLib', '2.0')
@@ -27,63 +41,291 @@ logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 logger = logging.getLogger()
 
 
+def _is_cascade(detector: BaseDetector) -> bool:
+    # CascadeDetector is not imported unless candidates are verified - it is the only detector with a proposer
+    return isinstance(getattr(detector, "proposer", None), BaseDetector)
+
+
 @dataclass
 class DetectorController:
     pipeline: TrackerPipeline
     inference_engine: BaseInferenceEngine
     image_output_directory: Path | None = None
+    preview_format: PreviewFormat = PreviewFormat.JPEG
+    preview_quality: int = 85
+    preview_max_size: int | None = 1280
+    metrics: CameraMetrics | None = None
+    profiler: FrameProfiler | None = None
+    qos: "QosController | None" = None
+    decode_mode: "DecodeModeController | None" = None
+    # crops around confirmed tracks are stored per recording when set
+    crop_store: "CropStore | None" = None
+    # records events - the file branch of the pipeline when not set
+    recorder: "TrackerPipeline | DvrRecorder | None" = None
+    # tracked detections and recording state changes are streamed to local subscribers when set
+    publisher: "EventPublisher | None" = None
+    state_log_interval_seconds: int = 3
+    # only every n-th frame is passed to the inference engine, on top of the stride of the QoS level
+    frame_stride: int = 1
     record_manager: RecordManager | None = field(init=False, default=None)
-    _last_state_log_datetime: datetime = field(init=False, default_factory=datetime.now)
+    image_writer: AsyncImageWriter | None = field(init=False, default=None)
 
     inference_frame_num: int = 0
     app_tee_frame_num: int = 0
+    _received_frame_num: int = field(init=False, default=0)
+    _default_detector: BaseDetector | None = field(init=False, default=None)
+    # last frames passed to the inference engine and their PTS - enough for the latency of a cascade
+    _recent_frames: collections.deque = field(init=False, default_factory=lambda: collections.deque(maxlen=2))
 
     def __post_init__(self):
-        image_writer = None
+        if self.recorder is None:
+            self.recorder = self.pipeline
         if self.image_output_directory is not None:
-            image_writer = ImageWriter(
+            self.image_writer = AsyncImageWriter(
                 output_directory=self.image_output_directory,
-                quick=False
+                image_format=self.preview_format,
+                quality=self.preview_quality,
+                max_size=self.preview_max_size,
+                metrics=self.metrics
             )
         self.record_manager = RecordManager(
             start_recording_function=self.on_start_recording,
             stop_recording_function=self.on_stop_recording,
             get_state_function=self.get_pipeline_state,
-            image_writer=image_writer,
+            image_writer=self.image_writer,
             start_recording_threshold=2,
         )
+        if self.qos is not None:
+            self._default_detector = self._degradable_detector()
+            self.qos.add_level_change_callback(self._apply_qos_level)
 
     def get_pipeline_state(self) -> RecordingState:
-        return self.pipeline.state
+        return self.recorder.state
 
     def switch_on_record_manager_callback(
             self,
             pad: Gst.Pad,
             info: Gst.PadProbeInfo
     ) -> Gst.PadProbeReturn:
+        # runs on the streaming thread - keep it to a bare counter,
+        # reporting is done from the main loop in `report_state`
         self.app_tee_frame_num += 1
-        current_time = datetime.now()
-        if current_time - self._last_state_log_datetime > timedelta(seconds=3):
-            logger.info(f"State of the pipeline is {self.get_pipeline_state().value}")
-            logger.info(f"Decoded and processed frames: {self.inference_frame_num}")
-            logger.info(f"Depayed frames: {self.pipeline.frames_consumed}")
-            logger.info(f"Diff: {self.pipeline.frames_consumed - self.inference_frame_num}")
-            self._last_state_log_datetime = current_time
         return Gst.PadProbeReturn.OK
 
+    def report_state(self) -> bool:
+        """
+        Logs counters of the pipeline and updates metrics derived from them.
+        Meant to be scheduled with `GLib.timeout_add_seconds` - returns True to stay scheduled.
+        """
+        frames_consumed = self.pipeline.frames_consumed
+        lag = self.inference_lag_frames
+        logger.info(f"State of the pipeline is {self.get_pipeline_state().value}")
+        logger.info(f"Decoded and processed frames: {self.inference_frame_num}")
+        logger.info(f"Depayed frames: {frames_consumed}")
+        logger.info(f"Inference lag: {lag}")
+        if self.qos is not None:
+            logger.info(f"QoS level: {self.qos.level.name}")
+        if self.decode_mode is not None:
+            logger.info(f"Decode mode: {self.decode_mode.mode.value}")
+            self.decode_mode.account_time()
+        if self.metrics is not None:
+            self.metrics.frames_depayed.set(frames_consumed)
+            self.metrics.inference_lag.set(lag)
+        return True
+
+    @property
+    def inference_lag_frames(self) -> int:
+        """
+        Frames which passed the decoder gate and were not handled yet - frames dropped in front of the decoder
+        (key frames only mode) are not counted, so the lag does not grow while the camera is idle
+        """
+        return self.pipeline.frames_entering_inference - self.inference_frame_num
+
+    def schedule_state_reports(self) -> None:
+        GLib.timeout_add_seconds(self.state_log_interval_seconds, self.report_state)
+
     def update_with_frame(self, frame: np.array) -> None:
+        self._received_frame_num += 1
+        if self._skip_frame():
+            return
+
+        if self.profiler is None:
+            self._process_frame(frame)
+        else:
+            with self.profiler.frame():
+                self._process_frame(frame)
+
+    def _process_frame(self, frame: np.array) -> None:
         # logger.info(f"Received new numpy frame with dimensions {frame.shape}")
+        self._recent_frames.append((frame, self.pipeline.last_frame_pts))
         bboxes = self.inference_engine.update(frame)
-        self.record_manager.update_frame(frame, bboxes)
+        detected_frame, detected_pts = self._detected_frame()
+        if self.decode_mode is not None:
+            self.decode_mode.update(
+                candidates_detected=(
+                    self.inference_engine.last_detections.size != 0
+                    or self.get_pipeline_state() == RecordingState.RECORDING
+                )
+            )
+        if self.metrics is None:
+            self.record_manager.update_frame(detected_frame, bboxes)
+            if self.crop_store is not None:
+                self.crop_store.add(detected_frame, bboxes, detected_pts)
+        else:
+            with self.metrics.time_stage("record_manager"):
+                self.record_manager.update_frame(detected_frame, bboxes)
+            if self.crop_store is not None:
+                with self.metrics.time_stage("crop_store"):
+                    self.crop_store.add(detected_frame, bboxes, detected_pts)
+            self.metrics.frames_processed.inc()
+        if self.publisher is not None and len(bboxes) != 0:
+            self.publisher.publish_detections(detected_pts, bboxes)
+        self.inference_frame_num += 1
+
+    def _detected_frame(self) -> tuple[np.ndarray, int | None]:
+        """ Frame (and its PTS) the boxes of the last inference belong to - a cascade verifies them a frame later """
+        latency = min(self.inference_engine.detector.latency_frames, len(self._recent_frames) - 1)
+        return self._recent_frames[-1 - latency]
+
+    def _skip_frame(self) -> bool:
+        qos_stride = 1
+        if self.qos is not None:
+            qos_stride = self.qos.observe(
+                lag_frames=self.inference_lag_frames,
+                queue_depth=self.pipeline.inference_queue_depth
+            ).frame_stride
+        if self._received_frame_num % (self.frame_stride * qos_stride) == 0:
+            return False
+        # skipped frames count as handled, otherwise the lag would never go down
         self.inference_frame_num += 1
+        if self.metrics is not None:
+            self.metrics.dropped_frames("qos_skip" if qos_stride > 1 else "stride_skip").inc()
+        return True
+
+    def _degradable_detector(self) -> BaseDetector:
+        # degradation levels replace only the proposal stage of a cascade, candidates are still verified
+        detector = self.inference_engine.detector
+        return detector.proposer if _is_cascade(detector) else detector
+
+    def _apply_qos_level(self, previous_level: "DegradationLevel", level: "DegradationLevel") -> None:
+        detector = level.detector or self._default_detector
+        if detector is self._degradable_detector():
+            return
+        logger.info(f"Switching detector to {detector}")
+        # the previous frame it has seen may be hours old - its difference would light up the whole frame
+        detector.reset()
+        if _is_cascade(self.inference_engine.detector):
+            self.inference_engine.detector.proposer = detector
+        else:
+            self.inference_engine.detector = detector
+
+    def set_detection_suspended(self, suspended: bool) -> None:
+        if not suspended and self.pipeline.detection_suspended:
+            # runs on the main loop while the decoder gate still drops every frame - the previous frame
+            # the detector has seen is from dawn, its difference to the first frame at dusk would be a detection
+            self.inference_engine.detector.reset()
+        self.pipeline.set_detection_suspended(suspended)
+
+    def control_commands(self) -> dict[str, CommandHandler]:
+        """ Commands of the control server - they run on the GLib main loop """
+        return {
+            "status": self._status_command,
+            "start-recording": self._start_recording_command,
+            "stop-recording": self._stop_recording_command,
+            "set-thresholds": self._set_thresholds_command,
+            "set-stride": self._set_stride_command,
+        }
+
+    def _status_command(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        detector = self._degradable_detector()
+        return {
+            "state": self.get_pipeline_state().value,
+            "recording_held": self.record_manager.hold_recording,
+            "frames_processed": self.inference_frame_num,
+            "frames_depayed": self.pipeline.frames_consumed,
+            "bbox_threshold": getattr(detector, "bbox_threshold", None),
+            "nms_threshold": getattr(detector, "nms_threshold", None),
+            "frame_stride": self.frame_stride,
+            "qos_level": self.qos.level.name if self.qos is not None else None,
+            "decode_mode": self.decode_mode.mode.value if self.decode_mode is not None else None,
+            "detection_suspended": self.pipeline.detection_suspended,
+        }
+
+    def _start_recording_command(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        state = self.get_pipeline_state()
+        if state not in (RecordingState.NOT_STARTED, RecordingState.STOPPED):
+            raise CommandError(f"Cannot start recording in state {state.value}")
+        # kept running until stopped on request, the record manager does not stop it
+        self.record_manager.hold_recording = True
+        self.on_start_recording()
+        return self._status_command(arguments)
+
+    def _stop_recording_command(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        self.record_manager.hold_recording = False
+        state = self.get_pipeline_state()
+        if state != RecordingState.RECORDING:
+            raise CommandError(f"Cannot stop recording in state {state.value}")
+        self.on_stop_recording()
+        return self._status_command(arguments)
+
+    def _set_thresholds_command(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        bbox_threshold = arguments.get("bbox_threshold")
+        nms_threshold = arguments.get("nms_threshold")
+        if bbox_threshold is not None and not (isinstance(bbox_threshold, (int, float)) and bbox_threshold >= 0):
+            raise CommandError("bbox_threshold must be a non-negative number")
+        if nms_threshold is not None and not (isinstance(nms_threshold, (int, float)) and 0 <= nms_threshold <= 1):
+            raise CommandError("nms_threshold must be a number between 0 and 1")
+
+        # degraded QoS levels keep their own detectors - all of them follow the new thresholds
+        detectors = [self._default_detector or self._degradable_detector()]
+        if self.qos is not None:
+            detectors += [level.detector for level in self.qos.levels if level.detector is not None]
+        for ensemble in [detector for detector in detectors if isinstance(detector, EnsembleDetector)]:
+            detectors += ensemble.detectors.values()
+        for detector in detectors:
+            if bbox_threshold is not None and hasattr(detector, "bbox_threshold"):
+                detector.bbox_threshold = float(bbox_threshold)
+            if nms_threshold is not None and hasattr(detector, "nms_threshold"):
+                detector.nms_threshold = float(nms_threshold)
+        logger.info(f"Detection thresholds changed to {arguments}")
+        return self._status_command(arguments)
+
+    def _set_stride_command(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        frame_stride = arguments.get("frame_stride")
+        if not isinstance(frame_stride, int) or frame_stride < 1:
+            raise CommandError("frame_stride must be a positive integer")
+        self.frame_stride = frame_stride
+        logger.info(f"Frame stride changed to {frame_stride}")
+        return self._status_command(arguments)
+
+    def close(self) -> None:
+        if self.image_writer is not None:
+            self.image_writer.close()
+        if _is_cascade(self.inference_engine.detector):
+            self.inference_engine.detector.close()
+        if self.crop_store is not None:
+            self.crop_store.close()
+        if self.recorder is not self.pipeline:
+            # the rolling DVR
+            self.recorder.close()
+        if self.publisher is not None:
+            self.publisher.close()
 
     def on_start_recording(self) -> None:
         logger.info("Recording should start now!")
-        self.pipeline.begin_starting_recording()
+        self.recorder.begin_starting_recording()
+        if self.crop_store is not None:
+            self.crop_store.begin_event(self.recorder.recording_path.stem)
+        if self.publisher is not None:
+            self.publisher.publish_recording_state(self.pipeline.last_frame_pts, RecordingState.STARTING.value)
 
     def on_stop_recording(self) -> None:
         logger.info("Recording should stop now!")
-        self.pipeline.begin_stopping_recording()
+        self.recorder.begin_stopping_recording()
+        if self.crop_store is not None:
+            self.crop_store.end_event()
+        if self.publisher is not None:
+            self.publisher.publish_recording_state(self.pipeline.last_frame_pts, RecordingState.STOPPING.value)
 
 
 def main() -> None:
@@ -114,6 +356,7 @@ def main() -> None:
     )
 
     pipeline.add_callback_probe(controller.switch_on_record_manager_callback)
+    controller.schedule_state_reports()
 
     pipeline.add_app_sink_new_sample_callback(controller.update_with_frame)
 
@@ -123,7 +366,8 @@ def main() -> None:
         main_loop.run()
     except Exception as e:
         logger.error(f"Exception during pipeline execution. Error = {e}")
-        pass
+    finally:
+        controller.close()
 
 
 if __name__ == "__main__":
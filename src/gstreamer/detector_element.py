@@ -0,0 +1,201 @@
+import logging
+
+import gi
+import numpy as np
+
+from src.detectors.frame_diff import FrameDiffDetector
+from src.detectors.functions import MaskMode
+
+gi.require_version('Gst', '1.0')
+gi.require_version('GstBase', '1.0')
+gi.require_version('GstVideo', '1.0')
+gi.require_version('GObject', '2.0')
+
+from gi.repository import GObject, Gst, GstBase, GstVideo
+
+logger = logging.getLogger(__name__)
+
+ELEMENT_NAME = "meteordetect"
+DETECTIONS_MESSAGE_NAME = "meteor-detections"
+CAPS = Gst.Caps.from_string("video/x-raw,format=BGR")
+
+
+def detections_from_message(message: Gst.Message) -> tuple[int | None, np.ndarray] | None:
+    """ PTS and boxes [[x0, y0, x1, y1, score]] of a `meteor-detections` element message, None for other messages """
+    structure = message.get_structure()
+    if message.type != Gst.MessageType.ELEMENT or structure is None or structure.get_name() != DETECTIONS_MESSAGE_NAME:
+        return None
+    pts = structure.get_value("pts")
+    boxes = np.array(list(structure.get_value("boxes")), dtype=np.float32).reshape(-1, 5)
+    return (None if pts == Gst.CLOCK_TIME_NONE else pts), boxes
+
+
+class MeteorDetect(GstBase.BaseTransform):
+    """
+    Frame difference detector as an in-place passthrough element:
+
+        ... ! videoconvert ! video/x-raw,format=BGR ! meteordetect bbox-threshold=100 ! ...
+
+    Frames are mapped read-only and wrapped by numpy without a copy. Detections of a frame are posted
+    on the bus as `meteor-detections` element messages (pts, running-time, boxes as a flat list of
+    x0, y0, x1, y1, score). With `attach-meta=true` they are also attached to the buffer
+    as GstAnalytics object detection metadata (GStreamer >= 1.24) - the element then stops being
+    a passthrough, as metadata needs a writable buffer (the memory is still not copied).
+    """
+    __gstmetadata__ = (
+        "Meteor detector",
+        "Filter/Analyzer/Video",
+        "Detects moving objects by differencing consecutive frames",
+        "Meteorite Catcher"
+    )
+    __gsttemplates__ = (
+        Gst.PadTemplate.new("sink", Gst.PadDirection.SINK, Gst.PadPresence.ALWAYS, CAPS),
+        Gst.PadTemplate.new("src", Gst.PadDirection.SRC, Gst.PadPresence.ALWAYS, CAPS),
+    )
+    __gproperties__ = {
+        "bbox-threshold": (
+            float, "Bounding box threshold", "Minimum area of a detection in pixels",
+            0.0, 1e9, 100.0, GObject.ParamFlags.READWRITE
+        ),
+        "nms-threshold": (
+            float, "NMS threshold", "IoU threshold of the non-maximum suppression",
+            0.0, 1.0, 1e-3, GObject.ParamFlags.READWRITE
+        ),
+        "scale": (
+            float, "Scale", "Frames are resized by this factor before detection",
+            0.01, 1.0, 1.0, GObject.ParamFlags.READWRITE
+        ),
+        "mask-mode": (
+            str, "Mask mode", f"Local adaptive threshold: {', '.join(mode.value for mode in MaskMode)}",
+            MaskMode.GAUSSIAN.value, GObject.ParamFlags.READWRITE
+        ),
+        "post-messages": (
+            bool, "Post messages", "Post detections as element messages on the bus",
+            True, GObject.ParamFlags.READWRITE
+        ),
+        "attach-meta": (
+            bool, "Attach metadata", "Attach detections as GstAnalytics object detection metadata",
+            False, GObject.ParamFlags.READWRITE
+        ),
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.detector = FrameDiffDetector()
+        self.post_messages = True
+        self.attach_meta = False
+        self.frames_processed = 0
+        self._video_info: GstVideo.VideoInfo | None = None
+        self._od_type = None
+        self.set_in_place(True)
+        self.set_passthrough(True)
+
+    def do_get_property(self, prop: GObject.ParamSpec):
+        match prop.name:
+            case "bbox-threshold":
+                return self.detector.bbox_threshold
+            case "nms-threshold":
+                return self.detector.nms_threshold
+            case "scale":
+                return self.detector.scale
+            case "mask-mode":
+                return self.detector.mask_mode.value
+            case "post-messages":
+                return self.post_messages
+            case "attach-meta":
+                return self.attach_meta
+        raise AttributeError(f"Unknown property {prop.name}")
+
+    def do_set_property(self, prop: GObject.ParamSpec, value) -> None:
+        match prop.name:
+            case "bbox-threshold":
+                self.detector.bbox_threshold = value
+            case "nms-threshold":
+                self.detector.nms_threshold = value
+            case "scale":
+                # buffers are reallocated for the new size on the next frame
+                self.detector = FrameDiffDetector(
+                    bbox_threshold=self.detector.bbox_threshold,
+                    nms_threshold=self.detector.nms_threshold,
+                    scale=value,
+                    mask_mode=self.detector.mask_mode,
+                    # reallocated for the new mask size on the next frame
+                    suppression=self.detector.suppression
+                )
+            case "mask-mode":
+                self.detector.mask_mode = MaskMode(value)
+            case "post-messages":
+                self.post_messages = value
+            case "attach-meta":
+                self.attach_meta = value and self._load_analytics()
+                self.set_passthrough(not self.attach_meta)
+            case _:
+                raise AttributeError(f"Unknown property {prop.name}")
+
+    def do_set_caps(self, incaps: Gst.Caps, outcaps: Gst.Caps) -> bool:
+        self._video_info = GstVideo.VideoInfo.new_from_caps(incaps)
+        return self._video_info is not None
+
+    def do_transform_ip(self, buffer: Gst.Buffer) -> Gst.FlowReturn:
+        success, map_info = buffer.map(Gst.MapFlags.READ)
+        if not success:
+            logger.error("Could not map buffer data!")
+            return Gst.FlowReturn.ERROR
+        try:
+            # rows may be padded - the stride comes from the negotiated caps
+            info = self._video_info
+            frame = np.ndarray(
+                (info.height, info.width, 3),
+                dtype=np.uint8,
+                buffer=map_info.data,
+                offset=info.offset[0],
+                strides=(info.stride[0], 3, 1)
+            )
+            bboxes = self.detector.update(frame)
+        finally:
+            buffer.unmap(map_info)
+        self.frames_processed += 1
+
+        if len(bboxes) == 0:
+            return Gst.FlowReturn.OK
+        if self.post_messages:
+            self._post_detections(buffer, bboxes)
+        if self.attach_meta:
+            self._attach_detections(buffer, bboxes)
+        return Gst.FlowReturn.OK
+
+    def _post_detections(self, buffer: Gst.Buffer, bboxes: np.ndarray) -> None:
+        structure = Gst.Structure.new_empty(DETECTIONS_MESSAGE_NAME)
+        structure.set_value("pts", GObject.Value(GObject.TYPE_UINT64, buffer.pts))
+        segment_event = self.get_static_pad("sink").get_sticky_event(Gst.EventType.SEGMENT, 0)
+        if segment_event is not None:
+            running_time = segment_event.parse_segment().to_running_time(Gst.Format.TIME, buffer.pts)
+            structure.set_value("running-time", GObject.Value(GObject.TYPE_UINT64, running_time))
+        structure.set_value("boxes", Gst.ValueArray([float(value) for value in bboxes.ravel()]))
+        self.post_message(Gst.Message.new_element(self, structure))
+
+    def _attach_detections(self, buffer: Gst.Buffer, bboxes: np.ndarray) -> None:
+        from gi.repository import GLib, GstAnalytics
+
+        meta = GstAnalytics.buffer_add_analytics_relation_meta(buffer)
+        if self._od_type is None:
+            self._od_type = GLib.quark_from_string("meteor")
+        for x0, y0, x1, y1, score in bboxes:
+            meta.add_od_mtd(self._od_type, int(x0), int(y0), int(x1 - x0), int(y1 - y0), float(score))
+
+    def _load_analytics(self) -> bool:
+        try:
+            gi.require_version('GstAnalytics', '1.0')
+            from gi.repository import GstAnalytics  # noqa: F401
+        except (ImportError, ValueError):
+            logger.warning("GstAnalytics (GStreamer >= 1.24) is not available - detections are not attached to buffers")
+            return False
+        return True
+
+
+GObject.type_register(MeteorDetect)
+
+
+def register_detector_element() -> bool:
+    """ Makes `meteordetect` available to Gst.parse_launch / Gst.ElementFactory.make of this process """
+    return Gst.Element.register(None, ELEMENT_NAME, Gst.Rank.NONE, MeteorDetect)
@@ -0,0 +1,165 @@
+import datetime
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import gi
+
+from src.file_operations.ts_index import Clock, DvrIndex, SegmentIndex
+from src.gstreamer.pipeline import TrackerPipeline
+from src.gstreamer.utils import RecordingState
+
+gi.require_version('Gst', '1.0')
+
+from gi.repository import Gst
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClipRequest:
+    start: float
+    end: float
+    output_path: Path
+    clock: Clock = Clock.RUNNING_TIME
+
+
+@dataclass
+class DvrRecorder:
+    """
+    Records the parsed H.264 stream continuously into rolling MPEG-TS segments (`splitmuxsink`)
+    under a disk budget and cuts event clips out of them by stream copy.
+
+    Replaces the dynamic relinking of the file branch of `TrackerPipeline` - it exposes the same
+    `state` / `begin_starting_recording` / `begin_stopping_recording` interface to `DetectorController`.
+    Clips span from `pre_roll_seconds` before the frame which started the recording to `post_roll_seconds`
+    after the frame which stopped it, `request_clip` serves later decisions for any range still on disk.
+    Segments are indexed and clips extracted on a single worker thread once the segment containing
+    the end of the clip has been closed.
+    """
+    pipeline: TrackerPipeline
+    segments_directory: Path
+    clips_directory: Path
+    segment_seconds: float = 10.0
+    budget_bytes: int = 20 * 1024 ** 3
+    pre_roll_seconds: float = 5.0
+    post_roll_seconds: float = 5.0
+
+    state: RecordingState = field(init=False, default=RecordingState.NOT_STARTED)
+    recording_path: Path | None = field(init=False, default=None)
+    run_id: str = field(init=False, default_factory=lambda: uuid.uuid4().hex)
+    _clip_start: int = field(init=False, default=0)
+    _opened_segments: dict[str, tuple[int, float]] = field(init=False, default_factory=dict)
+    _pending_requests: list[ClipRequest] = field(init=False, default_factory=list)
+    _index: DvrIndex = field(init=False)
+    _executor: ThreadPoolExecutor = field(init=False)
+
+    def __post_init__(self):
+        self.clips_directory.mkdir(parents=True, exist_ok=True)
+        self._index = DvrIndex(directory=self.segments_directory, budget_bytes=self.budget_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dvr-index")
+
+    def attach(self) -> None:
+        """
+        Adds the segment branch to the pipeline in place of its file branch,
+        has to be called before the pipeline starts
+        """
+        self.pipeline.remove_file_branch()
+        queue = Gst.ElementFactory.make("queue", "dvr-queue")
+        splitmux = Gst.ElementFactory.make("splitmuxsink", "dvr-splitmux")
+        assert queue
+        assert splitmux
+        # 1 second of headroom for a slow disk, the segments are the actual buffer
+        queue.set_property("max-size-time", Gst.SECOND)
+        queue.set_property("max-size-buffers", 0)
+        queue.set_property("max-size-bytes", 0)
+        splitmux.set_property("muxer-factory", "mpegtsmux")
+        splitmux.set_property("max-size-time", int(self.segment_seconds * Gst.SECOND))
+        splitmux.connect("format-location", self._format_location)
+
+        self.pipeline.pipeline.add(queue)
+        self.pipeline.pipeline.add(splitmux)
+        assert queue.link(splitmux)
+        self.pipeline.link_stream_branch(queue)
+        self.pipeline.pipeline.get_bus().connect("message::element", self._on_element_message)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def begin_starting_recording(self) -> None:
+        self._clip_start = self.pipeline.decision_running_time - int(self.pre_roll_seconds * Gst.SECOND)
+        self.recording_path = self.clips_directory / f"clip-{datetime.datetime.now().isoformat()}.ts"
+        self.state = RecordingState.RECORDING
+
+    def begin_stopping_recording(self) -> None:
+        if self.state != RecordingState.RECORDING:
+            return
+        self.request_clip(
+            start=self._clip_start,
+            end=self.pipeline.decision_running_time + int(self.post_roll_seconds * Gst.SECOND),
+            output_path=self.recording_path
+        )
+        self.state = RecordingState.STOPPED
+
+    def request_clip(self, start: float, end: float, output_path: Path, clock: Clock = Clock.RUNNING_TIME) -> None:
+        """ Extracts [start, end] into `output_path` as soon as the range has been recorded """
+        self._executor.submit(self._add_request, ClipRequest(start, end, output_path, clock))
+
+    def _format_location(self, splitmux: Gst.Element, fragment_id: int) -> str:
+        return str(self.segments_directory / f"segment-{time.time_ns()}-{fragment_id:06d}.ts")
+
+    def _on_element_message(self, bus: Gst.Bus, message: Gst.Message) -> None:
+        structure = message.get_structure()
+        if structure is None:
+            return
+        name = structure.get_name()
+        if name == "splitmuxsink-fragment-opened":
+            running_time = structure.get_value("running-time")
+            # the running time of the message lies in the past - place it on the wall clock accordingly
+            now_running_time = self.pipeline.running_time or running_time
+            start_epoch = time.time() - (now_running_time - running_time) / Gst.SECOND
+            self._opened_segments[structure.get_value("location")] = (running_time, start_epoch)
+        elif name == "splitmuxsink-fragment-closed":
+            location = structure.get_value("location")
+            if location not in self._opened_segments:
+                return
+            start_running_time, start_epoch = self._opened_segments.pop(location)
+            self._executor.submit(
+                self._index_segment,
+                Path(location),
+                start_running_time,
+                structure.get_value("running-time"),
+                start_epoch
+            )
+
+    def _index_segment(self, path: Path, start_running_time: int, end_running_time: int, start_epoch: float) -> None:
+        try:
+            segment = SegmentIndex.build(path, self.run_id, start_running_time, end_running_time, start_epoch)
+        except OSError as e:
+            logger.error(f"Could not index segment {path}: {e}")
+            return
+        for evicted in self._index.add(segment):
+            logger.debug(f"Evicted segment {evicted.path.name}")
+        self._serve_requests()
+
+    def _add_request(self, request: ClipRequest) -> None:
+        self._pending_requests.append(request)
+        self._serve_requests()
+
+    def _serve_requests(self) -> None:
+        remaining = []
+        for request in self._pending_requests:
+            if not self._index.covers(request.end, request.clock, self.run_id):
+                remaining.append(request)
+                continue
+            start = time.perf_counter()
+            if self._index.extract_clip(request.start, request.end, request.output_path, request.clock, self.run_id):
+                logger.info(
+                    f"Extracted clip {request.output_path} in {1e3 * (time.perf_counter() - start):.1f} ms"
+                )
+            else:
+                logger.warning(f"Range of clip {request.output_path} is no longer on disk")
+        self._pending_requests = remaining
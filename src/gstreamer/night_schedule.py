@@ -0,0 +1,106 @@
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from src.metrics.registry import MetricsRegistry, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+UNIX_EPOCH_JULIAN_DATE = 2440587.5
+J2000_JULIAN_DATE = 2451545.0
+
+
+def sun_altitude_degrees(timestamp: float, latitude: float, longitude: float) -> float:
+    """
+    Altitude of the centre of the sun above the horizon (without refraction) at a Unix timestamp,
+    for latitude / longitude in degrees (east positive).
+
+    Low precision formulas of the Astronomical Almanac, accurate to about 0.01 degree between 1950 and 2050.
+    """
+    days = timestamp / 86400.0 + UNIX_EPOCH_JULIAN_DATE - J2000_JULIAN_DATE
+    mean_longitude = 280.460 + 0.9856474 * days
+    mean_anomaly = math.radians(357.528 + 0.9856003 * days)
+    ecliptic_longitude = math.radians(
+        mean_longitude + 1.915 * math.sin(mean_anomaly) + 0.020 * math.sin(2 * mean_anomaly)
+    )
+    obliquity = math.radians(23.439 - 0.0000004 * days)
+
+    right_ascension = math.atan2(math.cos(obliquity) * math.sin(ecliptic_longitude), math.cos(ecliptic_longitude))
+    declination = math.asin(math.sin(obliquity) * math.sin(ecliptic_longitude))
+    sidereal_time = math.radians((280.46061837 + 360.98564736629 * days + longitude) % 360.0)
+    hour_angle = sidereal_time - right_ascension
+
+    latitude = math.radians(latitude)
+    return math.degrees(math.asin(
+        math.sin(latitude) * math.sin(declination)
+        + math.cos(latitude) * math.cos(declination) * math.cos(hour_angle)
+    ))
+
+
+@dataclass
+class NightScheduler:
+    """
+    Suspends detection while the sun is above `twilight_altitude_degrees` at the camera location.
+
+    The altitude is computed locally, no network access is needed. Detection is suspended once the sun rises
+    `hysteresis_degrees` above the threshold and resumed once it sets below it. Suspension is postponed while
+    `can_suspend_function` returns False - a recording in progress is finished by the detector first.
+    Only the inference branch is suspended, recording keeps working.
+    """
+    camera_id: str
+    latitude: float
+    longitude: float
+    set_suspended_function: Callable[[bool], None]
+    # -6 is the end of civil twilight, -12 of nautical, -18 of astronomical twilight
+    twilight_altitude_degrees: float = -6.0
+    hysteresis_degrees: float = 0.5
+    can_suspend_function: Callable[[], bool] = lambda: True
+    registry: MetricsRegistry = field(default_factory=lambda: REGISTRY)
+    clock: Callable[[], float] = time.time
+
+    suspended: bool = field(init=False, default=False)
+
+    def __post_init__(self):
+        assert -90.0 <= self.latitude <= 90.0, f"Invalid latitude {self.latitude}"
+        labels = {"camera": self.camera_id}
+        self._suspended_gauge = self.registry.gauge(
+            "meteor_detection_suspended",
+            "1 while detection is suspended in daylight",
+            ("camera",)
+        ).labels(**labels)
+        self._sun_altitude_gauge = self.registry.gauge(
+            "meteor_sun_altitude_degrees",
+            "Altitude of the sun at the camera location",
+            ("camera",)
+        ).labels(**labels)
+
+    def sun_altitude(self) -> float:
+        return sun_altitude_degrees(self.clock(), self.latitude, self.longitude)
+
+    def update(self) -> bool:
+        """
+        Suspends or resumes detection for the current position of the sun.
+        Meant to be scheduled with `GLib.timeout_add_seconds` - returns True to stay scheduled.
+        """
+        altitude = self.sun_altitude()
+        self._sun_altitude_gauge.set(altitude)
+        if self.suspended and altitude < self.twilight_altitude_degrees:
+            self._set_suspended(False, altitude)
+        elif (
+                not self.suspended
+                and altitude > self.twilight_altitude_degrees + self.hysteresis_degrees
+                and self.can_suspend_function()
+        ):
+            self._set_suspended(True, altitude)
+        return True
+
+    def _set_suspended(self, suspended: bool, altitude: float) -> None:
+        logger.info(
+            f"[Camera = {self.camera_id}] Sun at {altitude:.1f} degrees - "
+            f"{'suspending' if suspended else 'resuming'} detection"
+        )
+        self.suspended = suspended
+        self._suspended_gauge.set(int(suspended))
+        self.set_suspended_function(suspended)
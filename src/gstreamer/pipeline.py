@@ -9,14 +9,15 @@ from typing import Callable
 import gi
 import numpy as np
 
+from src.gstreamer.decode_mode import DecodeMode
 from src.gstreamer.utils import RecordingState
+from src.metrics.camera import CameraMetrics
 
 gi.require_version('Gst', '1.0')
 gi.require_version('GstApp', '1.0')
 gi.require_version('GstVideo', '1.0')
 gi.require_version('GstBase', '1.0')
 
-gi.require_version('Gtk', '3.0')
 gi.require_version('GLib', '2.0')
 gi.require_version('GObject', '2.0')
 
@@ -47,13 +48,38 @@ class TrackerPipeline:
     2. Recording will be stopped after the meteorite is no longer visible.
 
     """
-    def __init__(self, camera_id: str, rtsp_url: str, recordings_directory: Path, recording_buffer: int = 5000000000):
+    def __init__(
+            self,
+            camera_id: str,
+            rtsp_url: str,
+            recordings_directory: Path,
+            recording_buffer: int = 5000000000,
+            metrics: CameraMetrics | None = None
+    ):
         self.camera_id = camera_id
         self.rtsp_url = rtsp_url
         self._recordings_directory = recordings_directory
         self._recording_buffer = recording_buffer
+        self.metrics = metrics
         self.frames_consumed = 0
-        self.stop_recording_time = datetime.datetime.now()
+        # number of frames which entered the inference branch (decoder -> appsink), the inference lag is measured
+        # against it - frames dropped by the decoder gate (key frames only, daylight) are not counted
+        self.frames_entering_inference = 0
+        # number of delta frames dropped in front of the decoder in KEYFRAMES decode mode
+        self.frames_skipped_by_decoder = 0
+        self._decode_mode = DecodeMode.FULL
+        self._waiting_for_keyframe = False
+        # every frame is dropped in front of the decoder while set (daylight), recording is not affected
+        self._detection_suspended = False
+        # PTS and running time (in nanoseconds) of the frame most recently passed to the callbacks
+        self.last_frame_pts: int | None = None
+        self.last_frame_running_time: int | None = None
+        # file of the current (or last) recording
+        self.recording_path: Path | None = None
+        # running time of the first / last buffer of the current recording, None stops at the next buffer
+        self._record_start_running_time: int | None = None
+        self._record_stop_running_time: int | None = None
+        self._stop_recording_probe_id: int | None = None
 
         self.pipeline = Gst.Pipeline.new(f"camera-{self.camera_id}")
 
@@ -82,6 +108,8 @@ class TrackerPipeline:
 
         self._fake_sink_queue = None
         self._fake_sink = None
+        # events are recorded outside of the pipeline (rolling DVR segments) when removed
+        self._file_branch_removed = False
 
         self._recording_started_time = None
         self._recordings_directory.mkdir(parents=True, exist_ok=True)
@@ -91,11 +119,20 @@ class TrackerPipeline:
         self.recordings_counter = 0
         self._last_recording_start_time = time.time()
         self._last_recording_stop_time = time.time()
+        self._recording_start_requested_at: float | None = None
+        self._recording_stop_requested_at: float | None = None
+
+        # called (from the main loop) when the camera stream fails, the pipeline is terminated when not set
+        self._source_failure_handler: Callable[[str], None] | None = None
+        self._source_connected_callbacks: list[Callable[[], None]] = list()
+        self.last_source_buffer_time = time.monotonic()
+        self._shutting_down = False
+        self._loop: GLib.MainLoop | None = None
 
         self._new_sample_callbacks: list[Callable[[np.array], None]] = list()
 
     def initialize_pipeline(self) -> None:
-        self._rtsp_source = Gst.ElementFactory.make("rtspsrc", "rtsp-source")
+        self._rtsp_source = self._create_source()
         self._rtp_queue = Gst.ElementFactory.make("queue", "rtp-queue")
         self._depay = Gst.ElementFactory.make("rtph264depay", "rtph264-depay")
         self._parser = Gst.ElementFactory.make("h264parse", "h264-parser")
@@ -163,7 +200,6 @@ class TrackerPipeline:
         self.pipeline.add(self._fake_sink_queue)
         self.pipeline.add(self._fake_sink)
 
-        self._rtsp_source.connect("pad-added", self.on_rtsp_src_pad_added)
 
         assert self._rtp_queue.link(self._depay)
         assert self._depay.link(self._parser)
@@ -217,8 +253,19 @@ class TrackerPipeline:
         assert sink_queue_src_pad
         sink_queue_src_pad.add_probe(Gst.PadProbeType.BUFFER, self._sink_queue_probe_callback)
 
-        # set rtsp url
-        self._rtsp_source.set_property("location", self.rtsp_url)
+        # gate in front of the decoder - drops delta frames in KEYFRAMES decode mode
+        # and counts frames entering the decoder to know how far behind the inference is
+        app_queue_src_pad = self._app_queue.get_static_pad("src")
+        assert app_queue_src_pad
+        app_queue_src_pad.add_probe(Gst.PadProbeType.BUFFER, self._decoder_gate_probe_callback)
+
+        # watch data coming from the source - EOS of a camera stream is handled by the reconnect logic
+        rtp_queue_sink_pad = self._rtp_queue.get_static_pad("sink")
+        assert rtp_queue_sink_pad
+        rtp_queue_sink_pad.add_probe(
+            Gst.PadProbeType.BUFFER | Gst.PadProbeType.EVENT_DOWNSTREAM,
+            self._source_data_probe_callback
+        )
 
         # set file sink location
         self._file_sink.set_property(
@@ -237,6 +284,46 @@ class TrackerPipeline:
         self._appsink.set_property("sync", False)  # Set sync=False to process frames as fast as they arrive.
         self._appsink.connect("new-sample", self._on_new_sample, None)
 
+    def remove_file_branch(self) -> None:
+        """
+        Removes the mp4mux / file-sink branch for a recorder which records events elsewhere - it would
+        otherwise write `first-few-frames.mp4` for the whole run. Has to be called before the pipeline starts.
+        """
+        file_sink_queue_sink_pad = self._file_sink_queue.get_static_pad("sink")
+        assert file_sink_queue_sink_pad
+        self._sink_tee_src_record_pad.unlink(file_sink_queue_sink_pad)
+        self._sink_tee.release_request_pad(self._sink_tee_src_record_pad)
+        self._sink_tee_src_record_pad = None
+        for element in (self._file_sink_queue, self._mp4mux, self._file_sink):
+            self.pipeline.remove(element)
+        self._file_branch_removed = True
+
+    def link_stream_branch(self, element: Gst.Element) -> None:
+        """ Links an element (already added to the pipeline) to the parsed H.264 stream of the camera """
+        app_tee_src_pad = self._app_tee.get_request_pad("src_%u")
+        assert app_tee_src_pad
+        element_sink_pad = element.get_static_pad("sink")
+        assert element_sink_pad
+        assert app_tee_src_pad.link(element_sink_pad) == Gst.PadLinkReturn.OK
+
+    @property
+    def running_time(self) -> int | None:
+        clock = self.pipeline.get_clock()
+        if clock is None:
+            return None
+        return clock.get_time() - self.pipeline.get_base_time()
+
+    @property
+    def decision_running_time(self) -> int:
+        """ Running time of the frame the latest decision was made on (e.g. the frame with a detection) """
+        if self.last_frame_running_time is not None:
+            return self.last_frame_running_time
+        return self.running_time or 0
+
+    @property
+    def inference_queue_depth(self) -> int:
+        return self._app_queue.get_property("current-level-buffers")
+
     @property
     def state(self) -> RecordingState:
         return self._state
@@ -247,6 +334,7 @@ class TrackerPipeline:
         self._state = new_state
 
     def add_bus_to_pipeline(self, loop: GLib.MainLoop) -> None:
+        self._loop = loop
         bus = self.pipeline.get_bus()
         bus.add_signal_watch()
         bus.connect("message", self.on_message, loop)
@@ -267,15 +355,94 @@ class TrackerPipeline:
         elif t == Gst.MessageType.ERROR:
             err, debug = message.parse_error()
             logger.error(f"Error: {err}: {debug}")
+            if self._source_failure_handler is not None and self._is_source_message(message):
+                if self._is_current_source_message(message):
+                    self._source_failure_handler(f"{err}")
+                else:
+                    logger.info(f"Ignoring error of a replaced rtsp-source of camera {self.camera_id}")
+                return
             self.terminate()
             loop.quit()
 
+    def _is_source_message(self, message: Gst.Message) -> bool:
+        """ Message of the current or of an already replaced source - they share the name """
+        return message.src is not None and "rtsp-source" in message.src.get_path_string()
+
+    def _is_current_source_message(self, message: Gst.Message) -> bool:
+        # errors of already replaced sources may still arrive - they must not replace the healthy new source
+        element = message.src
+        while element is not None:
+            if element == self._rtsp_source:
+                return True
+            element = element.get_parent()
+        return False
+
+    def set_source_failure_handler(self, handler: Callable[[str], None] | None) -> None:
+        self._source_failure_handler = handler
+
+    def add_source_connected_callback(self, callback: Callable[[], None]) -> None:
+        self._source_connected_callbacks.append(callback)
+
+    def _create_source(self) -> Gst.Element:
+        rtsp_source = Gst.ElementFactory.make("rtspsrc", "rtsp-source")
+        assert rtsp_source
+        rtsp_source.set_property("location", self.rtsp_url)
+        rtsp_source.connect("pad-added", self.on_rtsp_src_pad_added)
+        return rtsp_source
+
+    def replace_source(self) -> None:
+        """
+        Replaces the rtsp-source with a new one, the rest of the pipeline (decoder, detector, queues) keeps running.
+        Must be called from the main loop.
+        """
+        logger.info(f"Replacing rtsp-source of camera {self.camera_id}")
+        old_source = self._rtsp_source
+        old_source.set_state(Gst.State.NULL)
+        self.pipeline.remove(old_source)
+
+        self._rtsp_source = self._create_source()
+        self.pipeline.add(self._rtsp_source)
+        # restore the pre-roll which might have been drained when finalising a recording
+        self._sink_queue.set_property("min-threshold-time", self._recording_buffer)
+        # delta frames before the first key frame of the new stream cannot be decoded
+        self._waiting_for_keyframe = True
+        self.last_source_buffer_time = time.monotonic()
+        if not self._rtsp_source.sync_state_with_parent():
+            logger.error(f"Unable to start new rtsp-source of camera {self.camera_id}")
+
+    def _source_data_probe_callback(self, pad: Gst.Pad, info: Gst.PadProbeInfo) -> Gst.PadProbeReturn:
+        if info.type & Gst.PadProbeType.BUFFER:
+            self.last_source_buffer_time = time.monotonic()
+            return Gst.PadProbeReturn.OK
+
+        event = info.get_event()
+        if (
+                event is not None
+                and event.type == Gst.EventType.EOS
+                and self._source_failure_handler is not None
+                and not self._shutting_down
+        ):
+            # EOS of the camera stream would put the whole pipeline into EOS - keep it running and reconnect
+            logger.warning(f"Camera {self.camera_id} stream ended")
+            GLib.idle_add(self._on_source_ended, self._rtsp_source)
+            return Gst.PadProbeReturn.DROP
+        return Gst.PadProbeReturn.OK
+
+    def _on_source_ended(self, source: Gst.Element) -> bool:
+        # the source might have been replaced before the main loop got to the end of its stream
+        if source is self._rtsp_source and self._source_failure_handler is not None:
+            self._source_failure_handler("end of stream")
+        return False
+
     def on_rtsp_src_pad_added(self, element: Gst.Element, pad: Gst.Pad) -> None:
         logger.debug(f"[Element = {element}] [Pad = {pad}] Trying to link rtp-queue to rtsp-source")
         rtp_rtp_queue_sink_pad = self._rtp_queue.get_static_pad("sink")
         assert rtp_rtp_queue_sink_pad
         if pad.link(rtp_rtp_queue_sink_pad) == Gst.PadLinkReturn.OK:
             logger.info(f"[Element = {element}] rtp-queue has been successfully linked to rtsp-source!")
+            for callback in self._source_connected_callbacks:
+                # pad-added is emitted from a streaming thread
+                GLib.idle_add(callback)
         else:
             logger.error(f"[Element = {element}] rtp-queue could not be linked linked to rtsp-source!")
 
@@ -306,7 +473,9 @@ class TrackerPipeline:
         ret = self.pipeline.set_state(Gst.State.PLAYING)
         if ret == Gst.StateChangeReturn.FAILURE:
             raise RuntimeError(f"Unable to set the pipeline for rtsp-url: {self.rtsp_url} to the playing state")
-        self.state = RecordingState.RECORDING
+        if not self._file_branch_removed:
+            # the file branch is linked to `first-few-frames.mp4` until the first recording is stopped
+            self.state = RecordingState.RECORDING
         self._recording_started_time = time.time()
 
     def add_callback_probe(self, callback: Callable[[Gst.Pad, Gst.PadProbeInfo], Gst.PadProbeReturn]) -> None:
@@ -332,10 +501,14 @@ class TrackerPipeline:
         width = structure.get_value("width")
         height = structure.get_value("height")
 
+        self._update_frame_timing(sample, buffer)
+
         # Map the buffer so we can access its data
         success, map_info = buffer.map(Gst.MapFlags.READ)
         if not success:
             logger.info("Could not map buffer data!")
+            if self.metrics is not None:
+                self.metrics.dropped_frames("map_failed").inc()
             return Gst.FlowReturn.ERROR
 
         try:
@@ -351,12 +524,32 @@ class TrackerPipeline:
                 callback(frame)
         except Exception as e:
             logger.error(f"Error processing frame: {e}")
+            if self.metrics is not None:
+                self.metrics.dropped_frames("callback_error").inc()
         finally:
             # Unmap the buffer after processing
             buffer.unmap(map_info)
 
         return Gst.FlowReturn.OK
 
+    def _update_frame_timing(self, sample: Gst.Sample, buffer: Gst.Buffer) -> None:
+        if buffer.pts == Gst.CLOCK_TIME_NONE:
+            self.last_frame_pts = None
+            self.last_frame_running_time = None
+            return
+        self.last_frame_pts = buffer.pts
+        self.last_frame_running_time = sample.get_segment().to_running_time(Gst.Format.TIME, buffer.pts)
+
+        if self.metrics is None:
+            return
+        clock = self.pipeline.get_clock()
+        if clock is not None:
+            current_running_time = clock.get_time() - self.pipeline.get_base_time()
+            self.metrics.decode_latency.observe(
+                max(current_running_time - self.last_frame_running_time, 0) / Gst.SECOND
+            )
+        self.metrics.queue_depth.set(self.inference_queue_depth)
+
     def add_app_sink_new_sample_callback(self, callback: Callable[[np.array], None]) -> None:
         self._new_sample_callbacks.append(callback)
 
@@ -364,15 +557,68 @@ class TrackerPipeline:
         self.frames_consumed += 1
         return Gst.PadProbeReturn.OK
 
-    def _start_recording_pad_callback(self, pad, info):
+    @property
+    def decode_mode(self) -> DecodeMode:
+        return self._decode_mode
+
+    def set_decode_mode(self, mode: DecodeMode) -> None:
+        if mode == DecodeMode.FULL and self._decode_mode == DecodeMode.KEYFRAMES:
+            # delta frames following the dropped ones cannot be decoded - resume on the next key frame
+            self._waiting_for_keyframe = True
+        self._decode_mode = mode
+
+    @property
+    def detection_suspended(self) -> bool:
+        return self._detection_suspended
+
+    def set_detection_suspended(self, suspended: bool) -> None:
+        if not suspended and self._detection_suspended:
+            # the decoder starts from scratch - resume on the next key frame
+            self._waiting_for_keyframe = True
+        self._detection_suspended = suspended
+
+    def _decoder_gate_probe_callback(self, pad: Gst.Pad, info: Gst.PadProbeInfo) -> Gst.PadProbeReturn:
+        if self._detection_suspended:
+            # not counted in `frames_entering_inference` - the inference lag stays flat during the day
+            if self.metrics is not None:
+                self.metrics.dropped_frames("daylight").inc()
+            return Gst.PadProbeReturn.DROP
+        buffer = info.get_buffer()
+        is_delta_frame = buffer is not None and buffer.has_flags(Gst.BufferFlags.DELTA_UNIT)
+        if is_delta_frame and (self._decode_mode == DecodeMode.KEYFRAMES or self._waiting_for_keyframe):
+            self.frames_skipped_by_decoder += 1
+            if self.metrics is not None:
+                self.metrics.dropped_frames("keyframes_only").inc()
+            return Gst.PadProbeReturn.DROP
+        self._waiting_for_keyframe = False
+        self.frames_entering_inference += 1
+        return Gst.PadProbeReturn.OK
+
+    @staticmethod
+    def _buffer_running_time(pad: Gst.Pad, buffer: Gst.Buffer | None) -> int | None:
+        if buffer is None or buffer.pts == Gst.CLOCK_TIME_NONE:
+            return None
+        segment_event = pad.get_sticky_event(Gst.EventType.SEGMENT, 0)
+        if segment_event is None:
+            return None
+        running_time = segment_event.parse_segment().to_running_time(Gst.Format.TIME, buffer.pts)
+        return None if running_time == Gst.CLOCK_TIME_NONE else running_time
+
+    def _start_recording_pad_callback(self, pad: Gst.Pad, info: Gst.PadProbeInfo) -> Gst.PadProbeReturn:
+        buffer = info.get_buffer()
+        running_time = self._buffer_running_time(pad, buffer)
+        if running_time is not None and running_time < self._record_start_running_time:
+            # still older than the pre-roll of the recording
+            return Gst.PadProbeReturn.PASS
+        if buffer.has_flags(Gst.BufferFlags.DELTA_UNIT):
+            # the file has to begin with a key frame
+            return Gst.PadProbeReturn.PASS
+
         assert self._file_sink_queue.set_state(Gst.State.NULL)
         assert self._mp4mux.set_state(Gst.State.NULL)
         assert self._file_sink.set_state(Gst.State.NULL)
 
-        self._file_sink.set_property(
-            "location",
-            f"{self._recordings_directory}/{datetime.datetime.now().isoformat()}.mp4"
-        )
+        self._file_sink.set_property("location", str(self.recording_path))
 
         file_sink_queue_sink_pad = self._file_sink_queue.get_static_pad('sink')
         assert file_sink_queue_sink_pad
@@ -391,6 +637,9 @@ class TrackerPipeline:
         self._file_sink.sync_state_with_parent()
 
         self.state = RecordingState.RECORDING
+        if self.metrics is not None and self._recording_start_requested_at is not None:
+            self.metrics.recording_start_latency.observe(time.perf_counter() - self._recording_start_requested_at)
+            self._recording_start_requested_at = None
 
         return Gst.PadProbeReturn.REMOVE
 
@@ -398,23 +647,41 @@ class TrackerPipeline:
         logger.info(f"Starting recording!")
 
         self._last_recording_start_time = time.time()
+        self._recording_start_requested_at = time.perf_counter()
 
         current_datetime = datetime.datetime.now()
-        self._file_sink.set_property(
-            "location",
-            f"{self._recordings_directory}/recording-{self.recordings_counter}-date-{current_datetime.isoformat()}.mp4"
+        self.recording_path = (
+            self._recordings_directory / f"recording-{self.recordings_counter}-date-{current_datetime.isoformat()}.mp4"
         )
+        self._file_sink.set_property("location", str(self.recording_path))
+
+        # buffers reaching the sink-tee lag behind the decoded frames by the pre-roll, the recording begins
+        # with the first key frame which is at most `recording_buffer` older than the triggering frame
+        self._record_start_running_time = max(self.decision_running_time - self._recording_buffer, 0)
+        logger.info(f"Recording will start at running time {Gst.TIME_ARGS(self._record_start_running_time)}")
 
         assert self._sink_tee_src_record_pad
-        self._sink_tee_src_record_pad.add_probe(Gst.PadProbeType.IDLE, self._start_recording_pad_callback)
+        # the pad is relinked from a blocking probe - sticky events are then resent to the file branch
+        self._sink_tee_src_record_pad.add_probe(
+            Gst.PadProbeType.BLOCK | Gst.PadProbeType.BUFFER, self._start_recording_pad_callback
+        )
 
         if self.state != RecordingState.RECORDING:
             self.state = RecordingState.STARTING
 
     def _stop_recording_pad_callback(self, pad: Gst.Pad, info: Gst.PadProbeInfo) -> Gst.PadProbeReturn:
-        if datetime.datetime.now() < self.stop_recording_time:
-            # Recording should not be stopped yet
-            return Gst.PadProbeReturn.PASS
+        if self.state == RecordingState.STOPPED:
+            # recording has already been finalised by another probe
+            return Gst.PadProbeReturn.REMOVE
+
+        if self._record_stop_running_time is not None:
+            running_time = self._buffer_running_time(pad, info.get_buffer())
+            if running_time is None:
+                # buffers without PTS - the stop point was placed on the pipeline clock too (`decision_running_time`)
+                running_time = self.running_time
+            if running_time is not None and running_time < self._record_stop_running_time:
+                # Recording should not be stopped yet
+                return Gst.PadProbeReturn.PASS
 
         # Recording should be stopped -> file_sink_queue will be unlinked from tee element
         logger.info(f"Reached stopping in '_stop_recording_pad_callback'!")
@@ -430,7 +697,15 @@ class TrackerPipeline:
         # assert self._mp4mux.set_state(Gst.State.NULL)
         # assert self._file_sink.set_state(Gst.State.NULL)
 
+        if self._stop_recording_probe_id is not None and self._stop_recording_probe_id != info.id:
+            # recording has been finalised right away - the scheduled stop must not end the next recording
+            pad.remove_probe(self._stop_recording_probe_id)
+        self._stop_recording_probe_id = None
+
         self.state = RecordingState.STOPPED
+        if self.metrics is not None and self._recording_stop_requested_at is not None:
+            self.metrics.recording_stop_latency.observe(time.perf_counter() - self._recording_stop_requested_at)
+            self._recording_stop_requested_at = None
 
         return Gst.PadProbeReturn.REMOVE
 
@@ -438,30 +713,78 @@ class TrackerPipeline:
         logger.info(f"Stopping recording on pipeline for = {self.camera_id}.")
 
         self._last_recording_stop_time = time.time()
+        self._recording_stop_requested_at = time.perf_counter()
 
-        before_detection_buffer = self._recording_buffer
-        after_detection_buffer = self._recording_buffer
-
-        seconds_delta = after_detection_buffer / 1e9
-        # because recording is "set-back-in-time" for before_detection_buffer
-        # we must also add it to time-delta
-        seconds_delta += before_detection_buffer / 1e9
-        current_time = datetime.datetime.now()
-        self.stop_recording_time = current_time + datetime.timedelta(seconds=seconds_delta)
-        stopping_latency = self.stop_recording_time - current_time
-        logger.info(f"Current time = {current_time.strftime('%H:%M:%S.%s')}")
-        logger.info(f"Recording will be stopped in {self.stop_recording_time.strftime('%H:%M:%S.%s')}")
-        logger.info(f"Stopping will take {stopping_latency.total_seconds()}")
+        # buffers reaching the sink-tee lag behind the decoded frames by the pre-roll, so the file branch
+        # is unlinked in front of the first buffer past the post-roll of the triggering frame
+        decision_running_time = self.decision_running_time
+        self._record_stop_running_time = decision_running_time + self._recording_buffer
+        logger.info(f"Decision at running time {Gst.TIME_ARGS(decision_running_time)}")
+        logger.info(f"Recording will be stopped at running time {Gst.TIME_ARGS(self._record_stop_running_time)}")
 
         assert self._sink_tee
         assert self._sink_tee_src_record_pad
-        self._sink_tee_src_record_pad.add_probe(
-            Gst.PadProbeType.IDLE, self._stop_recording_pad_callback
+        self._stop_recording_probe_id = self._sink_tee_src_record_pad.add_probe(
+            Gst.PadProbeType.BLOCK | Gst.PadProbeType.BUFFER, self._stop_recording_pad_callback
         )
         if self.state != RecordingState.STOPPED:
             self.state = RecordingState.STOPPING
 
+    def finalize_recording(self) -> None:
+        """
+        Stops an open recording right away (e.g. when the camera stream is lost).
+        Pre-roll kept in the sink-queue belongs to the recording, so the queue is drained first.
+        """
+        if self._file_branch_removed or self.state not in (RecordingState.RECORDING, RecordingState.STOPPING):
+            return
+        logger.info(f"Finalising open recording of camera {self.camera_id}")
+        self._sink_queue.set_property("min-threshold-time", 0)
+        GLib.timeout_add(100, self._stop_recording_when_drained)
+
+    def _stop_recording_when_drained(self) -> bool:
+        if self._sink_queue.get_property("current-level-buffers") > 0:
+            return True
+        # there might be no more buffers - stop as soon as the pad is idle
+        self._record_stop_running_time = None
+        if self.state == RecordingState.RECORDING:
+            self._recording_stop_requested_at = time.perf_counter()
+            self.state = RecordingState.STOPPING
+        self._sink_tee_src_record_pad.add_probe(Gst.PadProbeType.IDLE, self._stop_recording_pad_callback)
+        return False
+
+    def health(self) -> tuple[bool, dict]:
+        """ Called from the metrics server thread - only reads the state """
+        _, state, _ = self.pipeline.get_state(0)
+        details = {
+            "camera": self.camera_id,
+            "state": state.value_nick,
+            "frames_consumed": self.frames_consumed,
+            "detection_suspended": self._detection_suspended,
+            "seconds_since_source_data": round(time.monotonic() - self.last_source_buffer_time, 1),
+        }
+        return state == Gst.State.PLAYING and not self._shutting_down, details
+
+    def shutdown(self, timeout_seconds: int = 5) -> bool:
+        """
+        Gracefully stops the pipeline - EOS lets mp4mux finalise an open recording.
+        The main loop quits on the EOS message, or after `timeout_seconds` when EOS never reaches the bus.
+        """
+        logger.info(f"Shutting down pipeline of camera {self.camera_id}")
+        self._shutting_down = True
+        self.pipeline.send_event(Gst.Event.new_eos())
+        GLib.timeout_add_seconds(timeout_seconds, self._force_quit)
+        # also used as a GLib signal handler - do not stay installed
+        return False
+
+    def _force_quit(self) -> bool:
+        logger.warning(f"Pipeline of camera {self.camera_id} did not reach EOS in time - terminating")
+        self.terminate()
+        if self._loop is not None:
+            self._loop.quit()
+        return False
+
     def terminate(self) -> None:
+        self._shutting_down = True
         self.pipeline.set_state(Gst.State.NULL)
 
     def stop_after_5_seconds(self, loop) -> bool:
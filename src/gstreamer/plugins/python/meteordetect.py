@@ -0,0 +1,19 @@
+"""
+Entry point of the `meteordetect` element for the GStreamer Python plugin loader (gst-python):
+
+    GST_PLUGIN_PATH=$PWD/src/gstreamer/plugins gst-launch-1.0 ... ! meteordetect ! ...
+
+The loader imports this file on its own, so the project directory is put on the module path first.
+"""
+import sys
+from pathlib import Path
+
+PROJECT_DIRECTORY = Path(__file__).resolve().parents[4]
+if str(PROJECT_DIRECTORY) not in sys.path:
+    sys.path.insert(0, str(PROJECT_DIRECTORY))
+
+from gi.repository import Gst  # noqa: E402
+
+from src.gstreamer.detector_element import ELEMENT_NAME, MeteorDetect  # noqa: E402
+
+__gstelementfactory__ = (ELEMENT_NAME, Gst.Rank.NONE, MeteorDetect)
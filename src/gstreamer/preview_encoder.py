@@ -0,0 +1,82 @@
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import gi
+
+from src.types import NumpyImage
+
+gi.require_version('Gst', '1.0')
+
+from gi.repository import Gst
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Mp4PreviewWriter:
+    """
+    Encodes frames pushed one at a time into a small H.264 MP4:
+
+        appsrc -> videoconvert -> x264enc -> mp4mux -> filesink
+
+    The appsrc blocks once `max_queued_bytes` are waiting for the encoder, so memory stays constant
+    however long the clip is. The size of the video is taken from the first (BGR) frame.
+    """
+    output_path: Path
+    frame_duration_ms: int = 100
+    bitrate_kbps: int = 500
+    max_queued_bytes: int = 8 * 1024 * 1024
+    finish_timeout_seconds: float = 30.0
+    frames_written: int = field(init=False, default=0)
+    _pipeline: Gst.Pipeline | None = field(init=False, default=None)
+    _source: Gst.Element | None = field(init=False, default=None)
+
+    def __enter__(self) -> "Mp4PreviewWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, frame: NumpyImage) -> None:
+        if self._pipeline is None:
+            self._start(width=frame.shape[1], height=frame.shape[0])
+        buffer = Gst.Buffer.new_wrapped(frame.tobytes())
+        buffer.duration = self.frame_duration_ms * Gst.MSECOND
+        buffer.pts = self.frames_written * buffer.duration
+        if self._source.emit("push-buffer", buffer) != Gst.FlowReturn.OK:
+            raise RuntimeError(f"Unable to encode preview {self.output_path}")
+        self.frames_written += 1
+
+    def close(self) -> None:
+        if self._pipeline is None:
+            return
+        self._source.emit("end-of-stream")
+        # mp4mux writes the moov atom on EOS - wait for it to reach the bus
+        message = self._pipeline.get_bus().timed_pop_filtered(
+            int(self.finish_timeout_seconds * Gst.SECOND),
+            Gst.MessageType.EOS | Gst.MessageType.ERROR
+        )
+        self._pipeline.set_state(Gst.State.NULL)
+        self._pipeline = None
+        if message is None:
+            logger.error(f"Preview {self.output_path} has not been finalised in {self.finish_timeout_seconds} seconds")
+        elif message.type == Gst.MessageType.ERROR:
+            error, debug_info = message.parse_error()
+            logger.error(f"Unable to encode preview {self.output_path}. Error = {error.message}, debug = {debug_info}")
+
+    def _start(self, width: int, height: int) -> None:
+        # also used outside of the pipeline process (CLI, preview builder) - initialisation is idempotent
+        Gst.init(None)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        framerate = Gst.Fraction(1000, self.frame_duration_ms)
+        self._pipeline = Gst.parse_launch(
+            f"appsrc name=preview-source format=time block=true max-bytes={self.max_queued_bytes} "
+            f"caps=video/x-raw,format=BGR,width={width},height={height},framerate={framerate.num}/{framerate.denom} ! "
+            "videoconvert ! video/x-raw,format=I420 ! "
+            f"x264enc speed-preset=ultrafast bitrate={self.bitrate_kbps} ! video/x-h264,profile=baseline ! "
+            f"mp4mux ! filesink location=\"{self.output_path}\""
+        )
+        self._source = self._pipeline.get_by_name("preview-source")
+        if self._pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            raise RuntimeError(f"Unable to start the preview encoder for {self.output_path}")
@@ -0,0 +1,132 @@
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+import gi
+
+from src.backoff import compute_backoff
+from src.gstreamer.pipeline import TrackerPipeline
+from src.metrics.registry import MetricsRegistry, REGISTRY
+
+gi.require_version('GLib', '2.0')
+
+from gi.repository import GLib
+
+logger = logging.getLogger(__name__)
+
+OUTAGE_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+
+
+@dataclass
+class ReconnectSupervisor:
+    """
+    Keeps the camera stream alive without restarting the process.
+
+    When the rtsp-source fails (error, end of stream or no data for `stall_timeout_seconds`)
+    an open recording is finalised and the source - and only the source - is rebuilt
+    with exponential backoff and jitter. Decoder, detector, tracker and the pre-roll queue stay as they are.
+    All callbacks run on the GLib main loop.
+    """
+    pipeline: TrackerPipeline
+    initial_backoff_seconds: float = 1.0
+    max_backoff_seconds: float = 30.0
+    backoff_multiplier: float = 2.0
+    jitter: float = 0.3
+    stall_timeout_seconds: float = 10.0
+    registry: MetricsRegistry = field(default_factory=lambda: REGISTRY)
+    rng: random.Random = field(default_factory=random.Random)
+    clock_function: Callable[[], float] = time.monotonic
+    # GLib.timeout_add(interval_ms, callback)
+    timeout_function: Callable[[int, Callable[[], bool]], int] = GLib.timeout_add
+
+    _attempt: int = field(init=False, default=0)
+    _outage_started_at: float | None = field(init=False, default=None)
+    _reconnect_scheduled: bool = field(init=False, default=False)
+    _attempt_started_at: float = field(init=False, default=0.0)
+
+    def __post_init__(self):
+        labels = {"camera": self.pipeline.camera_id}
+        self._outages = self.registry.counter(
+            "meteor_source_outages_total",
+            "Number of times the camera stream has been lost",
+            ("camera",)
+        ).labels(**labels)
+        self._reconnect_attempts = self.registry.counter(
+            "meteor_source_reconnect_attempts_total",
+            "Number of attempts to reconnect to the camera stream",
+            ("camera",)
+        ).labels(**labels)
+        self._outage_duration = self.registry.histogram(
+            "meteor_source_outage_seconds",
+            "Time between losing the camera stream and reconnecting to it",
+            ("camera",),
+            OUTAGE_BUCKETS
+        ).labels(**labels)
+        self._connected = self.registry.gauge(
+            "meteor_source_connected",
+            "1 when the camera stream is connected, 0 during an outage",
+            ("camera",)
+        ).labels(**labels)
+
+    def start(self) -> None:
+        self.pipeline.set_source_failure_handler(self.on_source_failure)
+        self.pipeline.add_source_connected_callback(self.on_source_connected)
+        GLib.timeout_add_seconds(1, self._check_stall)
+
+    def on_source_failure(self, reason: str) -> bool:
+        if self._reconnect_scheduled:
+            return False
+        if self._outage_started_at is None:
+            logger.warning(f"[Camera = {self.pipeline.camera_id}] Camera stream lost ({reason})")
+            self._outage_started_at = self.clock_function()
+            self._outages.inc()
+            self._connected.set(0)
+            self.pipeline.finalize_recording()
+        else:
+            logger.warning(f"[Camera = {self.pipeline.camera_id}] Reconnect attempt {self._attempt} failed ({reason})")
+
+        delay = compute_backoff(
+            attempt=self._attempt,
+            initial_seconds=self.initial_backoff_seconds,
+            max_seconds=self.max_backoff_seconds,
+            multiplier=self.backoff_multiplier,
+            jitter=self.jitter,
+            rng=self.rng
+        )
+        logger.info(f"[Camera = {self.pipeline.camera_id}] Reconnecting in {delay:.1f} seconds")
+        self._reconnect_scheduled = True
+        self.timeout_function(int(delay * 1000), self._reconnect)
+        # also used as a one-shot GLib.idle_add callback
+        return False
+
+    def on_source_connected(self) -> bool:
+        if self._outage_started_at is not None:
+            outage = self.clock_function() - self._outage_started_at
+            logger.info(f"[Camera = {self.pipeline.camera_id}] Reconnected after {outage:.1f} seconds")
+            self._outage_duration.observe(outage)
+            self._outage_started_at = None
+        self._attempt = 0
+        self._connected.set(1)
+        return False
+
+    def _reconnect(self) -> bool:
+        self._reconnect_scheduled = False
+        self._attempt += 1
+        self._attempt_started_at = self.clock_function()
+        self._reconnect_attempts.inc()
+        self.pipeline.replace_source()
+        return False
+
+    def _check_stall(self) -> bool:
+        if self._reconnect_scheduled:
+            return True
+        now = self.clock_function()
+        if self._outage_started_at is not None:
+            # a reconnect attempt which neither failed nor connected
+            if now - self._attempt_started_at > self.stall_timeout_seconds:
+                self.on_source_failure("reconnect attempt timed out")
+        elif now - self.pipeline.last_source_buffer_time > self.stall_timeout_seconds:
+            self.on_source_failure(f"no data for {self.stall_timeout_seconds} seconds")
+        return True
@@ -5,7 +5,7 @@ from typing import Callable
 
 import numpy as np
 
-from src.file_operations.images import draw_tracks_numpy
+from src.file_operations.async_writer import AsyncImageWriter
 from src.file_operations.writer import ImageWriter
 from src.gstreamer.utils import RecordingState
 from src.types import BBoxList
@@ -18,12 +18,14 @@ class RecordManager:
     start_recording_function: Callable[[], None]
     stop_recording_function: Callable[[], None]
     get_state_function: Callable[[], RecordingState]
-    image_writer: ImageWriter | None = None
+    image_writer: ImageWriter | AsyncImageWriter | None = None
 
     # number of frames with detections after which the manager will start recording
     start_recording_threshold: int = 5
     # number of frames without detections after which the manager will stop recording
     stop_recording_threshold: int = 10
+    # set while a recording started on request is running - it is not stopped for lack of detections
+    hold_recording: bool = False
 
     _last_30_frames: collections.deque = field(
         default_factory=lambda: collections.deque([False] * 30, maxlen=30),
@@ -55,12 +57,11 @@ class RecordManager:
                     should_stop_recording = False
                     break
 
-            if should_stop_recording:
+            if should_stop_recording and not self.hold_recording:
                 self.stop_recording_function()
 
     def save_preview_image(self, frame: np.array, bboxes: BBoxList) -> None:
         if self.image_writer is None:
             return
 
-        painted_frame = draw_tracks_numpy(frame, bboxes)
-        self.image_writer.save(painted_frame)
+        self.image_writer.save_preview(frame, bboxes)
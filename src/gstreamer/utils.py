@@ -8,7 +8,6 @@ gi.require_version('GstApp', '1.0')
 gi.require_version('GstVideo', '1.0')
 gi.require_version('GstBase', '1.0')
 
-gi.require_version('Gtk', '3.0')
 gi.require_version('GLib', '2.0')
 gi.require_version('GObject', '2.0')
 
@@ -1,9 +1,11 @@
 from dataclasses import dataclass, field
+from typing import Optional
 
 import numpy as np
 from ioutrack import BaseTracker
 from src.detectors.base import BaseDetector
 from src.inference.base import BaseInferenceEngine
+from src.metrics.camera import CameraMetrics
 from src.types import NumpyImage, BBoxList
 
 
@@ -12,12 +14,21 @@ class FrameDiffInference(BaseInferenceEngine):
     detector: BaseDetector
     tracker: BaseTracker
     min_hits: int = 5
+    metrics: Optional[CameraMetrics] = None
+    # raw detector output of the last frame, before tracking
+    last_detections: BBoxList = field(init=False, default_factory=lambda: np.zeros((0, 5), dtype=np.float32))
     _frames_passed: int = field(init=False, default=0)
 
     def update(self, frame: NumpyImage) -> BBoxList:
-        bboxes = self.detector.update(frame)
-        bboxes = self.tracker.update(bboxes, return_all=False)
+        if self.metrics is None:
+            self.last_detections = self.detector.update(frame)
+            bboxes = self.tracker.update(self.last_detections, return_all=False)
+        else:
+            with self.metrics.time_stage("detector"):
+                self.last_detections = self.detector.update(frame)
+            with self.metrics.time_stage("tracker"):
+                bboxes = self.tracker.update(self.last_detections, return_all=False)
         self._frames_passed += 1
         if self._frames_passed < self.min_hits:
-            return np.zeros(shape=np.zeros((0, 5), dtype=np.float32))
+            return np.zeros((0, 5), dtype=np.float32)
         return bboxes
@@ -0,0 +1,96 @@
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+PROTOCOL_VERSION = 1
+PTS_NONE = -1
+
+# every batch on the socket is prefixed by the length of its payload
+LENGTH_PREFIX = struct.Struct("<I")
+# version, number of events, length of the camera id
+BATCH_HEADER = struct.Struct("<BHB")
+# event type, pts, wall clock time in nanoseconds
+EVENT_HEADER = struct.Struct("<Bqq")
+# number of boxes of a detection event
+BOX_COUNT = struct.Struct("<H")
+# length of the name of the state
+RECORDING_STATE = struct.Struct("<B")
+
+DETECTIONS_EVENT = 1
+RECORDING_STATE_EVENT = 2
+
+
+@dataclass(frozen=True)
+class DetectionsEvent:
+    pts: int | None
+    time_ns: int
+    # [[x0, y0, x1, y1, track_id]]
+    boxes: np.ndarray
+
+
+@dataclass(frozen=True)
+class RecordingStateEvent:
+    pts: int | None
+    time_ns: int
+    # value of `RecordingState` - subscribers do not need GStreamer to decode it
+    state: str
+
+
+Event = DetectionsEvent | RecordingStateEvent
+
+
+@dataclass(frozen=True)
+class EventBatch:
+    camera_id: str
+    events: list[Event]
+
+
+def encode_batch(camera_id: str, events: list[Event]) -> bytes:
+    """ Length-prefixed binary batch, boxes are little-endian float32 """
+    camera = camera_id.encode("utf-8")
+    parts = [BATCH_HEADER.pack(PROTOCOL_VERSION, len(events), len(camera)), camera]
+    for event in events:
+        pts = PTS_NONE if event.pts is None else event.pts
+        if isinstance(event, DetectionsEvent):
+            boxes = np.ascontiguousarray(event.boxes, dtype="<f4").reshape(-1, 5)
+            parts += [EVENT_HEADER.pack(DETECTIONS_EVENT, pts, event.time_ns), BOX_COUNT.pack(len(boxes)), boxes.tobytes()]
+        else:
+            parts += [
+                EVENT_HEADER.pack(RECORDING_STATE_EVENT, pts, event.time_ns),
+                RECORDING_STATE.pack(len(event.state)),
+                event.state.encode("ascii")
+            ]
+    payload = b"".join(parts)
+    return LENGTH_PREFIX.pack(len(payload)) + payload
+
+
+def decode_batch(payload: bytes) -> EventBatch:
+    """ Decodes a batch without its length prefix """
+    version, count, camera_length = BATCH_HEADER.unpack_from(payload)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version {version}")
+    offset = BATCH_HEADER.size
+    camera_id = payload[offset:offset + camera_length].decode("utf-8")
+    offset += camera_length
+
+    events = []
+    for _ in range(count):
+        event_type, pts, time_ns = EVENT_HEADER.unpack_from(payload, offset)
+        offset += EVENT_HEADER.size
+        pts = None if pts == PTS_NONE else pts
+        if event_type == DETECTIONS_EVENT:
+            (box_count,) = BOX_COUNT.unpack_from(payload, offset)
+            offset += BOX_COUNT.size
+            boxes = np.frombuffer(payload, dtype="<f4", count=5 * box_count, offset=offset).reshape(-1, 5)
+            offset += boxes.nbytes
+            events.append(DetectionsEvent(pts, time_ns, boxes))
+        elif event_type == RECORDING_STATE_EVENT:
+            (state_length,) = RECORDING_STATE.unpack_from(payload, offset)
+            offset += RECORDING_STATE.size
+            state = payload[offset:offset + state_length].decode("ascii")
+            offset += state_length
+            events.append(RecordingStateEvent(pts, time_ns, state))
+        else:
+            raise ValueError(f"Unknown event type {event_type}")
+    return EventBatch(camera_id, events)
@@ -0,0 +1,218 @@
+import logging
+import selectors
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from src.ipc.messages import DetectionsEvent, encode_batch, Event, RecordingStateEvent
+from src.metrics.registry import MetricsRegistry, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Subscriber:
+    connection: socket.socket
+    pending: bytearray = field(default_factory=bytearray)
+
+
+@dataclass
+class EventPublisher:
+    """
+    Publishes detections and recording state changes on a Unix domain socket to any number of subscribers.
+
+    `publish_*` only appends the event to the current batch under a lock, so the inference thread never waits
+    for a subscriber. The publisher thread encodes a batch once every `batch_interval_seconds`
+    (or as soon as `max_batch_events` are waiting) and queues it for every subscriber.
+    A subscriber whose unsent data would exceed `subscriber_buffer_bytes` is disconnected.
+
+    Subscribers read length-prefixed batches, see `src.ipc.subscriber.EventSubscriber`.
+    """
+    socket_path: Path
+    camera_id: str
+    batch_interval_seconds: float = 0.1
+    max_batch_events: int = 64
+    subscriber_buffer_bytes: int = 1024 * 1024
+    registry: MetricsRegistry = field(default_factory=lambda: REGISTRY)
+
+    _events: list[Event] = field(init=False, default_factory=list)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+    _subscribers: dict[int, _Subscriber] = field(init=False, default_factory=dict)
+    _selector: selectors.BaseSelector = field(init=False, default_factory=selectors.DefaultSelector)
+    _server: socket.socket | None = field(init=False, default=None)
+    _wakeup: tuple[socket.socket, socket.socket] | None = field(init=False, default=None)
+    _thread: threading.Thread | None = field(init=False, default=None)
+    _running: bool = field(init=False, default=False)
+
+    def __post_init__(self):
+        labels = {"camera": self.camera_id}
+        self._subscribers_gauge = self.registry.gauge(
+            "meteor_event_subscribers",
+            "Number of processes subscribed to the detection events",
+            ("camera",)
+        ).labels(**labels)
+        self._dropped_subscribers = self.registry.counter(
+            "meteor_event_subscribers_dropped_total",
+            "Number of subscribers disconnected because they did not keep up with the detection events",
+            ("camera",)
+        ).labels(**labels)
+        self._batches = self.registry.counter(
+            "meteor_event_batches_total",
+            "Number of batches of detection events published",
+            ("camera",)
+        ).labels(**labels)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def start(self) -> None:
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            # left behind by a previous run
+            self.socket_path.unlink()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(str(self.socket_path))
+        self._server.listen()
+        self._server.setblocking(False)
+        self._selector.register(self._server, selectors.EVENT_READ)
+
+        self._wakeup = socket.socketpair()
+        for end in self._wakeup:
+            end.setblocking(False)
+        self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+        self._thread.start()
+        logger.info(f"Publishing detection events on {self.socket_path}")
+
+    def publish_detections(self, pts: int | None, boxes: np.ndarray) -> None:
+        self._append(DetectionsEvent(pts, time.time_ns(), np.array(boxes, dtype=np.float32).reshape(-1, 5)))
+
+    def publish_recording_state(self, pts: int | None, state: str) -> None:
+        self._append(RecordingStateEvent(pts, time.time_ns(), state))
+
+    def close(self) -> None:
+        if not self._running:
+            return
+        self._running = False
+        self._wake()
+        self._thread.join()
+        for subscriber in list(self._subscribers.values()):
+            self._disconnect(subscriber)
+        self._selector.close()
+        self._server.close()
+        for end in self._wakeup:
+            end.close()
+        self.socket_path.unlink(missing_ok=True)
+
+    def _append(self, event: Event) -> None:
+        with self._lock:
+            self._events.append(event)
+            batch_full = len(self._events) >= self.max_batch_events
+        if batch_full:
+            self._wake()
+
+    def _wake(self) -> None:
+        try:
+            self._wakeup[1].send(b"\0")
+        except BlockingIOError:
+            # the publisher thread has not read the previous wake-ups yet
+            pass
+
+    def _run(self) -> None:
+        next_flush = time.monotonic() + self.batch_interval_seconds
+        while self._running:
+            timeout = max(0.0, next_flush - time.monotonic())
+            for key, mask in self._selector.select(timeout):
+                if key.fileobj is self._server:
+                    self._accept()
+                elif key.fileobj is self._wakeup[0]:
+                    self._drain_wakeup()
+                elif mask & selectors.EVENT_WRITE:
+                    self._send(key.data)
+                elif mask & selectors.EVENT_READ:
+                    self._check_closed(key.data)
+
+            with self._lock:
+                flush = self._events and (
+                    time.monotonic() >= next_flush or len(self._events) >= self.max_batch_events
+                )
+                events, self._events = (self._events, []) if flush else ([], self._events)
+            if events:
+                self._broadcast(encode_batch(self.camera_id, events))
+            if time.monotonic() >= next_flush:
+                next_flush = time.monotonic() + self.batch_interval_seconds
+        self._flush_remaining()
+
+    def _flush_remaining(self) -> None:
+        with self._lock:
+            events, self._events = self._events, []
+        if events:
+            self._broadcast(encode_batch(self.camera_id, events))
+
+    def _accept(self) -> None:
+        try:
+            connection, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(False)
+        subscriber = _Subscriber(connection)
+        self._subscribers[connection.fileno()] = subscriber
+        # subscribers only read - readable means they hung up
+        self._selector.register(connection, selectors.EVENT_READ, subscriber)
+        self._subscribers_gauge.set(len(self._subscribers))
+        logger.info(f"New subscriber of detection events, {len(self._subscribers)} connected")
+
+    def _drain_wakeup(self) -> None:
+        try:
+            while self._wakeup[0].recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _broadcast(self, batch: bytes) -> None:
+        self._batches.inc()
+        for subscriber in list(self._subscribers.values()):
+            if len(subscriber.pending) + len(batch) > self.subscriber_buffer_bytes:
+                logger.warning("Subscriber of detection events does not keep up - disconnecting it")
+                self._dropped_subscribers.inc()
+                self._disconnect(subscriber)
+                continue
+            subscriber.pending += batch
+            self._send(subscriber)
+
+    def _send(self, subscriber: _Subscriber) -> None:
+        try:
+            sent = subscriber.connection.send(subscriber.pending)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._disconnect(subscriber)
+            return
+        del subscriber.pending[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.pending else 0)
+        self._selector.modify(subscriber.connection, events, subscriber)
+
+    def _check_closed(self, subscriber: _Subscriber) -> None:
+        try:
+            data = subscriber.connection.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._disconnect(subscriber)
+
+    def _disconnect(self, subscriber: _Subscriber) -> None:
+        fileno = subscriber.connection.fileno()
+        if self._subscribers.pop(fileno, None) is None:
+            return
+        self._selector.unregister(subscriber.connection)
+        subscriber.connection.close()
+        self._subscribers_gauge.set(len(self._subscribers))
@@ -0,0 +1,52 @@
+import socket
+from pathlib import Path
+
+from src.ipc.messages import decode_batch, EventBatch, LENGTH_PREFIX
+
+
+class EventSubscriber:
+    """
+    Reads the batches of an `EventPublisher`:
+
+        with EventSubscriber(Path("/run/meteor/north-events.sock")) as subscriber:
+            while (batch := subscriber.receive()) is not None:
+                ...
+
+    A subscriber that does not keep up is disconnected by the publisher - `receive` then returns None.
+    """
+
+    def __init__(self, socket_path: Path, timeout: float | None = None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(str(socket_path))
+        self._buffer = bytearray()
+
+    def receive(self) -> EventBatch | None:
+        """ Next batch, None once the publisher closed the connection. Raises `TimeoutError` on timeout """
+        header = self._read(LENGTH_PREFIX.size)
+        if header is None:
+            return None
+        (length,) = LENGTH_PREFIX.unpack(header)
+        payload = self._read(length)
+        if payload is None:
+            return None
+        return decode_batch(payload)
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self) -> "EventSubscriber":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _read(self, size: int) -> bytes | None:
+        while len(self._buffer) < size:
+            chunk = self._socket.recv(max(65536, size - len(self._buffer)))
+            if not chunk:
+                return None
+            self._buffer += chunk
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
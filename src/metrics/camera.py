@@ -0,0 +1,157 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from src.metrics.registry import MetricsRegistry, REGISTRY, Histogram, Counter, Gauge
+from src.profiling.profiler import FrameProfiler
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECORDING_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+
+
+@dataclass
+class CameraMetrics:
+    """
+    Metrics of a single camera pipeline, every series is labelled with `camera`.
+
+    Children are resolved once here, so observing a value on the streaming thread
+    costs a single lock acquisition and no dictionary lookups.
+    """
+    camera_id: str
+    registry: MetricsRegistry = field(default_factory=lambda: REGISTRY)
+    # when set, every timed stage is also reported to the profiler
+    profiler: FrameProfiler | None = None
+
+    decode_latency: Histogram = field(init=False)
+    frames_processed: Counter = field(init=False)
+    frames_depayed: Gauge = field(init=False)
+    inference_lag: Gauge = field(init=False)
+    queue_depth: Gauge = field(init=False)
+    recording_start_latency: Histogram = field(init=False)
+    recording_stop_latency: Histogram = field(init=False)
+    previews_dropped: Counter = field(init=False)
+    suppression_map_cells: Gauge = field(init=False)
+    suppressed_cells: Gauge = field(init=False)
+    suppressed_contour_share: Gauge = field(init=False)
+    _stage_durations: dict[str, Histogram] = field(init=False, default_factory=dict)
+    _dropped_frames: dict[str, Counter] = field(init=False, default_factory=dict)
+    _candidates: dict[str, Counter] = field(init=False, default_factory=dict)
+    _detector_detections: dict[str, Counter] = field(init=False, default_factory=dict)
+
+    def __post_init__(self):
+        labels = {"camera": self.camera_id}
+        self.decode_latency = self.registry.histogram(
+            "meteor_decode_latency_seconds",
+            "Difference between pipeline running time and running time of the buffer reaching the appsink",
+            ("camera",),
+            LATENCY_BUCKETS
+        ).labels(**labels)
+        self.frames_processed = self.registry.counter(
+            "meteor_frames_processed_total",
+            "Number of frames processed by the inference engine",
+            ("camera",)
+        ).labels(**labels)
+        self.frames_depayed = self.registry.gauge(
+            "meteor_frames_depayed",
+            "Number of frames which passed the recording queue",
+            ("camera",)
+        ).labels(**labels)
+        self.inference_lag = self.registry.gauge(
+            "meteor_inference_lag_frames",
+            "Number of frames which entered the decoder and were not processed by the inference engine yet",
+            ("camera",)
+        ).labels(**labels)
+        self.queue_depth = self.registry.gauge(
+            "meteor_callback_queue_depth_buffers",
+            "Number of buffers waiting in the queue in front of the decoder and appsink",
+            ("camera",)
+        ).labels(**labels)
+        self.recording_start_latency = self.registry.histogram(
+            "meteor_recording_start_latency_seconds",
+            "Time between the decision to start recording and the file branch being linked",
+            ("camera",),
+            RECORDING_LATENCY_BUCKETS
+        ).labels(**labels)
+        self.recording_stop_latency = self.registry.histogram(
+            "meteor_recording_stop_latency_seconds",
+            "Time between the decision to stop recording and the file branch being unlinked",
+            ("camera",),
+            RECORDING_LATENCY_BUCKETS
+        ).labels(**labels)
+        self.previews_dropped = self.registry.counter(
+            "meteor_previews_dropped_total",
+            "Number of preview images dropped because the preview writer was busy",
+            ("camera",)
+        ).labels(**labels)
+        self.suppression_map_cells = self.registry.gauge(
+            "meteor_suppression_map_cells",
+            "Number of cells of the learned hot pixel suppression map",
+            ("camera",)
+        ).labels(**labels)
+        self.suppressed_cells = self.registry.gauge(
+            "meteor_suppressed_cells",
+            "Number of cells of the motion mask currently suppressed as hot pixels or static artefacts",
+            ("camera",)
+        ).labels(**labels)
+        self.suppressed_contour_share = self.registry.gauge(
+            "meteor_suppressed_contours_ratio",
+            "Share of contours of the last sampled motion mask removed by the suppression map",
+            ("camera",)
+        ).labels(**labels)
+
+    def stage_duration(self, stage: str) -> Histogram:
+        histogram = self._stage_durations.get(stage)
+        if histogram is None:
+            histogram = self.registry.histogram(
+                "meteor_stage_duration_seconds",
+                "Time spent in a single processing stage per frame",
+                ("camera", "stage")
+            ).labels(camera=self.camera_id, stage=stage)
+            self._stage_durations[stage] = histogram
+        return histogram
+
+    def dropped_frames(self, reason: str) -> Counter:
+        counter = self._dropped_frames.get(reason)
+        if counter is None:
+            counter = self.registry.counter(
+                "meteor_frames_dropped_total",
+                "Number of frames which were not processed by the inference engine",
+                ("camera", "reason")
+            ).labels(camera=self.camera_id, reason=reason)
+            self._dropped_frames[reason] = counter
+        return counter
+
+    def candidates(self, verdict: str) -> Counter:
+        counter = self._candidates.get(verdict)
+        if counter is None:
+            counter = self.registry.counter(
+                "meteor_candidates_total",
+                "Number of candidate detections by the verdict of the candidate verifier",
+                ("camera", "verdict")
+            ).labels(camera=self.camera_id, verdict=verdict)
+            self._candidates[verdict] = counter
+        return counter
+
+    def detector_detections(self, detector: str) -> Counter:
+        counter = self._detector_detections.get(detector)
+        if counter is None:
+            counter = self.registry.counter(
+                "meteor_detector_detections_total",
+                "Number of detections of a single detector of an ensemble, before merging",
+                ("camera", "detector")
+            ).labels(camera=self.camera_id, detector=detector)
+            self._detector_detections[detector] = counter
+        return counter
+
+    @contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            if self.profiler is None:
+                yield
+            else:
+                with self.profiler.stage(stage):
+                    yield
+        finally:
+            self.stage_duration(stage).observe(time.perf_counter() - start)
@@ -0,0 +1,202 @@
+import math
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Iterator
+
+# Default buckets (in seconds) suitable for per-frame stage timings
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels.items())
+    return f"{{{pairs}}}"
+
+
+@dataclass
+class Counter:
+    value: float = 0.0
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+@dataclass
+class Gauge:
+    value: float = 0.0
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    sum: float = field(init=False, default=0.0)
+    count: int = field(init=False, default=0)
+    # counts per bucket (not cumulative), the last element is the +Inf bucket
+    bucket_counts: list[int] = field(init=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative_counts(self) -> list[int]:
+        cumulative = []
+        total = 0
+        for count in self.bucket_counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+
+@dataclass
+class MetricFamily:
+    """
+    Group of metrics sharing a name and a set of label names.
+
+    Children are created lazily for every distinct combination of label values.
+    Callers on the hot path should keep a reference to the child returned by `labels`
+    instead of looking it up for every observation.
+    """
+    name: str
+    documentation: str
+    metric_type: str
+    label_names: tuple[str, ...] = ()
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    _children: dict[tuple[str, ...], Counter | Gauge | Histogram] = field(init=False, default_factory=dict)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def labels(self, **label_values: str) -> Counter | Gauge | Histogram:
+        if set(label_values) != set(self.label_names):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.label_names}, got {tuple(label_values)}"
+            )
+        key = tuple(str(label_values[name]) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _new_child(self) -> Counter | Gauge | Histogram:
+        match self.metric_type:
+            case "counter":
+                return Counter()
+            case "gauge":
+                return Gauge()
+            case "histogram":
+                return Histogram(buckets=self.buckets)
+        raise ValueError(f"Unsupported metric type {self.metric_type}")
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            labels = dict(zip(self.label_names, key))
+            if isinstance(child, Histogram):
+                for upper_bound, count in zip(self.buckets + (math.inf,), child.cumulative_counts()):
+                    yield f"{self.name}_bucket", {**labels, "le": _format_value(upper_bound)}, count
+                yield f"{self.name}_sum", labels, child.sum
+                yield f"{self.name}_count", labels, child.count
+            else:
+                yield self.name, labels, child.value
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for sample_name, labels, value in self.samples():
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+@dataclass
+class MetricsRegistry:
+    _families: dict[str, MetricFamily] = field(init=False, default_factory=dict)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> MetricFamily:
+        return self._register(name, documentation, "counter", label_names)
+
+    def gauge(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> MetricFamily:
+        return self._register(name, documentation, "gauge", label_names)
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            label_names: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> MetricFamily:
+        return self._register(name, documentation, "histogram", label_names, tuple(sorted(buckets)))
+
+    def _register(
+            self,
+            name: str,
+            documentation: str,
+            metric_type: str,
+            label_names: tuple[str, ...],
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MetricFamily(
+                    name=name,
+                    documentation=documentation,
+                    metric_type=metric_type,
+                    label_names=label_names,
+                    buckets=buckets
+                )
+                self._families[name] = family
+            elif family.metric_type != metric_type or family.label_names != label_names:
+                raise ValueError(f"Metric {name} is already registered with a different type or labels")
+            return family
+
+    def render(self) -> str:
+        """ Renders all registered metrics in Prometheus text exposition format (version 0.0.4) """
+        with self._lock:
+            families = list(self._families.values())
+        return "\n".join(family.render() for family in families) + "\n"
+
+
+# Registry shared by all components of a single process
+REGISTRY = MetricsRegistry()
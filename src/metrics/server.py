@@ -0,0 +1,85 @@
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+from src.metrics.registry import MetricsRegistry, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+JSON_CONTENT_TYPE = "application/json"
+
+# returns whether the process is healthy and details rendered as JSON
+HealthFunction = Callable[[], tuple[bool, dict[str, Any]]]
+
+
+def _make_handler(
+        render_function: Callable[[], str],
+        health_function: HealthFunction | None
+) -> type[BaseHTTPRequestHandler]:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            path = self.path.split("?")[0]
+            if path in ("/", "/metrics"):
+                self._respond(200, PROMETHEUS_CONTENT_TYPE, render_function())
+            elif path == "/health" and health_function is not None:
+                healthy, details = health_function()
+                self._respond(200 if healthy else 503, JSON_CONTENT_TYPE, json.dumps(details))
+            else:
+                self.send_error(404)
+
+        def _respond(self, status: int, content_type: str, text: str) -> None:
+            body = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            # scrapes happen every few seconds - do not flood the logs with them
+            logger.debug(f"Metrics request from {self.client_address[0]}: {format % args}")
+
+    return MetricsHandler
+
+
+@dataclass
+class MetricsServer:
+    """
+    Serves metrics from the registry in Prometheus text format on `http://host:port/metrics`.
+
+    The server runs on its own daemon thread so scrapes never touch GStreamer streaming threads.
+    `render_function` replaces rendering of the registry (e.g. metrics aggregated from several processes),
+    `health_function` enables `/health` - status 200 when healthy, 503 otherwise.
+    """
+    port: int
+    host: str = "127.0.0.1"
+    registry: MetricsRegistry = field(default_factory=lambda: REGISTRY)
+    render_function: Callable[[], str] | None = None
+    health_function: HealthFunction | None = None
+    _server: ThreadingHTTPServer | None = field(init=False, default=None)
+    _thread: threading.Thread | None = field(init=False, default=None)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        assert self._server
+        return self._server.server_address[:2]
+
+    def start(self) -> None:
+        handler = _make_handler(self.render_function or self.registry.render, self.health_function)
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving metrics on http://{self.address[0]}:{self.address[1]}/metrics")
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
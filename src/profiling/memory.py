@@ -0,0 +1,212 @@
+import os
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import PurePath
+from typing import Callable, Optional
+
+import numpy as np
+
+SECONDS_PER_HOUR = 3600
+OTHER_STAGE = "other"
+
+# path fragments of the allocating code per stage, the innermost matching frame of a traceback wins
+STAGE_PATHS: dict[str, tuple[str, ...]] = {
+    "detector": ("src/detectors/", "src/non_max_supression/", "src/inference/"),
+    "tracker": ("src/trackers/", "ioutrack"),
+    "recording": ("src/gstreamer/",),
+    "writer": ("src/file_operations/", "src/ipc/"),
+}
+
+# allocations of the accounting itself and of the import machinery are not attributed
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def read_rss_bytes() -> int:
+    """ Resident set size of the current process (Linux) """
+    with open("/proc/self/statm") as statm_file:
+        resident_pages = int(statm_file.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def attribute_stage(traceback: tracemalloc.Traceback, stage_paths: dict[str, tuple[str, ...]] = STAGE_PATHS) -> str:
+    """ Stage of the innermost frame of the traceback belonging to one """
+    # tracebacks are ordered from the oldest frame to the most recent one
+    for frame in reversed(traceback):
+        filename = PurePath(frame.filename).as_posix()
+        for stage, fragments in stage_paths.items():
+            if any(fragment in filename for fragment in fragments):
+                return stage
+    return OTHER_STAGE
+
+
+def growth_slope(times: list[float], values: list[float]) -> float:
+    """ Least-squares slope of the values per unit of time, zero with less than two distinct times """
+    if len(times) < 2 or min(times) == max(times):
+        return 0.0
+    slope, _ = np.polyfit(np.asarray(times, dtype=np.float64), np.asarray(values, dtype=np.float64), 1)
+    return float(slope)
+
+
+@dataclass
+class MemorySample:
+    # stream time of the sample - slopes are measured against the processed video, not the wall clock
+    elapsed_seconds: float
+    rss_bytes: int
+    # bytes traced by tracemalloc per stage
+    stage_bytes: dict[str, int]
+    # sizes of structures which must stay bounded (queue levels, number of callbacks...)
+    gauges: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class AllocationSite:
+    stage: str
+    size_diff: int
+    count_diff: int
+    traceback: list[str]
+
+
+@dataclass
+class MemoryReport:
+    samples: list[MemorySample]
+    # growth of the resident memory and of each stage after the warm-up, in bytes per hour
+    rss_slope: float
+    stage_slopes: dict[str, float]
+    gauge_maxima: dict[str, float]
+    # allocation sites which grew the most since the end of the warm-up
+    growing_sites: list[AllocationSite]
+    violations: list[str]
+
+    @property
+    def passed(self) -> bool:
+        return not self.violations
+
+    def format(self) -> str:
+        megabyte = 1024 ** 2
+        lines = [f"{len(self.samples)} samples, RSS growth {self.rss_slope / megabyte:+.2f} MB/h"]
+        lines.append(f"{'stage':<12}{'current MB':>12}{'MB/h':>10}")
+        last_stage_bytes = self.samples[-1].stage_bytes if self.samples else {}
+        for stage, slope in self.stage_slopes.items():
+            lines.append(f"{stage:<12}{last_stage_bytes.get(stage, 0) / megabyte:>12.2f}{slope / megabyte:>+10.2f}")
+        for gauge, maximum in self.gauge_maxima.items():
+            lines.append(f"max {gauge}: {maximum:g}")
+        if self.growing_sites:
+            lines.append("Growing allocation sites:")
+        for site in self.growing_sites:
+            lines.append(f"  [{site.stage}] {site.size_diff / 1024:+.1f} KiB in {site.count_diff:+d} blocks")
+            lines.extend(f"    {line}" for line in site.traceback)
+        lines.extend(f"FAILED: {violation}" for violation in self.violations)
+        return "\n".join(lines)
+
+
+@dataclass
+class MemoryMonitor:
+    """
+    Samples resident memory and tracemalloc snapshots attributed to pipeline stages to find slow leaks.
+
+    Samples taken during the warm-up (stream time) are reported but ignored by the checks - buffers, pools
+    and caches are still being filled then. Growth is the least-squares slope of the later samples, and the
+    allocation sites responsible are found by comparing the last snapshot to the first one after the warm-up.
+    """
+    warmup_seconds: float = 600.0
+    max_rss_growth_per_hour: float = 32 * 1024 ** 2
+    max_stage_growth_per_hour: float = 8 * 1024 ** 2
+    # upper bounds of the gauges passed to `sample`
+    gauge_limits: dict[str, float] = field(default_factory=dict)
+    stage_paths: dict[str, tuple[str, ...]] = field(default_factory=lambda: dict(STAGE_PATHS))
+    traceback_frames: int = 16
+    top_sites: int = 10
+    rss_function: Callable[[], int] = read_rss_bytes
+
+    samples: list[MemorySample] = field(init=False, default_factory=list)
+    _baseline: Optional[tracemalloc.Snapshot] = field(init=False, default=None)
+    _last_snapshot: Optional[tracemalloc.Snapshot] = field(init=False, default=None)
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_frames)
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+
+    def sample(self, elapsed_seconds: float, gauges: Optional[dict[str, float]] = None) -> MemorySample:
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        stage_bytes = dict.fromkeys([*self.stage_paths, OTHER_STAGE], 0)
+        for statistic in snapshot.statistics("traceback"):
+            stage_bytes[attribute_stage(statistic.traceback, self.stage_paths)] += statistic.size
+
+        sample = MemorySample(
+            elapsed_seconds=elapsed_seconds,
+            rss_bytes=self.rss_function(),
+            stage_bytes=stage_bytes,
+            gauges=dict(gauges or {})
+        )
+        self.samples.append(sample)
+        if elapsed_seconds >= self.warmup_seconds:
+            if self._baseline is None:
+                self._baseline = snapshot
+            self._last_snapshot = snapshot
+        return sample
+
+    def report(self) -> MemoryReport:
+        measured = [sample for sample in self.samples if sample.elapsed_seconds >= self.warmup_seconds]
+        times = [sample.elapsed_seconds for sample in measured]
+        rss_slope = growth_slope(times, [sample.rss_bytes for sample in measured]) * SECONDS_PER_HOUR
+        stage_slopes = {
+            stage: growth_slope(times, [sample.stage_bytes[stage] for sample in measured]) * SECONDS_PER_HOUR
+            for stage in [*self.stage_paths, OTHER_STAGE]
+        }
+        gauge_maxima: dict[str, float] = {}
+        for sample in self.samples:
+            for gauge, value in sample.gauges.items():
+                gauge_maxima[gauge] = max(value, gauge_maxima.get(gauge, value))
+
+        violations = []
+        if len(measured) < 2:
+            violations.append(f"only {len(measured)} samples after the warm-up of {self.warmup_seconds:g} s")
+        if rss_slope > self.max_rss_growth_per_hour:
+            violations.append(
+                f"RSS grows by {rss_slope / 1024 ** 2:.2f} MB/h "
+                f"(limit {self.max_rss_growth_per_hour / 1024 ** 2:.2f} MB/h)"
+            )
+        for stage, slope in stage_slopes.items():
+            if slope > self.max_stage_growth_per_hour:
+                violations.append(
+                    f"{stage} grows by {slope / 1024 ** 2:.2f} MB/h "
+                    f"(limit {self.max_stage_growth_per_hour / 1024 ** 2:.2f} MB/h)"
+                )
+        for gauge, limit in self.gauge_limits.items():
+            if gauge_maxima.get(gauge, 0) > limit:
+                violations.append(f"{gauge} reached {gauge_maxima[gauge]:g} (limit {limit:g})")
+
+        return MemoryReport(
+            samples=self.samples,
+            rss_slope=rss_slope,
+            stage_slopes=stage_slopes,
+            gauge_maxima=gauge_maxima,
+            growing_sites=self._growing_sites(),
+            violations=violations
+        )
+
+    def _growing_sites(self) -> list[AllocationSite]:
+        if self._baseline is None or self._last_snapshot is self._baseline:
+            return []
+        sites = []
+        for difference in self._last_snapshot.compare_to(self._baseline, "traceback"):
+            if difference.size_diff <= 0:
+                # sorted by the absolute difference - shrinking sites are skipped
+                continue
+            sites.append(AllocationSite(
+                stage=attribute_stage(difference.traceback, self.stage_paths),
+                size_diff=difference.size_diff,
+                count_diff=difference.count_diff,
+                traceback=difference.traceback.format(most_recent_first=True)
+            ))
+            if len(sites) == self.top_sites:
+                break
+        return sites
@@ -0,0 +1,202 @@
+import logging
+import sys
+import threading
+import time
+from cProfile import Profile
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from types import FrameType
+from typing import Iterator
+
+from src.profiling.report import format_percentile_report, write_collapsed_stacks
+
+logger = logging.getLogger(__name__)
+
+FRAME_STAGE = "frame"
+
+
+class ProfilerMode(Enum):
+    CPROFILE = "cprofile"
+    SAMPLING = "sampling"
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+@dataclass
+class StackSampler:
+    """
+    Periodically samples the stack of a single thread.
+    Samples are attributed to the stage the thread is in at the moment of sampling.
+    """
+    thread_id: int
+    interval_seconds: float
+    current_stage: str | None = None
+    stacks: dict[str, Counter] = field(init=False, default_factory=lambda: defaultdict(Counter))
+    _stop_event: threading.Event = field(init=False, default_factory=threading.Event)
+    _thread: threading.Thread | None = field(init=False, default=None)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval_seconds):
+            stage = self.current_stage
+            if stage is None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[stage][collapse_stack(frame)] += 1
+
+
+@dataclass
+class ProfilingSession:
+    output_directory: Path
+    mode: ProfilerMode
+    frames: int
+    sampling_interval_seconds: float
+    timings: dict[str, list[float]] = field(init=False, default_factory=lambda: defaultdict(list))
+    profiles: dict[str, Profile] = field(init=False, default_factory=dict)
+    sampler: StackSampler | None = field(init=False, default=None)
+    # stages currently entered, the innermost last
+    _stages: list[str] = field(init=False, default_factory=list)
+
+    def start(self) -> None:
+        if self.mode == ProfilerMode.SAMPLING:
+            self.sampler = StackSampler(
+                thread_id=threading.get_ident(),
+                interval_seconds=self.sampling_interval_seconds
+            )
+            self.sampler.start()
+
+    def enter_stage(self, stage: str) -> None:
+        # stages nest (ensemble members inside "detector") - only the outermost one is profiled by cProfile,
+        # whose profile covers the nested ones, as a second active profile cannot be enabled
+        outermost = not self._nested_stages()
+        self._stages.append(stage)
+        if self.sampler is not None:
+            self.sampler.current_stage = stage
+        elif stage != FRAME_STAGE and outermost:
+            self.profiles.setdefault(stage, Profile()).enable()
+
+    def exit_stage(self, stage: str, duration: float) -> None:
+        self.timings[stage].append(duration)
+        self._stages.pop()
+        if self.sampler is not None:
+            # samples are attributed to the enclosing stage again
+            self.sampler.current_stage = self._stages[-1] if self._stages else None
+        elif stage != FRAME_STAGE and not self._nested_stages():
+            self.profiles[stage].disable()
+
+    def _nested_stages(self) -> list[str]:
+        return [stage for stage in self._stages if stage != FRAME_STAGE]
+
+    def finish(self) -> None:
+        if self.sampler is not None:
+            self.sampler.stop()
+        self.output_directory.mkdir(parents=True, exist_ok=True)
+        for stage, profile in self.profiles.items():
+            profile.dump_stats(self.output_directory / f"{stage}.pstats")
+        if self.sampler is not None:
+            for stage, stacks in self.sampler.stacks.items():
+                write_collapsed_stacks(stacks, self.output_directory / f"{stage}.collapsed")
+        report = format_percentile_report(dict(self.timings))
+        (self.output_directory / "timings.txt").write_text(report + "\n")
+        logger.info(f"Profile of {self.frames} frames written to {self.output_directory}\n{report}")
+
+
+@dataclass
+class FrameProfiler:
+    """
+    Profiler which can be armed at runtime to profile the next N frames.
+
+    `arm` is safe to call from any thread (signal handler, control command),
+    profiling itself happens on the thread which processes frames.
+    Every session writes per-stage `.pstats` (cProfile mode) or collapsed stacks
+    (sampling mode) together with a percentile report of per-frame timings.
+    """
+    output_directory: Path
+    mode: ProfilerMode = ProfilerMode.CPROFILE
+    default_frames: int = 250
+    sampling_interval_seconds: float = 0.005
+    _requested_frames: int = field(init=False, default=0)
+    _remaining_frames: int = field(init=False, default=0)
+    _session: ProfilingSession | None = field(init=False, default=None)
+    _writer_thread: threading.Thread | None = field(init=False, default=None)
+
+    @property
+    def active(self) -> bool:
+        return self._session is not None
+
+    def arm(self, frames: int | None = None) -> None:
+        self._requested_frames = frames or self.default_frames
+        logger.info(f"Profiler armed for {self._requested_frames} frames in {self.mode.value} mode")
+
+    @contextmanager
+    def frame(self) -> Iterator[None]:
+        if self._session is None:
+            if not self._requested_frames:
+                yield
+                return
+            self._start_session()
+        session = self._session
+        start = time.perf_counter()
+        session.enter_stage(FRAME_STAGE)
+        try:
+            yield
+        finally:
+            session.exit_stage(FRAME_STAGE, time.perf_counter() - start)
+            self._remaining_frames -= 1
+            if self._remaining_frames <= 0:
+                self._finish_session()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        session = self._session
+        if session is None:
+            yield
+            return
+        start = time.perf_counter()
+        session.enter_stage(name)
+        try:
+            yield
+        finally:
+            session.exit_stage(name, time.perf_counter() - start)
+
+    def _start_session(self) -> None:
+        self._remaining_frames = self._requested_frames
+        self._requested_frames = 0
+        self._session = ProfilingSession(
+            output_directory=self.output_directory / datetime.now().strftime("%Y%m%d-%H%M%S"),
+            mode=self.mode,
+            frames=self._remaining_frames,
+            sampling_interval_seconds=self.sampling_interval_seconds
+        )
+        self._session.start()
+
+    def _finish_session(self) -> None:
+        session = self._session
+        self._session = None
+        # dumping stats and formatting reports must not stall the streaming thread
+        self._writer_thread = threading.Thread(target=session.finish, name="profiler-writer", daemon=True)
+        self._writer_thread.start()
+
+    def wait_for_reports(self) -> None:
+        if self._writer_thread is not None:
+            self._writer_thread.join()
@@ -0,0 +1,45 @@
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def summarize_timings(timings: list[float], percentiles: tuple[int, ...] = PERCENTILES) -> dict[str, float]:
+    """ Summarizes durations (in seconds) with count, mean, max and the requested percentiles """
+    if not timings:
+        return {"count": 0}
+    values = np.asarray(timings, dtype=np.float64)
+    summary = {
+        "count": len(values),
+        "mean": float(values.mean()),
+        "max": float(values.max()),
+    }
+    for percentile, value in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f"p{percentile}"] = float(value)
+    return summary
+
+
+def format_percentile_report(
+        timings: dict[str, list[float]],
+        percentiles: tuple[int, ...] = PERCENTILES
+) -> str:
+    """ Formats per-stage durations as a table with times in milliseconds """
+    columns = ["count", "mean"] + [f"p{percentile}" for percentile in percentiles] + ["max"]
+    lines = [f"{'stage':<20}" + "".join(f"{column:>10}" for column in columns)]
+    for stage, stage_timings in timings.items():
+        summary = summarize_timings(stage_timings, percentiles)
+        cells = [f"{summary['count']:>10}"]
+        for column in columns[1:]:
+            value = summary.get(column)
+            cells.append(f"{'-':>10}" if value is None else f"{value * 1e3:>10.3f}")
+        lines.append(f"{stage:<20}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def write_collapsed_stacks(stacks: Counter, output_path: Path) -> None:
+    """ Writes stacks in the collapsed format understood by flamegraph.pl and speedscope """
+    with open(output_path, "w") as output_file:
+        for stack, count in stacks.most_common():
+            output_file.write(f"{stack} {count}\n")
@@ -0,0 +1,114 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from src.detectors.base import BaseDetector
+from src.metrics.registry import MetricsRegistry, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DegradationLevel:
+    name: str
+    # detector used on this level, `None` keeps the detector the inference engine was created with
+    detector: BaseDetector | None = None
+    # only every n-th frame is passed to the inference engine
+    frame_stride: int = 1
+
+
+@dataclass
+class QosController:
+    """
+    Walks through degradation levels based on the inference lag and the depth of the queue in front of it.
+
+    The level is lowered (degraded) after the lag or the queue depth stay above their `degrade_*`
+    thresholds for `degrade_after_seconds`. It is raised back only after both stay below
+    the (lower) `recover_*` thresholds for the (longer) `recover_after_seconds` - this hysteresis
+    prevents the controller from flapping between two levels.
+    """
+    camera_id: str
+    levels: list[DegradationLevel]
+    degrade_lag_frames: int = 50
+    recover_lag_frames: int = 10
+    degrade_queue_depth: int = 100
+    recover_queue_depth: int = 20
+    degrade_after_seconds: float = 2.0
+    recover_after_seconds: float = 10.0
+    registry: MetricsRegistry = field(default_factory=lambda: REGISTRY)
+    clock: Callable[[], float] = time.monotonic
+
+    level_index: int = field(init=False, default=0)
+    _level_change_callbacks: list[Callable[[DegradationLevel, DegradationLevel], None]] = field(
+        init=False, default_factory=list
+    )
+    _overloaded_since: float | None = field(init=False, default=None)
+    _underloaded_since: float | None = field(init=False, default=None)
+
+    def __post_init__(self):
+        assert self.levels, "At least one degradation level is required"
+        assert self.recover_lag_frames <= self.degrade_lag_frames
+        assert self.recover_queue_depth <= self.degrade_queue_depth
+        self._level_gauge = self.registry.gauge(
+            "meteor_qos_level",
+            "Index of the current degradation level, 0 means full quality",
+            ("camera",)
+        ).labels(camera=self.camera_id)
+        level_changes = self.registry.counter(
+            "meteor_qos_level_changes_total",
+            "Number of degradation level changes",
+            ("camera", "direction")
+        )
+        self._degradations = level_changes.labels(camera=self.camera_id, direction="degrade")
+        self._recoveries = level_changes.labels(camera=self.camera_id, direction="recover")
+
+    @property
+    def level(self) -> DegradationLevel:
+        return self.levels[self.level_index]
+
+    def add_level_change_callback(self, callback: Callable[[DegradationLevel, DegradationLevel], None]) -> None:
+        self._level_change_callbacks.append(callback)
+
+    def observe(self, lag_frames: int, queue_depth: int) -> DegradationLevel:
+        now = self.clock()
+        overloaded = lag_frames > self.degrade_lag_frames or queue_depth > self.degrade_queue_depth
+        underloaded = lag_frames < self.recover_lag_frames and queue_depth < self.recover_queue_depth
+
+        if overloaded:
+            self._underloaded_since = None
+            if self._overloaded_since is None:
+                self._overloaded_since = now
+            elif now - self._overloaded_since >= self.degrade_after_seconds:
+                self._change_level(self.level_index + 1, lag_frames, queue_depth)
+        elif underloaded:
+            self._overloaded_since = None
+            if self._underloaded_since is None:
+                self._underloaded_since = now
+            elif now - self._underloaded_since >= self.recover_after_seconds:
+                self._change_level(self.level_index - 1, lag_frames, queue_depth)
+        else:
+            self._overloaded_since = None
+            self._underloaded_since = None
+        return self.level
+
+    def _change_level(self, level_index: int, lag_frames: int, queue_depth: int) -> None:
+        # restart the timers on every attempt so that each step needs its own sustained period
+        self._overloaded_since = None
+        self._underloaded_since = None
+        if not 0 <= level_index < len(self.levels) or level_index == self.level_index:
+            return
+
+        previous_level = self.level
+        if level_index > self.level_index:
+            self._degradations.inc()
+        else:
+            self._recoveries.inc()
+        self.level_index = level_index
+        self._level_gauge.set(level_index)
+        logger.info(
+            f"[Camera = {self.camera_id}] QoS level changed from '{previous_level.name}' to '{self.level.name}' "
+            f"(lag = {lag_frames} frames, queue depth = {queue_depth} buffers)"
+        )
+        for callback in self._level_change_callbacks:
+            callback(previous_level, self.level)
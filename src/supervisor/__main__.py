@@ -0,0 +1,40 @@
+import argparse
+import logging
+import signal
+import sys
+from pathlib import Path
+
+from src.supervisor.supervisor import Supervisor
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", help="JSON file with the list of cameras", type=str, required=True)
+    parser.add_argument("--port", help="Port of the aggregated metrics and health endpoint", type=int, default=9100)
+    parser.add_argument("--host", help="Address the metrics endpoint binds to", type=str, default="0.0.0.0")
+    parser.add_argument(
+        "--health-timeout",
+        help="Seconds to wait for a restarted worker to become healthy during a rolling restart",
+        type=float,
+        default=60.0
+    )
+    args = parser.parse_args()
+
+    supervisor = Supervisor(
+        config_path=Path(args.config),
+        port=args.port,
+        host=args.host,
+        health_timeout_seconds=args.health_timeout
+    )
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stop())
+    signal.signal(signal.SIGINT, lambda *_: supervisor.stop())
+    # `kill -HUP <pid>` reloads the camera list and restarts workers one by one
+    signal.signal(signal.SIGHUP, lambda *_: supervisor.reload())
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
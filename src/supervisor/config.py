@@ -0,0 +1,133 @@
+import json
+import os
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Mapping, Sequence
+
+NUMA_SYSFS_DIRECTORY = Path("/sys/devices/system/node")
+DEFAULT_METRICS_BASE_PORT = 9101
+
+
+@dataclass(frozen=True)
+class CameraConfig:
+    """ A single worker process - one camera pipeline pinned to a set of CPUs """
+    camera_id: str
+    rtsp_url: str
+    data_dir: Path
+    metrics_port: int
+    # CPUs the worker is pinned to, assigned automatically when not set
+    cpus: tuple[int, ...] | None = None
+    # NUMA node the automatically assigned CPUs are taken from
+    numa_node: int | None = None
+    # remaining command line options of `python -m src`, e.g. {"bbox-th": 30, "min-hits": 2, "tracker": "streak"},
+    # flags are passed as booleans and `nargs` options as lists, options left out take the defaults of `python -m src`
+    options: Mapping[str, Any] = field(default_factory=dict)
+
+    def command(self, python: str) -> list[str]:
+        command = [
+            python, "-m", "src",
+            "--camera-id", self.camera_id,
+            "--rtsp-url", self.rtsp_url,
+            "--data-dir", str(self.data_dir),
+            # the supervisor scrapes workers locally and exposes the aggregate
+            "--metrics-port", str(self.metrics_port),
+            "--metrics-host", "127.0.0.1",
+        ]
+        for name, value in self.options.items():
+            if value is True:
+                # `store_true` flags take no value
+                command.append(f"--{name}")
+            elif value is False or value is None:
+                continue
+            elif isinstance(value, (list, tuple)):
+                # `nargs` options
+                command.extend([f"--{name}", *(str(item) for item in value)])
+            else:
+                command.extend([f"--{name}", str(value)])
+        return command
+
+
+def parse_cpu_list(cpu_list: str) -> list[int]:
+    """ Parses the kernel CPU list format, e.g. "0-3,8-11" """
+    cpus = []
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def read_numa_cpus(sysfs_directory: Path = NUMA_SYSFS_DIRECTORY) -> dict[int, list[int]]:
+    """ CPUs of every NUMA node, empty on hosts without NUMA information """
+    nodes = {}
+    for cpu_list_path in sorted(sysfs_directory.glob("node[0-9]*/cpulist")):
+        node = int(cpu_list_path.parent.name.removeprefix("node"))
+        nodes[node] = parse_cpu_list(cpu_list_path.read_text())
+    return nodes
+
+
+def assign_cpus(
+        cameras: Sequence[CameraConfig],
+        available_cpus: Sequence[int],
+        numa_cpus: Mapping[int, Sequence[int]]
+) -> list[CameraConfig]:
+    """
+    Splits available CPUs into equal contiguous slices for cameras without explicit `cpus`.
+    Cameras with a `numa_node` share the CPUs of that node only, so their memory stays local.
+    Slices wrap around when there are more cameras than CPUs.
+    """
+    available = set(available_cpus)
+    pools: dict[int | None, list[int]] = {}
+    for index, camera in enumerate(cameras):
+        if camera.cpus is None:
+            pools.setdefault(camera.numa_node, []).append(index)
+
+    assigned = list(cameras)
+    for numa_node, indices in pools.items():
+        pool = sorted(available if numa_node is None else available.intersection(numa_cpus.get(numa_node, ())))
+        if not pool:
+            raise ValueError(f"No available CPUs on NUMA node {numa_node}")
+        cpus_per_camera = max(1, len(pool) // len(indices))
+        for position, index in enumerate(indices):
+            start = position * cpus_per_camera
+            cpus = tuple(pool[(start + offset) % len(pool)] for offset in range(cpus_per_camera))
+            assigned[index] = replace(cameras[index], cpus=cpus)
+    return assigned
+
+
+def parse_cameras(config: Mapping[str, Any]) -> list[CameraConfig]:
+    """
+    {
+        "metrics_base_port": 9101,
+        "defaults": {"bbox-th": 30, "nms-th": 0.001, "min-hits": 3, "max-age": 5, "tracker": "streak"},
+        "cameras": [
+            {"id": "north", "rtsp_url": "rtsp://...", "data_dir": "/data/north", "cpus": [0, 1], "options": {...}},
+            {"id": "south", "rtsp_url": "rtsp://...", "data_dir": "/data/south", "numa_node": 1}
+        ]
+    }
+    """
+    base_port = config.get("metrics_base_port", DEFAULT_METRICS_BASE_PORT)
+    defaults = config.get("defaults", {})
+    cameras = []
+    for index, camera in enumerate(config["cameras"]):
+        cameras.append(CameraConfig(
+            camera_id=camera["id"],
+            rtsp_url=camera["rtsp_url"],
+            data_dir=Path(camera["data_dir"]),
+            metrics_port=camera.get("metrics_port", base_port + index),
+            cpus=tuple(camera["cpus"]) if "cpus" in camera else None,
+            numa_node=camera.get("numa_node"),
+            options={**defaults, **camera.get("options", {})}
+        ))
+
+    camera_ids = [camera.camera_id for camera in cameras]
+    duplicates = {camera_id for camera_id in camera_ids if camera_ids.count(camera_id) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate camera ids: {', '.join(sorted(duplicates))}")
+    return cameras
+
+
+def load_cameras(path: Path) -> list[CameraConfig]:
+    cameras = parse_cameras(json.loads(path.read_text()))
+    return assign_cpus(cameras, sorted(os.sched_getaffinity(0)), read_numa_cpus())
@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable
+
+from src.metrics.registry import MetricsRegistry
+from src.metrics.server import MetricsServer
+from src.supervisor.config import CameraConfig, load_cameras
+from src.supervisor.worker import CameraWorker
+
+logger = logging.getLogger(__name__)
+
+
+def merge_expositions(expositions: Iterable[str]) -> str:
+    """
+    Merges Prometheus text expositions of several processes into one.
+    Samples of a metric family have to be grouped under a single HELP/TYPE header,
+    so samples are collected per family in the order the families first appear.
+    """
+    headers: dict[str, list[str]] = {}
+    samples: dict[str, list[str]] = {}
+    for exposition in expositions:
+        family = None
+        for line in exposition.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                family = line.split(" ", 3)[2]
+                if family not in headers:
+                    headers[family] = []
+                    samples[family] = []
+                if line not in headers[family]:
+                    headers[family].append(line)
+            elif not line.startswith("#"):
+                name = line.split("{", 1)[0].split(" ", 1)[0]
+                key = family if family is not None else name
+                headers.setdefault(key, [])
+                samples.setdefault(key, []).append(line)
+    lines = []
+    for family, family_headers in headers.items():
+        lines.extend(family_headers)
+        lines.extend(samples[family])
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+@dataclass
+class Supervisor:
+    """
+    Runs one worker process per camera, restarts crashed workers and exposes their aggregated
+    metrics and health on a single endpoint. A crash, restart or reload of one camera never touches the others.
+
+    `reload` re-reads the camera list and restarts workers one by one (rolling restart), waiting for every
+    worker to become healthy before the next one is restarted. The health of the restarted worker is checked
+    on every poll, so crashed workers of other cameras are still restarted meanwhile.
+    """
+    config_path: Path
+    port: int
+    host: str = "0.0.0.0"
+    health_timeout_seconds: float = 60.0
+    poll_interval_seconds: float = 1.0
+    registry: MetricsRegistry = field(default_factory=MetricsRegistry)
+    load_function: Callable[[Path], list[CameraConfig]] = load_cameras
+    worker_factory: Callable[[CameraConfig], CameraWorker] = CameraWorker
+
+    workers: dict[str, CameraWorker] = field(init=False, default_factory=dict)
+    _stop_event: threading.Event = field(init=False, default_factory=threading.Event)
+    _reload_requested: threading.Event = field(init=False, default_factory=threading.Event)
+    _server: MetricsServer | None = field(init=False, default=None)
+    # cameras still to be restarted by the rolling restart, and the restarted worker it waits for
+    _restart_queue: list[CameraConfig] = field(init=False, default_factory=list)
+    _restarted_worker: CameraWorker | None = field(init=False, default=None)
+    _restarted_worker_deadline: float = field(init=False, default=0.0)
+
+    def __post_init__(self):
+        self._worker_up = self.registry.gauge(
+            "meteor_worker_up",
+            "1 when the worker process of the camera is running",
+            ("camera",)
+        )
+        self._worker_restarts = self.registry.counter(
+            "meteor_worker_restarts_total",
+            "Number of times the worker process of the camera has been restarted after a crash",
+            ("camera",)
+        )
+
+    def run(self) -> None:
+        for config in self.load_function(self.config_path):
+            self._start_worker(config)
+        self._server = MetricsServer(
+            port=self.port,
+            host=self.host,
+            render_function=self.render_metrics,
+            health_function=self.health
+        )
+        self._server.start()
+        try:
+            while not self._stop_event.wait(self.poll_interval_seconds):
+                self.step()
+        finally:
+            self._server.stop()
+            for worker in self.workers.values():
+                worker.stop()
+
+    def step(self) -> None:
+        """ A single iteration of the supervisor loop """
+        if self._reload_requested.is_set():
+            self._reload_requested.clear()
+            self._start_rolling_restart()
+        self._poll_workers()
+        self._continue_rolling_restart()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def reload(self) -> None:
+        # called from a signal handler - the restart itself happens on the supervisor loop
+        self._reload_requested.set()
+
+    def render_metrics(self) -> str:
+        return merge_expositions([self.registry.render()] + [
+            exposition for exposition in (worker.scrape() for worker in list(self.workers.values()))
+            if exposition is not None
+        ])
+
+    def health(self) -> tuple[bool, dict]:
+        details = {}
+        for camera_id, worker in list(self.workers.items()):
+            healthy, worker_details = worker.health()
+            details[camera_id] = {**worker_details, "healthy": healthy, "restarts": worker.restarts}
+        return all(worker["healthy"] for worker in details.values()), details
+
+    def _start_worker(self, config: CameraConfig) -> None:
+        worker = self.worker_factory(config)
+        self.workers[config.camera_id] = worker
+        worker.start()
+
+    def _poll_workers(self) -> None:
+        for camera_id, worker in self.workers.items():
+            restarts = worker.restarts
+            worker.poll()
+            self._worker_up.labels(camera=camera_id).set(1 if worker.running else 0)
+            if worker.restarts > restarts:
+                self._worker_restarts.labels(camera=camera_id).inc(worker.restarts - restarts)
+
+    def _start_rolling_restart(self) -> None:
+        try:
+            configs = {config.camera_id: config for config in self.load_function(self.config_path)}
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not reload camera configuration, keeping the running workers: {e}")
+            return
+
+        for camera_id in [camera_id for camera_id in self.workers if camera_id not in configs]:
+            logger.info(f"[Camera = {camera_id}] Removed from configuration")
+            self.workers.pop(camera_id).stop()
+            self._worker_up.labels(camera=camera_id).set(0)
+        # a reload during a rolling restart starts it over with the new configuration
+        self._restart_queue = list(configs.values())
+
+    def _continue_rolling_restart(self) -> None:
+        worker = self._restarted_worker
+        if worker is not None:
+            camera_id = worker.config.camera_id
+            if self.workers.get(camera_id) is worker:
+                healthy, _ = worker.health()
+                if not healthy and worker.running and time.monotonic() < self._restarted_worker_deadline:
+                    # checked again on the next poll
+                    return
+                if not healthy:
+                    logger.warning(
+                        f"[Camera = {camera_id}] Not healthy after restart, continuing the rolling restart"
+                    )
+            self._restarted_worker = None
+
+        if not self._restart_queue or self._stop_event.is_set():
+            return
+        config = self._restart_queue.pop(0)
+        worker = self.workers.get(config.camera_id)
+        if worker is not None:
+            worker.stop()
+        self._start_worker(config)
+        self._restarted_worker = self.workers[config.camera_id]
+        self._restarted_worker_deadline = time.monotonic() + self.health_timeout_seconds
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from src.backoff import compute_backoff
+from src.supervisor.config import CameraConfig
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIRECTORY = Path(__file__).parent.parent.parent
+
+
+@dataclass
+class CameraWorker:
+    """
+    Runs the pipeline of a single camera in its own process pinned to `config.cpus`.
+
+    A crashed worker is restarted with exponential backoff; the backoff is reset once the worker
+    has been running for `stable_after_seconds`. Not thread safe - driven by the supervisor loop only.
+    """
+    config: CameraConfig
+    python: str = sys.executable
+    initial_backoff_seconds: float = 1.0
+    max_backoff_seconds: float = 60.0
+    stable_after_seconds: float = 60.0
+    stop_timeout_seconds: float = 15.0
+    rng: random.Random = field(default_factory=random.Random)
+
+    restarts: int = field(init=False, default=0)
+    _process: subprocess.Popen | None = field(init=False, default=None)
+    _started_at: float = field(init=False, default=0.0)
+    _restart_at: float | None = field(init=False, default=None)
+    _failures: int = field(init=False, default=0)
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    @property
+    def pid(self) -> int | None:
+        return self._process.pid if self._process is not None else None
+
+    def start(self) -> None:
+        logger.info(f"[Camera = {self.config.camera_id}] Starting worker on CPUs {self.config.cpus}")
+        self._process = subprocess.Popen(self.config.command(self.python), cwd=PROJECT_DIRECTORY)
+        self._started_at = time.monotonic()
+        self._restart_at = None
+        if self.config.cpus:
+            # pinned right after spawn - GStreamer streaming threads are created long after the interpreter starts
+            # and inherit the affinity of the main thread
+            try:
+                os.sched_setaffinity(self._process.pid, self.config.cpus)
+            except OSError as e:
+                logger.warning(f"[Camera = {self.config.camera_id}] Could not pin worker to {self.config.cpus}: {e}")
+
+    def stop(self) -> None:
+        """ SIGTERM lets the worker finalise an open recording, SIGKILL after `stop_timeout_seconds` """
+        self._restart_at = None
+        if not self.running:
+            return
+        logger.info(f"[Camera = {self.config.camera_id}] Stopping worker {self._process.pid}")
+        self._process.send_signal(signal.SIGTERM)
+        try:
+            self._process.wait(self.stop_timeout_seconds)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"[Camera = {self.config.camera_id}] Worker did not stop in time - killing it")
+            self._process.kill()
+            self._process.wait()
+
+    def poll(self) -> None:
+        """ Restarts the worker when it has exited and its backoff has elapsed """
+        now = time.monotonic()
+        if self._restart_at is not None:
+            if now >= self._restart_at:
+                self.restarts += 1
+                self.start()
+            return
+        if self._process is None or self._process.poll() is None:
+            if self._process is not None and now - self._started_at > self.stable_after_seconds:
+                self._failures = 0
+            return
+
+        delay = compute_backoff(
+            attempt=self._failures,
+            initial_seconds=self.initial_backoff_seconds,
+            max_seconds=self.max_backoff_seconds,
+            multiplier=2.0,
+            jitter=0.3,
+            rng=self.rng
+        )
+        self._failures += 1
+        logger.error(
+            f"[Camera = {self.config.camera_id}] Worker exited with code {self._process.returncode}, "
+            f"restarting in {delay:.1f} seconds"
+        )
+        self._restart_at = now + delay
+
+    def health(self, timeout_seconds: float = 1.0) -> tuple[bool, dict]:
+        if not self.running:
+            return False, {"camera": self.config.camera_id, "running": False}
+        try:
+            with urlopen(f"http://127.0.0.1:{self.config.metrics_port}/health", timeout=timeout_seconds) as response:
+                return True, json.loads(response.read())
+        except HTTPError as e:
+            return False, json.loads(e.read() or b"{}")
+        except (URLError, OSError, ValueError):
+            # still starting up
+            return False, {"camera": self.config.camera_id, "running": True}
+
+    def scrape(self, timeout_seconds: float = 1.0) -> str | None:
+        if not self.running:
+            return None
+        try:
+            with urlopen(f"http://127.0.0.1:{self.config.metrics_port}/metrics", timeout=timeout_seconds) as response:
+                return response.read().decode("utf-8")
+        except (URLError, OSError) as e:
+            logger.debug(f"[Camera = {self.config.camera_id}] Could not scrape worker metrics: {e}")
+            return None
@@ -0,0 +1,193 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.types import BBoxList
+
+
+@dataclass
+class StreakTracker:
+    """
+    Constant-velocity tracker for small and fast objects, compatible with `ioutrack.BaseTracker`.
+
+    Sort associates detections by IoU, which fails for meteors - consecutive boxes of a streak
+    barely overlap. This tracker associates detections with predicted track centres instead,
+    using a gate which grows with the size and speed of a track.
+    Clutter (twinkling stars, noise) rarely lines up on a constant-velocity path, so it seldom
+    survives the `min_hits` consecutive associations.
+
+    The state of all live tracks is kept in preallocated arrays (structure of arrays),
+    prediction, gating and the alpha-beta update are vectorised over all tracks and detections.
+
+    `update` returns boxes in the Sort format: [[x0, y0, x1, y1, track_id]].
+    """
+    # number of consecutive hits after which a track is reported
+    min_hits: int = 3
+    # number of frames without matching detections after which a track is removed
+    max_age: int = 5
+    # gate radius (in pixels) of a track with zero speed and size
+    min_gate: float = 8.0
+    # allowed deviation from the constant-velocity prediction as a fraction of the track speed
+    speed_tolerance: float = 0.25
+    # maximum distance between the first two detections of a track, its velocity is unknown before that
+    max_speed: float = 120.0
+    # tracks slower than this (in pixels per frame) are not reported - stars and hot pixels do not move
+    min_speed: float = 0.0
+    # position and velocity gains of the alpha-beta filter
+    alpha: float = 0.85
+    beta: float = 0.5
+    initial_capacity: int = 64
+
+    _next_id: int = field(init=False, default=1)
+    _alive: np.ndarray = field(init=False)
+    _track_ids: np.ndarray = field(init=False)
+    # centres, velocities and sizes, shape (capacity, 2)
+    _position: np.ndarray = field(init=False)
+    _velocity: np.ndarray = field(init=False)
+    _size: np.ndarray = field(init=False)
+    # number of detections associated with a track and consecutive hits / misses
+    _detections_count: np.ndarray = field(init=False)
+    _hit_streak: np.ndarray = field(init=False)
+    _time_since_update: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        self._allocate(self.initial_capacity)
+
+    @property
+    def live_tracks(self) -> int:
+        return int(self._alive.sum())
+
+    def update(self, boxes: BBoxList, return_all: bool = False) -> np.ndarray:
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 5)
+        centres = (boxes[:, 0:2] + boxes[:, 2:4]) / 2
+        sizes = boxes[:, 2:4] - boxes[:, 0:2]
+
+        alive = np.flatnonzero(self._alive)
+        self._position[alive] += self._velocity[alive]
+        self._time_since_update[alive] += 1
+
+        track_indices, detection_indices = self._associate(alive, centres)
+
+        if len(track_indices) > 0:
+            self._correct(track_indices, centres[detection_indices], sizes[detection_indices])
+
+        unmatched = np.ones(len(boxes), dtype=bool)
+        unmatched[detection_indices] = False
+        self._create_tracks(centres[unmatched], sizes[unmatched])
+
+        self._hit_streak[self._alive & (self._time_since_update > 0)] = 0
+        self._alive &= self._time_since_update <= self.max_age
+
+        return self._get_output(return_all)
+
+    def _associate(self, alive: np.ndarray, centres: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        empty = np.zeros(0, dtype=np.int64)
+        if len(alive) == 0 or len(centres) == 0:
+            return empty, empty
+
+        positions = self._position[alive]
+        dx = positions[:, None, 0] - centres[None, :, 0]
+        dy = positions[:, None, 1] - centres[None, :, 1]
+        squared_distances = dx * dx + dy * dy
+
+        speed = np.hypot(self._velocity[alive, 0], self._velocity[alive, 1])
+        gate = self.min_gate + self._size[alive].max(axis=1) / 2 + self.speed_tolerance * speed
+        # velocity of a track with a single detection is unknown - it may have moved up to `max_speed`
+        gate = np.where(self._detections_count[alive] < 2, np.maximum(gate, self.max_speed), gate)
+        gated = squared_distances <= (gate * gate)[:, None]
+
+        # only tracks and detections with at least one pair inside the gate take part in the assignment
+        rows = np.flatnonzero(gated.any(axis=1))
+        columns = np.flatnonzero(gated.any(axis=0))
+        if len(rows) == 0:
+            return empty, empty
+        distances = np.where(gated[np.ix_(rows, columns)], squared_distances[np.ix_(rows, columns)], np.inf)
+
+        # greedy assignment in vectorised rounds - mutually closest track/detection pairs are matched
+        # first, their rows and columns are removed and the remaining pairs compete in the next round
+        track_indices, detection_indices = [], []
+        row_numbers = np.arange(len(rows))
+        while True:
+            closest_columns = distances.argmin(axis=1)
+            closest_rows = distances.argmin(axis=0)
+            mutual = (closest_rows[closest_columns] == row_numbers) & np.isfinite(
+                distances[row_numbers, closest_columns]
+            )
+            if not mutual.any():
+                break
+            matched_rows = row_numbers[mutual]
+            matched_columns = closest_columns[mutual]
+            track_indices.append(alive[rows[matched_rows]])
+            detection_indices.append(columns[matched_columns])
+            distances[matched_rows, :] = np.inf
+            distances[:, matched_columns] = np.inf
+        if not track_indices:
+            return empty, empty
+        return np.concatenate(track_indices), np.concatenate(detection_indices)
+
+    def _correct(self, tracks: np.ndarray, centres: np.ndarray, sizes: np.ndarray) -> None:
+        residuals = centres - self._position[tracks]
+        first_update = self._detections_count[tracks] == 1
+        # second detection of a track defines its velocity, later ones refine it
+        self._velocity[tracks] += np.where(first_update[:, None], residuals, self.beta * residuals)
+        self._position[tracks] += np.where(first_update[:, None], residuals, self.alpha * residuals)
+        self._size[tracks] = sizes
+        self._detections_count[tracks] += 1
+        self._hit_streak[tracks] += 1
+        self._time_since_update[tracks] = 0
+
+    def _create_tracks(self, centres: np.ndarray, sizes: np.ndarray) -> None:
+        count = len(centres)
+        if count == 0:
+            return
+        free = np.flatnonzero(~self._alive)
+        if len(free) < count:
+            self._allocate(max(2 * len(self._alive), len(self._alive) + count))
+            free = np.flatnonzero(~self._alive)
+        slots = free[:count]
+        self._alive[slots] = True
+        self._track_ids[slots] = np.arange(self._next_id, self._next_id + count)
+        self._next_id += count
+        self._position[slots] = centres
+        self._velocity[slots] = 0
+        self._size[slots] = sizes
+        self._detections_count[slots] = 1
+        self._hit_streak[slots] = 1
+        self._time_since_update[slots] = 0
+
+    def _get_output(self, return_all: bool) -> np.ndarray:
+        if return_all:
+            selected = self._alive
+        else:
+            speed = np.hypot(self._velocity[:, 0], self._velocity[:, 1])
+            selected = (
+                self._alive
+                & (self._time_since_update == 0)
+                & (self._hit_streak >= self.min_hits)
+                & (speed >= self.min_speed)
+            )
+        half_size = self._size[selected] / 2
+        output = np.empty((int(selected.sum()), 5), dtype=np.float32)
+        output[:, 0:2] = self._position[selected] - half_size
+        output[:, 2:4] = self._position[selected] + half_size
+        output[:, 4] = self._track_ids[selected]
+        return output
+
+    def _allocate(self, capacity: int) -> None:
+        previous = getattr(self, "_alive", None)
+        previous_capacity = 0 if previous is None else len(previous)
+
+        def grow(name: str, shape: tuple[int, ...], dtype) -> None:
+            array = np.zeros(shape, dtype=dtype)
+            if previous_capacity:
+                array[:previous_capacity] = getattr(self, name)
+            setattr(self, name, array)
+
+        grow("_alive", (capacity,), bool)
+        grow("_track_ids", (capacity,), np.int64)
+        grow("_position", (capacity, 2), np.float32)
+        grow("_velocity", (capacity, 2), np.float32)
+        grow("_size", (capacity, 2), np.float32)
+        grow("_detections_count", (capacity,), np.int32)
+        grow("_hit_streak", (capacity,), np.int32)
+        grow("_time_since_update", (capacity,), np.int32)
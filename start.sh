@@ -6,4 +6,6 @@ python -m src \
   --bbox-th $BBOX_THRESHOLD \
   --nms-th $NMS_THRESHOLD \
   --min-hits $MIN_HITS \
-  --max-age $MAX_AGE
+  --max-age $MAX_AGE \
+  --metrics-port $METRICS_PORT \
+  --metrics-host $METRICS_HOST
@@ -0,0 +1,49 @@
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.file_operations.async_writer import AsyncImageWriter, PreviewFormat
+from src.metrics.camera import CameraMetrics
+from src.metrics.registry import MetricsRegistry
+
+
+def test_preview_is_downscaled_and_encoded(tmp_path: Path) -> None:
+    # given
+    writer = AsyncImageWriter(output_directory=tmp_path, image_format=PreviewFormat.JPEG, max_size=100)
+    frame = np.zeros((200, 400, 3), dtype=np.uint8)
+    bboxes = np.array([[100, 50, 200, 150, 10000]], dtype=np.float32)
+
+    # when
+    saved = writer.save_preview(frame, bboxes)
+    writer.close()
+
+    # then
+    assert saved
+    preview = cv2.imread(str(tmp_path / "0.jpg"))
+    assert preview.shape == (50, 100, 3)
+    # box is drawn in green at the downscaled position
+    assert preview[12, 35, 1] > 200
+
+
+def test_previews_are_dropped_when_writer_is_busy(tmp_path: Path) -> None:
+    # given
+    metrics = CameraMetrics(camera_id="cam", registry=MetricsRegistry())
+    writer = AsyncImageWriter(output_directory=tmp_path, max_pending=1, workers=1, metrics=metrics)
+    release_worker = threading.Event()
+    writer._executor.submit(release_worker.wait)
+    frame = np.zeros((20, 20, 3), dtype=np.uint8)
+    bboxes = np.zeros((0, 5), dtype=np.float32)
+
+    # when
+    first_saved = writer.save_preview(frame, bboxes)
+    second_saved = writer.save_preview(frame, bboxes)
+    release_worker.set()
+    writer.close()
+
+    # then
+    assert first_saved
+    assert not second_saved
+    assert metrics.previews_dropped.value == 1
+    assert [path.name for path in tmp_path.iterdir()] == ["0.jpg"]
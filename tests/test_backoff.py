@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from src.backoff import compute_backoff
+
+
+@pytest.mark.parametrize("attempt, expected", [(0, 1.0), (1, 2.0), (3, 8.0), (5, 30.0), (6, 30.0)])
+def test_backoff_grows_exponentially_up_to_the_cap(attempt: int, expected: float) -> None:
+    # when
+    delay = compute_backoff(attempt, 1.0, 30.0, 2.0, 0.0, random.Random(0))
+
+    # then
+    assert delay == expected
+
+
+def test_jitter_stays_within_bounds() -> None:
+    # given
+    rng = random.Random(0)
+
+    # when
+    delays = [compute_backoff(10, 1.0, 30.0, 2.0, 0.3, rng) for _ in range(1000)]
+
+    # then
+    assert 21.0 <= min(delays) < max(delays) <= 39.0
+    # not in lockstep
+    assert len(set(delays)) == len(delays)
+
+
+@pytest.mark.parametrize("attempt", [1024, 1100, 10 ** 9])
+def test_very_large_attempts_are_capped(attempt: int) -> None:
+    # when
+    delay = compute_backoff(attempt, 1.0, 60.0, 2.0, 0.2, random.Random(0))
+
+    # then
+    assert 48.0 <= delay <= 72.0
+
+
+@pytest.mark.parametrize("initial_seconds, max_seconds, expected", [(0.0, 60.0, 0.0), (90.0, 60.0, 60.0)])
+def test_initial_delay_outside_of_the_cap(initial_seconds: float, max_seconds: float, expected: float) -> None:
+    # when
+    delay = compute_backoff(10 ** 9, initial_seconds, max_seconds, 2.0, 0.0, random.Random(0))
+
+    # then
+    assert delay == expected
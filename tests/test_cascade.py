@@ -0,0 +1,91 @@
+import time
+
+import cv2
+import numpy as np
+
+from src.detectors.base import BaseDetector
+from src.detectors.cascade import CascadeDetector
+from src.detectors.verifier import StreakVerifier
+from src.metrics.camera import CameraMetrics
+from src.metrics.registry import MetricsRegistry
+
+STREAK_BOX = [10, 10, 50, 30, 800]
+BLOB_BOX = [60, 20, 75, 35, 225]
+
+
+class FixedProposer(BaseDetector):
+    def update(self, frame):
+        return np.array([STREAK_BOX, BLOB_BOX], dtype=np.float32)
+
+
+class SlowVerifier(StreakVerifier):
+    def verify(self, crop, previous_crop) -> bool:
+        time.sleep(0.2)
+        return False
+
+
+def _frames() -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    background = (rng.random((60, 100, 3)) * 30).astype(np.uint8)
+    frame = background.copy()
+    cv2.line(frame, (15, 15), (45, 25), (90, 90, 90), 2)
+    cv2.circle(frame, (67, 27), 4, (90, 90, 90), -1)
+    return [background, frame, background]
+
+
+def test_only_streak_candidates_pass_verification() -> None:
+    # given
+    registry = MetricsRegistry()
+    detector = CascadeDetector(
+        proposer=FixedProposer(),
+        latency_budget_seconds=5.0,
+        metrics=CameraMetrics(camera_id="cam", registry=registry)
+    )
+
+    # when
+    outputs = [detector.update(frame) for frame in _frames()]
+    detector.close()
+
+    # then
+    # candidates of a frame are returned with the next one
+    assert detector.latency_frames == 1
+    assert len(outputs[0]) == 0 and len(outputs[1]) == 0
+    np.testing.assert_array_equal(outputs[2], [STREAK_BOX])
+    rendered = registry.render()
+    assert 'meteor_candidates_total{camera="cam",verdict="accepted"} 1' in rendered
+    assert 'meteor_candidates_total{camera="cam",verdict="rejected"} 1' in rendered
+
+
+def test_late_verification_passes_candidates_unverified() -> None:
+    # given
+    detector = CascadeDetector(proposer=FixedProposer(), verifier=SlowVerifier(), latency_budget_seconds=0.01)
+
+    # when
+    frames = _frames()
+    detector.update(frames[0])
+    detector.update(frames[1])
+    late_output = detector.update(frames[2])
+    busy_output = detector.update(frames[1])
+    detector.close()
+
+    # then
+    assert len(late_output) == 2
+    # the worker was still busy - candidates of the previous frame bypassed it instead of queueing up
+    assert len(busy_output) == 2
+
+
+def test_reset_drops_candidates_of_frames_before_the_gap() -> None:
+    # given
+    detector = CascadeDetector(proposer=FixedProposer(), latency_budget_seconds=5.0)
+    background, frame, _ = _frames()
+    detector.update(background)
+    detector.update(frame)
+
+    # when
+    detector.reset()
+    outputs = [detector.update(frame), detector.update(frame)]
+    detector.close()
+
+    # then
+    # nothing of the frame before the gap is returned, and the first frame after it is only a reference
+    assert len(outputs[0]) == 0 and len(outputs[1]) == 0
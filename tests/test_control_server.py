@@ -0,0 +1,108 @@
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+from src.control.client import send_command
+from src.control.server import CommandError, ControlServer
+
+
+class FakeMainLoop:
+    """ Runs dispatched functions one by one on its own thread, like `GLib.idle_add` on the main loop """
+
+    def __init__(self):
+        self.functions: queue.Queue[Callable[[], bool] | None] = queue.Queue()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.start()
+
+    def idle_add(self, function: Callable[[], bool]) -> None:
+        self.functions.put(function)
+
+    def stop(self) -> None:
+        self.functions.put(None)
+        self.thread.join()
+
+    def _run(self) -> None:
+        while (function := self.functions.get()) is not None:
+            while function():
+                pass
+
+
+@pytest.fixture
+def main_loop():
+    loop = FakeMainLoop()
+    yield loop
+    loop.stop()
+
+
+def _start_server(tmp_path: Path, main_loop: FakeMainLoop, commands: dict, **kwargs: Any) -> ControlServer:
+    server = ControlServer(
+        socket_path=tmp_path / "control.sock",
+        commands=commands,
+        dispatch_function=main_loop.idle_add,
+        **kwargs
+    )
+    server.start()
+    return server
+
+
+def test_commands_run_on_the_main_loop(tmp_path: Path, main_loop: FakeMainLoop) -> None:
+    # given
+    thresholds = {"bbox_threshold": 128.0}
+    threads = []
+
+    def set_thresholds(arguments: dict[str, Any]) -> dict[str, Any]:
+        threads.append(threading.current_thread())
+        if arguments["bbox_threshold"] < 0:
+            raise CommandError("bbox_threshold must be a non-negative number")
+        thresholds.update(arguments)
+        return thresholds
+
+    server = _start_server(tmp_path, main_loop, {"set-thresholds": set_thresholds})
+
+    # when
+    try:
+        changed = send_command(server.socket_path, "set-thresholds", bbox_threshold=64)
+        rejected = send_command(server.socket_path, "set-thresholds", bbox_threshold=-1)
+        unknown = send_command(server.socket_path, "reboot")
+    finally:
+        server.stop()
+
+    # then
+    assert changed == {"ok": True, "result": {"bbox_threshold": 64}}
+    assert rejected == {"ok": False, "error": "bbox_threshold must be a non-negative number"}
+    assert not unknown["ok"] and "set-thresholds" in unknown["error"]
+    assert threads == [main_loop.thread, main_loop.thread]
+    assert not server.socket_path.exists()
+
+
+def test_busy_main_loop_times_out_the_command_without_running_it_later(
+        tmp_path: Path,
+        main_loop: FakeMainLoop
+) -> None:
+    # given
+    release = threading.Event()
+    calls = []
+    main_loop.idle_add(lambda: release.wait() and False)
+    server = _start_server(
+        tmp_path,
+        main_loop,
+        {"status": lambda arguments: calls.append(arguments) or {}},
+        command_timeout_seconds=0.1
+    )
+
+    # when
+    try:
+        response = send_command(server.socket_path, "status")
+        release.set()
+        # queued behind the timed out command
+        answered = send_command(server.socket_path, "status", verbose=True)
+    finally:
+        server.stop()
+
+    # then
+    assert not response["ok"] and "did not run" in response["error"]
+    assert answered == {"ok": True, "result": {}}
+    assert calls == [{"verbose": True}]
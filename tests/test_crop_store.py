@@ -0,0 +1,49 @@
+import numpy as np
+
+from src.file_operations.crop_store import crop_around, CropStore, EventCrops
+
+
+def _frame(value: int) -> np.ndarray:
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    frame[..., 0] = value
+    return frame
+
+
+def test_crop_is_shifted_inside_the_frame() -> None:
+    # given
+    frame = np.arange(120 * 160, dtype=np.uint32).reshape(120, 160)
+
+    # when
+    crop, origin = crop_around(frame, np.array([150, 2, 158, 10, 1]), size=32)
+
+    # then
+    assert origin == (128, 0)
+    np.testing.assert_array_equal(crop, frame[0:32, 128:160])
+
+
+def test_event_crops_include_pre_event_frames(tmp_path) -> None:
+    # given
+    store = CropStore(output_directory=tmp_path, camera_id="cam", crop_size=16, chunk_size=3, pre_event_frames=2)
+    track = np.array([[40, 40, 50, 50, 7]], dtype=np.float32)
+
+    # when
+    store.add(_frame(1), track, pts=1000)
+    store.add(_frame(2), track, pts=2000)
+    store.add(_frame(3), track, pts=3000)
+    store.begin_event("event-1")
+    for value in range(4, 8):
+        store.add(_frame(value), np.concatenate([track, track + [60, 0, 60, 0, 1]]), pts=value * 1000)
+    store.end_event()
+    store.add(_frame(9), track, pts=9000)
+    store.close()
+    crops = EventCrops(tmp_path / "event-1")
+
+    # then
+    # the first frame fell out of the pre-event buffer
+    assert len(crops) == 2 + 4 * 2
+    assert list(crops.index["pts"][:3]) == [2000, 3000, 4000]
+    assert [int(crop[0, 0, 0]) for crop in crops] == [2, 3, 4, 4, 5, 5, 6, 6, 7, 7]
+    index, track_crops = crops.track(8)
+    assert len(track_crops) == 4
+    assert tuple(index["origin"][0]) == (97, 37)
+    np.testing.assert_array_equal(crops[9], track_crops[-1])
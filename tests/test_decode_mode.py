@@ -0,0 +1,40 @@
+from src.gstreamer.decode_mode import DecodeMode, DecodeModeController
+from src.metrics.registry import MetricsRegistry
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_decoding_switches_to_full_on_candidates_and_back_when_idle() -> None:
+    # given
+    clock = FakeClock()
+    registry = MetricsRegistry()
+    modes = []
+    controller = DecodeModeController(
+        camera_id="cam",
+        set_mode_function=modes.append,
+        idle_after_seconds=10.0,
+        registry=registry,
+        clock=clock
+    )
+
+    # when
+    clock.now = 5.0
+    controller.update(candidates_detected=True)
+    clock.now = 12.0
+    mode_before_idle_timeout = controller.update(candidates_detected=False)
+    clock.now = 16.0
+    mode_after_idle_timeout = controller.update(candidates_detected=False)
+
+    # then
+    assert mode_before_idle_timeout == DecodeMode.FULL
+    assert mode_after_idle_timeout == DecodeMode.KEYFRAMES
+    assert modes == [DecodeMode.KEYFRAMES, DecodeMode.FULL, DecodeMode.KEYFRAMES]
+    rendered = registry.render()
+    assert 'meteor_decode_mode_seconds_total{camera="cam",mode="KEYFRAMES"} 5' in rendered
+    assert 'meteor_decode_mode_seconds_total{camera="cam",mode="FULL"} 11' in rendered
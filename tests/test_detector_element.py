@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("gi")
+
+from src.detectors.suppression import SuppressionMap
+from src.gstreamer.detector_element import detections_from_message, register_detector_element
+from src.gstreamer.pipeline import initialize_gstreamer
+
+from gi.repository import Gst
+
+WIDTH, HEIGHT = 160, 120
+FRAME_DURATION = Gst.SECOND // 10
+
+
+def _frames() -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur((rng.random((HEIGHT, WIDTH, 3)) * 40).astype(np.uint8), (5, 5), 0)
+    moved = background.copy()
+    cv2.line(moved, (40, 40), (70, 50), (200, 200, 200), 3)
+    return [background, moved, background]
+
+
+def test_detections_of_pushed_frames_are_posted_on_the_bus() -> None:
+    # given
+    initialize_gstreamer()
+    assert register_detector_element()
+    pipeline = Gst.parse_launch(
+        f"appsrc name=source format=time caps=video/x-raw,format=BGR,width={WIDTH},height={HEIGHT},framerate=10/1 "
+        "! meteordetect bbox-threshold=20 "
+        "! fakesink"
+    )
+    source = pipeline.get_by_name("source")
+    bus = pipeline.get_bus()
+
+    # when
+    pipeline.set_state(Gst.State.PLAYING)
+    for index, frame in enumerate(_frames()):
+        buffer = Gst.Buffer.new_wrapped(frame.tobytes())
+        buffer.pts = index * FRAME_DURATION
+        buffer.duration = FRAME_DURATION
+        assert source.emit("push-buffer", buffer) == Gst.FlowReturn.OK
+    source.emit("end-of-stream")
+    detections = []
+    while True:
+        message = bus.timed_pop_filtered(
+            5 * Gst.SECOND,
+            Gst.MessageType.ELEMENT | Gst.MessageType.EOS | Gst.MessageType.ERROR
+        )
+        assert message is not None and message.type != Gst.MessageType.ERROR, message
+        if message.type == Gst.MessageType.EOS:
+            break
+        detection = detections_from_message(message)
+        if detection is not None:
+            detections.append(detection)
+    pipeline.set_state(Gst.State.NULL)
+
+    # then
+    # the line appears in the second frame only - the third frame brightens nothing
+    assert [pts for pts, _ in detections] == [FRAME_DURATION]
+    _, boxes = detections[0]
+    assert any(x0 <= 45 and x1 >= 65 for x0, _, x1, _, _ in boxes)
+
+
+def test_changing_the_scale_keeps_the_detector_settings() -> None:
+    # given
+    initialize_gstreamer()
+    register_detector_element()
+    element = Gst.ElementFactory.make("meteordetect")
+    suppression = SuppressionMap()
+    element.detector.suppression = suppression
+    element.set_property("bbox-threshold", 42.0)
+
+    # when
+    element.set_property("scale", 0.5)
+
+    # then
+    assert element.detector.scale == 0.5
+    assert element.detector.bbox_threshold == 42.0
+    assert element.detector.suppression is suppression
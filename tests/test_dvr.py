@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("gi")
+
+from src.gstreamer.dvr import DvrRecorder
+from src.gstreamer.pipeline import initialize_gstreamer, TrackerPipeline
+from src.gstreamer.utils import RecordingState
+
+from gi.repository import GLib, Gst
+
+
+def test_dvr_mode_writes_no_file_outside_of_the_dvr_directory(tmp_path: Path) -> None:
+    # given
+    initialize_gstreamer()
+    dvr_directory = tmp_path / "dvr"
+    pipeline = TrackerPipeline(
+        camera_id="cam",
+        # nothing listens there - the sinks are started without any data
+        rtsp_url="rtsp://127.0.0.1:9/none",
+        recordings_directory=tmp_path / "data",
+        recording_buffer=0
+    )
+    recorder = DvrRecorder(pipeline=pipeline, segments_directory=dvr_directory, clips_directory=tmp_path / "data")
+
+    # when
+    recorder.attach()
+    pipeline.start_pipeline(GLib.MainLoop())
+    pipeline.pipeline.get_state(5 * Gst.SECOND)
+    pipeline.terminate()
+    recorder.close()
+
+    # then
+    assert pipeline.pipeline.get_by_name("file-sink") is None
+    written = [path for path in tmp_path.rglob("*") if path.is_file() and dvr_directory not in path.parents]
+    assert written == []
+    assert pipeline.state == RecordingState.NOT_STARTED
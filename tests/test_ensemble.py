@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.detectors.ensemble import EnsembleDetector, EnsembleMode
+from src.detectors.frame_diff import FrameDiffDetector
+from src.detectors.functions import MaskMode
+from src.detectors.preprocessing import FrameGraph, Intermediate, IntermediateKind
+from src.detectors.stacking import StackingDetector
+from src.metrics.camera import CameraMetrics
+from src.metrics.registry import MetricsRegistry
+
+
+def _frames(count: int = 8) -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur((rng.random((240, 320, 3)) * 40).astype(np.uint8), (5, 5), 0)
+    frames = []
+    for index in range(count):
+        frame = background.copy()
+        cv2.line(frame, (20 + 25 * index, 60 + 5 * index), (50 + 25 * index, 70 + 5 * index), (200, 200, 200), 3)
+        frames.append(frame)
+    return frames
+
+
+def _detectors() -> dict:
+    return {
+        "gaussian": FrameDiffDetector(bbox_threshold=20, scale=0.5),
+        "box": FrameDiffDetector(bbox_threshold=20, scale=0.5, mask_mode=MaskMode.BOX),
+        "stacking": StackingDetector(bbox_threshold=20, window=4, scale=0.5),
+    }
+
+
+def test_members_share_intermediates_and_detect_like_standalone_detectors() -> None:
+    # given
+    frames = _frames()
+    standalone = _detectors()
+    registry = MetricsRegistry()
+    ensemble = EnsembleDetector(detectors=_detectors(), metrics=CameraMetrics(camera_id="cam", registry=registry))
+
+    # when
+    for frame in frames:
+        ensemble.update(frame)
+        expected = {name: detector.update(frame) for name, detector in standalone.items()}
+
+        # then
+        for name, bboxes in expected.items():
+            np.testing.assert_array_equal(ensemble.last_detections[name], bboxes, err_msg=name)
+
+    computations = ensemble.graph.computations
+    assert computations[Intermediate(IntermediateKind.GRAY, 0.5)] == len(frames)
+    # the first frame has no difference
+    assert computations[Intermediate(IntermediateKind.DIFFERENCE, 0.5)] == len(frames) - 1
+    assert computations[Intermediate(IntermediateKind.BLURRED_DIFFERENCE, 0.5)] == len(frames) - 1
+    assert computations[Intermediate(IntermediateKind.MASK, 0.5, MaskMode.BOX)] == len(frames) - 1
+    assert 'meteor_detector_detections_total{camera="cam",detector="stacking"}' in registry.render()
+
+
+def test_gray_of_a_lower_scale_is_downscaled_from_the_shared_full_resolution_gray() -> None:
+    # given
+    frames = _frames(3)
+    ensemble = EnsembleDetector(detectors={
+        # declared in this order, the lower scale is still computed last
+        "stacking": StackingDetector(bbox_threshold=20, window=2, scale=0.5),
+        "frame-diff": FrameDiffDetector(bbox_threshold=20),
+    })
+
+    # when
+    for frame in frames:
+        ensemble.update(frame)
+
+    # then
+    full_gray = cv2.cvtColor(frames[-1], cv2.COLOR_BGR2GRAY)
+    expected = cv2.resize(full_gray, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+    np.testing.assert_array_equal(ensemble.graph.gray(0.5), expected)
+    assert ensemble.graph.computations[Intermediate(IntermediateKind.DIFFERENCE, 0.5)] == len(frames) - 1
+
+
+def test_shared_intermediates_are_read_only() -> None:
+    # given
+    first, second = _frames(2)
+    graph = FrameGraph()
+    graph.next_frame(first).gray()
+
+    # when
+    mask = graph.next_frame(second).mask(1.0, MaskMode.GAUSSIAN)
+
+    # then
+    assert mask is not None
+    with pytest.raises(ValueError):
+        mask[0, 0] = 0
+
+
+@pytest.mark.parametrize("mode, expected_count", [(EnsembleMode.UNION, 2), (EnsembleMode.PRIMARY, 1)])
+def test_detections_are_merged_by_mode(mode: EnsembleMode, expected_count: int) -> None:
+    # given
+    class FixedDetector:
+        def __init__(self, bboxes: list) -> None:
+            self.bboxes = np.array(bboxes, dtype=np.float32)
+
+        def update(self, frame: np.ndarray) -> np.ndarray:
+            return self.bboxes
+
+    ensemble = EnsembleDetector(
+        detectors={
+            "primary": FixedDetector([[10, 10, 50, 50, 1600]]),
+            # overlaps the box of the primary detector - and adds another one
+            "secondary": FixedDetector([[12, 12, 50, 50, 1444], [100, 100, 120, 110, 200]]),
+        },
+        mode=mode,
+        nms_threshold=0.5
+    )
+
+    # when
+    bboxes = ensemble.update(np.zeros((240, 320, 3), dtype=np.uint8))
+
+    # then
+    assert len(bboxes) == expected_count
+    assert bboxes[0][4] == 1600
+
+
+@pytest.mark.parametrize("name", ["gaussian", "stacking", "ensemble"])
+def test_reset_detector_does_not_diff_against_a_stale_frame(name: str) -> None:
+    # given
+    detector = EnsembleDetector(detectors=_detectors()) if name == "ensemble" else _detectors()[name]
+    stale, *frames = _frames(4)
+    detector.update(stale)
+    # e.g. hours later, when a QoS level switches back to the detector
+    frames[0] = cv2.add(frames[0], np.full_like(frames[0], 80))
+
+    # when
+    detector.reset()
+    bboxes_after_reset = detector.update(frames[0])
+
+    # then
+    assert len(bboxes_after_reset) == 0
+    assert len(detector.update(frames[1])) > 0
@@ -0,0 +1,56 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_DIRECTORY = Path(__file__).parent.parent
+
+# modules of features enabled by command line options, the entry point imports them only when enabled
+OPTIONAL_FEATURE_MODULES = (
+    "src.control.server",
+    "src.detectors.cascade",
+    "src.detectors.stacking",
+    "src.file_operations.crop_store",
+    "src.gstreamer.dvr",
+    "src.gstreamer.night_schedule",
+    "src.ipc.publisher",
+    "src.metrics.server",
+    "src.qos.controller",
+    "src.trackers.streak",
+    "http.server",
+)
+
+
+def _imported_modules(module: str) -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(' '.join(sys.modules))"],
+        cwd=PROJECT_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return set(result.stdout.split())
+
+
+def test_runtime_image_helpers_do_not_import_plotting_libraries() -> None:
+    # when
+    modules = _imported_modules("src.file_operations.async_writer")
+
+    # then
+    assert "matplotlib" not in modules
+    assert "PIL" not in modules
+
+
+def test_entry_point_imports_optional_features_only_when_enabled() -> None:
+    # given
+    pytest.importorskip("gi")
+    pytest.importorskip("ioutrack")
+
+    # when
+    modules = _imported_modules("src.__main__")
+
+    # then
+    assert [module for module in OPTIONAL_FEATURE_MODULES if module in modules] == []
+    assert "matplotlib" not in modules
+    assert "PIL" not in modules
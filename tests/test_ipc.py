@@ -0,0 +1,114 @@
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.ipc.messages import decode_batch, DetectionsEvent, encode_batch, LENGTH_PREFIX, RecordingStateEvent
+from src.ipc.publisher import EventPublisher
+from src.ipc.subscriber import EventSubscriber
+from src.metrics.registry import MetricsRegistry
+
+
+def _wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Condition not met in time"
+        time.sleep(0.01)
+
+
+def _receive_all(subscriber: EventSubscriber, events: list) -> None:
+    while (batch := subscriber.receive()) is not None:
+        events += batch.events
+
+
+def test_batch_is_decoded_to_the_encoded_events() -> None:
+    # given
+    boxes = np.array([[1.5, 2, 30, 40, 7], [100, 120, 130, 125, 8]], dtype=np.float32)
+    events = [
+        DetectionsEvent(pts=40_000_000, time_ns=1_700_000_000_000_000_000, boxes=boxes),
+        RecordingStateEvent(pts=None, time_ns=1_700_000_000_100_000_000, state="STARTING"),
+        DetectionsEvent(pts=80_000_000, time_ns=1_700_000_000_200_000_000, boxes=np.empty((0, 5), np.float32)),
+    ]
+
+    # when
+    message = encode_batch("north", events)
+    batch = decode_batch(message[LENGTH_PREFIX.size:])
+
+    # then
+    assert LENGTH_PREFIX.unpack_from(message)[0] == len(message) - LENGTH_PREFIX.size
+    assert batch.camera_id == "north"
+    assert [type(event) for event in batch.events] == [DetectionsEvent, RecordingStateEvent, DetectionsEvent]
+    np.testing.assert_array_equal(batch.events[0].boxes, boxes)
+    assert batch.events[0].pts == 40_000_000
+    assert batch.events[1] == events[1]
+    assert batch.events[2].boxes.shape == (0, 5)
+
+
+def test_every_subscriber_receives_the_batches(tmp_path: Path) -> None:
+    # given
+    publisher = EventPublisher(tmp_path / "events.sock", camera_id="north", registry=MetricsRegistry())
+    publisher.start()
+    subscribers = [EventSubscriber(publisher.socket_path, timeout=2.0) for _ in range(3)]
+    _wait_for(lambda: publisher.subscribers == 3)
+
+    # when
+    publisher.publish_detections(40_000_000, np.array([[1, 2, 3, 4, 5]]))
+    publisher.publish_recording_state(40_000_000, "STARTING")
+
+    # then
+    try:
+        for subscriber in subscribers:
+            events = []
+            while len(events) < 2:
+                events += subscriber.receive().events
+            assert isinstance(events[0], DetectionsEvent)
+            np.testing.assert_array_equal(events[0].boxes, [[1, 2, 3, 4, 5]])
+            assert events[1].state == "STARTING"
+    finally:
+        for subscriber in subscribers:
+            subscriber.close()
+        publisher.close()
+    assert not publisher.socket_path.exists()
+
+
+def test_slow_subscriber_is_dropped_without_blocking_the_publisher(tmp_path: Path) -> None:
+    # given
+    registry = MetricsRegistry()
+    publisher = EventPublisher(
+        tmp_path / "events.sock",
+        camera_id="north",
+        batch_interval_seconds=0.005,
+        subscriber_buffer_bytes=64 * 1024,
+        registry=registry
+    )
+    publisher.start()
+    stalled = EventSubscriber(publisher.socket_path)
+    reader = EventSubscriber(publisher.socket_path, timeout=5.0)
+    received = []
+    reading = threading.Thread(target=lambda: _receive_all(reader, received))
+    reading.start()
+    _wait_for(lambda: publisher.subscribers == 2)
+    boxes = np.ones((20, 5), dtype=np.float32)
+
+    # when
+    started = time.perf_counter()
+    for frame in range(4000):
+        publisher.publish_detections(frame, boxes)
+        if frame % 100 == 0:
+            # the stalled subscriber never reads
+            time.sleep(0.005)
+    publishing_seconds = time.perf_counter() - started
+
+    # then
+    try:
+        _wait_for(lambda: publisher.subscribers == 1)
+        assert 'meteor_event_subscribers_dropped_total{camera="north"} 1' in registry.render()
+        assert publishing_seconds < 2
+        _wait_for(lambda: len(received) == 4000)
+        assert [event.pts for event in received] == list(range(4000))
+    finally:
+        stalled.close()
+        publisher.close()
+        reading.join()
+        reader.close()
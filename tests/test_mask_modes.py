@@ -0,0 +1,117 @@
+import tracemalloc
+
+import cv2
+import numpy as np
+import pytest
+
+from src.detectors.frame_diff import FrameDiffDetector
+from src.detectors.functions import get_mask, MaskMode, MaskWorkspace, threshold_blurred_difference
+
+
+def _frames() -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur((rng.random((120, 160)) * 40).astype(np.uint8), (5, 5), 0)
+    moved = background.copy()
+    cv2.line(moved, (40, 40), (70, 50), 200, 3)
+    return background, moved
+
+
+def test_box_threshold_matches_opencv_mean_threshold() -> None:
+    # given
+    frame1, frame2 = _frames()
+    difference = cv2.medianBlur(cv2.subtract(frame2, frame1), 3)
+    expected = cv2.adaptiveThreshold(difference, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 11, 3)
+    expected = cv2.morphologyEx(cv2.medianBlur(expected, 3), cv2.MORPH_CLOSE, np.array((9, 9), dtype=np.uint8))
+
+    # when
+    mask = get_mask(frame1, frame2, mode=MaskMode.BOX, workspace=MaskWorkspace())
+
+    # then
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_gaussian_threshold_matches_opencv_adaptive_threshold() -> None:
+    # given
+    frame1, frame2 = _frames()
+    difference = cv2.medianBlur(cv2.subtract(frame2, frame1), 3)
+    expected = cv2.adaptiveThreshold(difference, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 3)
+    expected = cv2.morphologyEx(cv2.medianBlur(expected, 3), cv2.MORPH_CLOSE, np.array((9, 9), dtype=np.uint8))
+
+    # when
+    mask = get_mask(frame1, frame2, mode=MaskMode.GAUSSIAN, workspace=MaskWorkspace())
+
+    # then
+    np.testing.assert_array_equal(mask, expected)
+
+
+@pytest.mark.parametrize("mode, method", [
+    (MaskMode.GAUSSIAN, cv2.ADAPTIVE_THRESH_GAUSSIAN_C),
+    (MaskMode.BOX, cv2.ADAPTIVE_THRESH_MEAN_C)
+])
+def test_saturated_difference_matches_opencv_adaptive_threshold(mode: MaskMode, method: int) -> None:
+    # given
+    # flat saturated regions next to darker ones (flat, so both Gaussian windows round alike)
+    difference = np.full((40, 40), 255, dtype=np.uint8)
+    difference[20:, :] = 253
+    difference[:, 20:] -= 13
+    difference[10:30, 10:30] = 254
+    expected = cv2.medianBlur(cv2.adaptiveThreshold(difference, 255, method, cv2.THRESH_BINARY_INV, 11, 3), 3)
+
+    # when
+    mask = threshold_blurred_difference(difference, mode=mode, workspace=MaskWorkspace())
+
+    # then
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_workspace_is_reused_between_frames() -> None:
+    # given
+    frame1, frame2 = _frames()
+    workspace = MaskWorkspace()
+
+    # when
+    first_mask = get_mask(frame1, frame2, mode=MaskMode.BOX_SINGLE_BLUR, workspace=workspace)
+    second_mask = get_mask(frame1, frame2, mode=MaskMode.BOX_SINGLE_BLUR, workspace=workspace)
+
+    # then
+    assert first_mask is second_mask is workspace.mask
+
+
+def test_box_modes_detect_moving_object() -> None:
+    # given
+    frame1, frame2 = _frames()
+
+    for mode in MaskMode:
+        detector = FrameDiffDetector(bbox_threshold=20, mask_mode=mode)
+
+        # when
+        detector.update(cv2.cvtColor(frame1, cv2.COLOR_GRAY2BGR))
+        bboxes = detector.update(cv2.cvtColor(frame2, cv2.COLOR_GRAY2BGR))
+
+        # then
+        assert len(bboxes) >= 1, mode
+        assert any(x0 <= 45 and x1 >= 65 for x0, _, x1, _, _ in bboxes), mode
+
+
+@pytest.mark.parametrize("mode, scale", [(MaskMode.GAUSSIAN, 1.0), (MaskMode.BOX, 1.0), (MaskMode.GAUSSIAN, 0.5)])
+def test_detector_does_not_allocate_frames_after_first_frame(mode: MaskMode, scale: float) -> None:
+    # given
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur((rng.random((480, 640, 3)) * 40).astype(np.uint8), (5, 5), 0)
+    frames = [background.copy() for _ in range(6)]
+    for index, frame in enumerate(frames):
+        cv2.line(frame, (40 + 60 * index, 100), (80 + 60 * index, 120), (200, 200, 200), 3)
+    detector = FrameDiffDetector(bbox_threshold=20, mask_mode=mode, scale=scale)
+    detector.update(frames[0])
+    detector.update(frames[1])
+
+    # when
+    tracemalloc.start()
+    for frame in frames[2:]:
+        detector.update(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # then
+    # a single full-frame grayscale intermediate would take 300 kB
+    assert peak < 480 * 640 * scale ** 2 / 8
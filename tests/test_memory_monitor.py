@@ -0,0 +1,73 @@
+import numpy as np
+
+from src.profiling.memory import MemoryMonitor
+
+STAGE_PATHS = {"detector": ("tests/test_memory_monitor.py",)}
+
+
+def _leak(retained: list) -> None:
+    retained.append(np.ones(64 * 1024, dtype=np.uint8).tobytes())
+
+
+def _run(monitor: MemoryMonitor, leak: bool, callbacks: int = 1) -> None:
+    retained = []
+    monitor.start()
+    try:
+        for minute in range(12):
+            if leak:
+                _leak(retained)
+            # a callback is added in the last minute when asked for more than one
+            gauges = {"new_sample_callbacks": callbacks if minute == 11 else 1}
+            monitor.sample(elapsed_seconds=60.0 * minute, gauges=gauges)
+    finally:
+        monitor.stop()
+
+
+def test_growing_stage_is_reported_with_its_allocation_site() -> None:
+    # given
+    monitor = MemoryMonitor(
+        warmup_seconds=120,
+        max_stage_growth_per_hour=1024 ** 2,
+        stage_paths=STAGE_PATHS,
+        rss_function=lambda: 100 * 1024 ** 2
+    )
+
+    # when
+    _run(monitor, leak=True)
+    report = monitor.report()
+
+    # then
+    assert not report.passed
+    # 64 KiB per minute
+    assert 3.5 * 1024 ** 2 < report.stage_slopes["detector"] < 4.5 * 1024 ** 2
+    assert any(violation.startswith("detector grows") for violation in report.violations)
+    site = report.growing_sites[0]
+    assert site.stage == "detector"
+    # 9 blocks leaked after the baseline snapshot
+    assert site.size_diff >= 9 * 64 * 1024
+    assert "test_memory_monitor.py" in site.traceback[0]
+    assert "detector grows" in report.format()
+
+
+def test_stable_memory_passes_and_gauges_are_checked() -> None:
+    # given
+    monitors = [
+        MemoryMonitor(
+            warmup_seconds=120,
+            max_stage_growth_per_hour=1024 ** 2,
+            gauge_limits={"new_sample_callbacks": 1},
+            stage_paths=STAGE_PATHS,
+            rss_function=lambda: 100 * 1024 ** 2
+        )
+        for _ in range(2)
+    ]
+
+    # when
+    _run(monitors[0], leak=False)
+    _run(monitors[1], leak=False, callbacks=2)
+    report, report_with_added_callback = (monitor.report() for monitor in monitors)
+
+    # then
+    assert report.passed, report.violations
+    assert abs(report.rss_slope) < 1
+    assert report_with_added_callback.violations == ["new_sample_callbacks reached 2 (limit 1)"]
@@ -0,0 +1,86 @@
+import json
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from src.metrics.camera import CameraMetrics
+from src.metrics.registry import MetricsRegistry
+from src.metrics.server import MetricsServer
+
+
+def test_histogram_is_rendered_with_cumulative_buckets() -> None:
+    # given
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "test_duration_seconds", "Test duration", ("camera",), buckets=(0.1, 1.0)
+    ).labels(camera="cam-1")
+
+    # when
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+    rendered = registry.render()
+
+    # then
+    assert '# TYPE test_duration_seconds histogram' in rendered
+    assert 'test_duration_seconds_bucket{camera="cam-1",le="0.1"} 1' in rendered
+    assert 'test_duration_seconds_bucket{camera="cam-1",le="1"} 2' in rendered
+    assert 'test_duration_seconds_bucket{camera="cam-1",le="+Inf"} 3' in rendered
+    assert 'test_duration_seconds_count{camera="cam-1"} 3' in rendered
+
+
+def test_camera_metrics_are_labelled_per_camera() -> None:
+    # given
+    registry = MetricsRegistry()
+    first_camera = CameraMetrics(camera_id="first", registry=registry)
+    second_camera = CameraMetrics(camera_id="second", registry=registry)
+
+    # when
+    first_camera.dropped_frames("map_failed").inc()
+    second_camera.frames_processed.inc(3)
+    with first_camera.time_stage("detector"):
+        pass
+    rendered = registry.render()
+
+    # then
+    assert 'meteor_frames_dropped_total{camera="first",reason="map_failed"} 1' in rendered
+    assert 'meteor_frames_processed_total{camera="second"} 3' in rendered
+    assert 'meteor_stage_duration_seconds_count{camera="first",stage="detector"} 1' in rendered
+
+
+def test_metrics_server_serves_registry() -> None:
+    # given
+    registry = MetricsRegistry()
+    registry.counter("test_total", "Test counter").labels().inc()
+    server = MetricsServer(port=0, registry=registry)
+    server.start()
+
+    # when
+    try:
+        host, port = server.address
+        with urlopen(f"http://{host}:{port}/metrics") as response:
+            body = response.read().decode("utf-8")
+    finally:
+        server.stop()
+
+    # then
+    assert "test_total 1" in body
+
+
+def test_metrics_server_serves_health() -> None:
+    # given
+    server = MetricsServer(port=0, registry=MetricsRegistry(), health_function=lambda: (False, {"state": "paused"}))
+    server.start()
+
+    # when
+    try:
+        host, port = server.address
+        with pytest.raises(HTTPError) as error:
+            urlopen(f"http://{host}:{port}/health")
+    finally:
+        server.stop()
+
+    # then
+    assert error.value.code == 503
+    assert json.loads(error.value.read()) == {"state": "paused"}
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from src.gstreamer.night_schedule import NightScheduler, sun_altitude_degrees
+from src.metrics.registry import MetricsRegistry
+
+GREENWICH = (51.4769, 0.0)
+
+
+def _timestamp(*args: int) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+class FakeClock:
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize("timestamp, latitude, longitude, expected_altitude", [
+    # solar noon at the solstices: 90 - latitude +- obliquity
+    (_timestamp(2024, 6, 20, 12, 2), *GREENWICH, 61.96),
+    (_timestamp(2024, 12, 21, 11, 58), *GREENWICH, 15.08),
+    # sun overhead at the equator on the equinox
+    (_timestamp(2024, 3, 20, 12, 7), 0.0, 0.0, 89.8),
+    # sunrise in Sydney (UTC+11), 05:47 local time
+    (_timestamp(2023, 12, 31, 18, 47), -33.87, 151.21, -0.83),
+])
+def test_sun_altitude_matches_known_positions(
+        timestamp: float,
+        latitude: float,
+        longitude: float,
+        expected_altitude: float
+) -> None:
+    # when
+    altitude = sun_altitude_degrees(timestamp, latitude, longitude)
+
+    # then
+    assert altitude == pytest.approx(expected_altitude, abs=0.1)
+
+
+def test_detection_is_suspended_in_daylight_after_recording_finishes() -> None:
+    # given
+    clock = FakeClock(_timestamp(2024, 6, 21, 0, 0))
+    recording = [True]
+    registry = MetricsRegistry()
+    suspensions = []
+    scheduler = NightScheduler(
+        camera_id="cam",
+        latitude=GREENWICH[0],
+        longitude=GREENWICH[1],
+        set_suspended_function=suspensions.append,
+        twilight_altitude_degrees=-6.0,
+        can_suspend_function=lambda: not recording[0],
+        registry=registry,
+        clock=clock
+    )
+
+    # when
+    scheduler.update()
+    clock.now = _timestamp(2024, 6, 21, 10, 0)
+    scheduler.update()
+    suspended_while_recording = scheduler.suspended
+    recording[0] = False
+    scheduler.update()
+    suspended_during_day = scheduler.suspended
+    clock.now = _timestamp(2024, 6, 21, 21, 30)
+    scheduler.update()
+
+    # then
+    assert not suspended_while_recording
+    assert suspended_during_day
+    assert not scheduler.suspended
+    assert suspensions == [True, False]
+    assert 'meteor_detection_suspended{camera="cam"} 0' in registry.render()
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from dev.sweep_parameters import build_grid, Clip, LruCache, sweep, sweep_chunk
+from src.detectors.functions import get_detections, MaskMode
+
+
+def _write_clip(directory: Path, frames: int = 6) -> Clip:
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur((rng.random((120, 160, 3)) * 40).astype(np.uint8), (5, 5), 0)
+    labels = ["frame,x0,y0,x1,y1"]
+    for index in range(frames):
+        frame = background.copy()
+        x = 10 + 20 * index
+        cv2.line(frame, (x, 40), (x + 15, 50), (200, 200, 200), 3)
+        cv2.imwrite(str(directory / f"{index}.png"), frame)
+        if index > 0:
+            labels.append(f"{index},{x - 2},{38},{x + 17},{52}")
+    (directory / "labels.csv").write_text("\n".join(labels))
+    return Clip.from_path(directory)
+
+
+def test_chunk_matches_detection_chain_and_shares_masks(tmp_path: Path) -> None:
+    # given
+    clip = _write_clip(tmp_path)
+    grid = build_grid([1.0], [MaskMode.GAUSSIAN, MaskMode.BOX], ["default"], [20, 40, 80], [1e-3, 0.5])
+    cache = LruCache(max_bytes=1 << 26)
+    frames = [cv2.cvtColor(cv2.imread(str(tmp_path / f"{index}.png")), cv2.COLOR_BGR2GRAY) for index in range(6)]
+
+    # when
+    results = sweep_chunk(clip, 1, 6, grid, cache=cache)
+
+    # then
+    for parameters, counts in results.items():
+        expected = sum(
+            len(get_detections(
+                frames[index - 1],
+                frames[index],
+                bbox_thresh=parameters.bbox_threshold,
+                nms_thresh=parameters.nms_threshold,
+                mask_mode=parameters.mask_mode
+            ))
+            for index in range(1, 6)
+        )
+        assert counts.pairs == 5
+        assert counts.detections == expected
+        assert counts.labels == 5
+    # grayscale once per frame, difference and its blur once per pair, the other stages once per pair and mode
+    assert cache.misses == 6 + 5 * 2 + 5 * 2 * 3
+    assert results[grid[0]].recall == 1.0
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    # given
+    cache = LruCache(max_bytes=250)
+
+    # when
+    cache.get_or_compute("a", lambda: np.zeros(100, dtype=np.uint8))
+    cache.get_or_compute("b", lambda: np.zeros(100, dtype=np.uint8))
+    cache.get_or_compute("a", lambda: np.ones(100, dtype=np.uint8))
+    cache.get_or_compute("c", lambda: np.zeros(100, dtype=np.uint8))
+    value, _ = cache.get_or_compute("a", lambda: np.ones(100, dtype=np.uint8))
+
+    # then
+    assert cache.evictions == 1
+    assert cache.hits == 2
+    assert value.sum() == 0
+    assert cache.size_bytes == 200
+
+
+def test_sweep_in_process_pool_sums_chunks(tmp_path: Path) -> None:
+    # given
+    clip = _write_clip(tmp_path)
+    grid = build_grid([1.0, 0.5], [MaskMode.BOX], ["3x3"], [20], [1e-3])
+
+    # when
+    results = sweep([clip], grid, workers=2, chunk_frames=2)
+
+    # then
+    expected = sweep_chunk(clip, 1, 6, grid, cache=LruCache(max_bytes=1 << 26))
+    for parameters, counts in results.items():
+        assert counts.pairs == 5
+        assert counts.detections == expected[parameters].detections
+        assert counts.matched_labels == expected[parameters].matched_labels
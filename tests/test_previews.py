@@ -0,0 +1,86 @@
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.file_operations.generators import ImageGenerator
+from src.file_operations.previews import build_preview, GifWriter, PreviewBuilder
+
+
+def _frame(index: int, shape: tuple[int, int] = (120, 160)) -> np.ndarray:
+    frame = np.zeros((*shape, 3), dtype=np.uint8)
+    cv2.circle(frame, (10 + 7 * index % shape[1], shape[0] // 2), 8, (40, 180, 255), -1)
+    return frame
+
+
+def test_gif_is_written_frame_by_frame(tmp_path: Path) -> None:
+    # given
+    output_path = tmp_path / "preview.gif"
+
+    # when
+    with GifWriter(output_path, frame_duration_ms=80) as writer:
+        for index in range(12):
+            writer.write(_frame(index))
+        # later frames of a different size are resized to the first one
+        writer.write(cv2.cvtColor(_frame(12, (60, 80)), cv2.COLOR_BGR2GRAY))
+
+    # then
+    with Image.open(output_path) as image:
+        assert image.n_frames == 13
+        assert image.size == (160, 120)
+        assert image.info["duration"] == 80
+        image.seek(3)
+        decoded = cv2.cvtColor(np.array(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+    np.testing.assert_allclose(decoded.astype(int), _frame(3).astype(int), atol=16)
+
+
+def test_memory_does_not_grow_with_clip_length(tmp_path: Path) -> None:
+    # given
+    def peak_bytes(frames: int) -> int:
+        tracemalloc.start()
+        build_preview((_frame(index, (240, 320)) for index in range(frames)), tmp_path / f"{frames}.gif")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    # when
+    short_clip = peak_bytes(5)
+    long_clip = peak_bytes(60)
+
+    # then
+    assert long_clip < 1.5 * short_clip
+
+
+def test_builder_downscales_image_folder_in_background(tmp_path: Path) -> None:
+    # given
+    for index in range(6):
+        cv2.imwrite(str(tmp_path / f"{index}.png"), _frame(index, (300, 400)))
+    builder = PreviewBuilder(max_size=100, every_nth_frame=2)
+
+    # when
+    future = builder.submit(ImageGenerator(images_directory=tmp_path), tmp_path / "previews" / "event.gif")
+    output_path = future.result(timeout=10)
+    builder.close()
+
+    # then
+    with Image.open(output_path) as image:
+        assert image.n_frames == 3
+        assert image.size == (100, 75)
+
+
+def test_mp4_preview_is_encoded_without_a_running_pipeline(tmp_path: Path) -> None:
+    # given
+    pytest.importorskip("gi")
+    output_path = tmp_path / "preview.mp4"
+
+    # when
+    build_preview((_frame(index) for index in range(10)), output_path)
+
+    # then
+    capture = cv2.VideoCapture(str(output_path))
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    assert frame_count == 10
@@ -0,0 +1,105 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.detectors.ensemble import EnsembleDetector
+from src.detectors.frame_diff import FrameDiffDetector
+from src.detectors.stacking import StackingDetector
+from src.metrics.camera import CameraMetrics
+from src.metrics.registry import MetricsRegistry
+from src.profiling.profiler import FRAME_STAGE, FrameProfiler, ProfilerMode, ProfilingSession
+
+
+def _run_frames(profiler: FrameProfiler, frames: int) -> None:
+    for _ in range(frames):
+        with profiler.frame():
+            with profiler.stage("detector"):
+                time.sleep(0.002)
+    profiler.wait_for_reports()
+
+
+def test_cprofile_session_writes_stage_stats_after_armed_frames(tmp_path: Path) -> None:
+    # given
+    profiler = FrameProfiler(output_directory=tmp_path, mode=ProfilerMode.CPROFILE)
+
+    # when
+    _run_frames(profiler, frames=2)
+    profiler.arm(3)
+    _run_frames(profiler, frames=5)
+
+    # then
+    session_directories = list(tmp_path.iterdir())
+    assert len(session_directories) == 1
+    assert (session_directories[0] / "detector.pstats").exists()
+    report = (session_directories[0] / "timings.txt").read_text()
+    assert "detector" in report
+    assert "frame" in report
+    assert not profiler.active
+
+
+def test_sampling_session_writes_collapsed_stacks(tmp_path: Path) -> None:
+    # given
+    profiler = FrameProfiler(output_directory=tmp_path, mode=ProfilerMode.SAMPLING, sampling_interval_seconds=0.0005)
+
+    # when
+    profiler.arm(5)
+    _run_frames(profiler, frames=5)
+
+    # then
+    collapsed_path = next(tmp_path.iterdir()) / "detector.collapsed"
+    stack, count = collapsed_path.read_text().splitlines()[0].rsplit(" ", 1)
+    assert "test_profiler.py:_run_frames" in stack
+    assert int(count) > 0
+
+
+@pytest.mark.parametrize("mode", [ProfilerMode.CPROFILE, ProfilerMode.SAMPLING])
+def test_armed_profiler_times_ensemble_members_inside_the_detector_stage(tmp_path: Path, mode: ProfilerMode) -> None:
+    # given
+    profiler = FrameProfiler(output_directory=tmp_path, mode=mode, sampling_interval_seconds=0.0005)
+    metrics = CameraMetrics(camera_id="cam", registry=MetricsRegistry(), profiler=profiler)
+    ensemble = EnsembleDetector(
+        detectors={
+            "frame-diff": FrameDiffDetector(bbox_threshold=20, scale=0.5),
+            "stacking": StackingDetector(bbox_threshold=20, window=4, scale=0.5),
+        },
+        metrics=metrics
+    )
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    # when
+    profiler.arm(3)
+    for _ in range(3):
+        with profiler.frame():
+            with metrics.time_stage("detector"):
+                ensemble.update(frame)
+    profiler.wait_for_reports()
+
+    # then
+    session_directory = next(tmp_path.iterdir())
+    report = (session_directory / "timings.txt").read_text()
+    assert "detector-frame-diff" in report
+    assert "detector-stacking" in report
+    if mode == ProfilerMode.CPROFILE:
+        # nested stages are covered by the profile of the outer one
+        assert [path.name for path in session_directory.glob("*.pstats")] == ["detector.pstats"]
+
+
+def test_sampled_stage_returns_to_the_enclosing_stage(tmp_path: Path) -> None:
+    # given
+    session = ProfilingSession(tmp_path, ProfilerMode.SAMPLING, frames=1, sampling_interval_seconds=1.0)
+    session.start()
+    session.enter_stage(FRAME_STAGE)
+    session.enter_stage("detector")
+    session.enter_stage("detector-stacking")
+
+    # when
+    session.exit_stage("detector-stacking", 0.001)
+
+    # then
+    assert session.sampler.current_stage == "detector"
+    session.exit_stage("detector", 0.002)
+    session.exit_stage(FRAME_STAGE, 0.003)
+    assert session.sampler.current_stage is None
+    session.sampler.stop()
@@ -0,0 +1,68 @@
+from src.metrics.registry import MetricsRegistry
+from src.qos.controller import DegradationLevel, QosController
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _create_controller(clock: FakeClock, registry: MetricsRegistry) -> QosController:
+    return QosController(
+        camera_id="cam",
+        levels=[DegradationLevel(name="full"), DegradationLevel(name="skip", frame_stride=2)],
+        degrade_lag_frames=50,
+        recover_lag_frames=10,
+        degrade_after_seconds=2.0,
+        recover_after_seconds=10.0,
+        registry=registry,
+        clock=clock
+    )
+
+
+def test_controller_degrades_only_after_sustained_overload() -> None:
+    # given
+    clock = FakeClock()
+    registry = MetricsRegistry()
+    controller = _create_controller(clock, registry)
+    changes = []
+    controller.add_level_change_callback(lambda previous, current: changes.append((previous.name, current.name)))
+
+    # when
+    controller.observe(lag_frames=100, queue_depth=0)
+    clock.now = 1.0
+    level_after_short_overload = controller.observe(lag_frames=100, queue_depth=0)
+    clock.now = 2.5
+    level_after_long_overload = controller.observe(lag_frames=100, queue_depth=0)
+
+    # then
+    assert level_after_short_overload.name == "full"
+    assert level_after_long_overload.name == "skip"
+    assert changes == [("full", "skip")]
+    assert 'meteor_qos_level{camera="cam"} 1' in registry.render()
+
+
+def test_controller_recovers_with_hysteresis() -> None:
+    # given
+    clock = FakeClock()
+    controller = _create_controller(clock, MetricsRegistry())
+    controller.observe(lag_frames=100, queue_depth=0)
+    clock.now = 3.0
+    controller.observe(lag_frames=100, queue_depth=0)
+
+    # when
+    # lag between recover and degrade thresholds keeps the current level
+    clock.now = 4.0
+    controller.observe(lag_frames=30, queue_depth=0)
+    clock.now = 20.0
+    level_in_hysteresis_band = controller.observe(lag_frames=30, queue_depth=0)
+    controller.observe(lag_frames=0, queue_depth=0)
+    clock.now = 31.0
+    level_after_recovery = controller.observe(lag_frames=0, queue_depth=0)
+
+    # then
+    assert level_in_hysteresis_band.name == "skip"
+    assert level_after_recovery.name == "full"
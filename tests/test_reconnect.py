@@ -0,0 +1,128 @@
+import random
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pytest
+
+pytest.importorskip("gi")
+
+from src.gstreamer.reconnect import ReconnectSupervisor
+from src.metrics.registry import MetricsRegistry
+
+
+@dataclass
+class FakeClock:
+    now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@dataclass
+class FakePipeline:
+    clock: FakeClock
+    camera_id: str = "cam"
+    replaced_sources: int = 0
+    finalized_recordings: int = 0
+    last_source_buffer_time: float = 0.0
+    failure_handler: Callable[[str], None] | None = None
+    connected_callbacks: list[Callable[[], None]] = field(default_factory=list)
+
+    def set_source_failure_handler(self, handler: Callable[[str], None] | None) -> None:
+        self.failure_handler = handler
+
+    def add_source_connected_callback(self, callback: Callable[[], None]) -> None:
+        self.connected_callbacks.append(callback)
+
+    def replace_source(self) -> None:
+        self.replaced_sources += 1
+        self.last_source_buffer_time = self.clock()
+
+    def finalize_recording(self) -> None:
+        self.finalized_recordings += 1
+
+
+@dataclass
+class FakeTimeouts:
+    scheduled: list[tuple[int, Callable[[], bool]]] = field(default_factory=list)
+
+    def __call__(self, interval_ms: int, callback: Callable[[], bool]) -> int:
+        self.scheduled.append((interval_ms, callback))
+        return len(self.scheduled)
+
+    def run_next(self) -> int:
+        interval_ms, callback = self.scheduled.pop(0)
+        callback()
+        return interval_ms
+
+
+def _supervisor(clock: FakeClock, timeouts: FakeTimeouts) -> tuple[ReconnectSupervisor, FakePipeline]:
+    pipeline = FakePipeline(clock=clock, last_source_buffer_time=clock())
+    supervisor = ReconnectSupervisor(
+        pipeline=pipeline,
+        initial_backoff_seconds=1.0,
+        max_backoff_seconds=30.0,
+        jitter=0.0,
+        stall_timeout_seconds=10.0,
+        registry=MetricsRegistry(),
+        rng=random.Random(0),
+        clock_function=clock,
+        timeout_function=timeouts
+    )
+    return supervisor, pipeline
+
+
+def test_stalled_source_is_reconnected_with_backoff() -> None:
+    # given
+    clock, timeouts = FakeClock(), FakeTimeouts()
+    supervisor, pipeline = _supervisor(clock, timeouts)
+
+    # when
+    clock.now += 11
+    supervisor._check_stall()
+    delays = [timeouts.run_next()]
+    for _ in range(3):
+        # every reconnect attempt stalls as well
+        clock.now += 11
+        supervisor._check_stall()
+        delays.append(timeouts.run_next())
+    clock.now += 5
+    supervisor.on_source_connected()
+
+    # then
+    assert delays == [1000, 2000, 4000, 8000]
+    assert pipeline.replaced_sources == 4
+    assert pipeline.finalized_recordings == 1
+    assert supervisor._attempt == 0
+    assert supervisor._outage_started_at is None
+
+
+def test_failure_during_a_scheduled_reconnect_is_ignored() -> None:
+    # given
+    clock, timeouts = FakeClock(), FakeTimeouts()
+    supervisor, pipeline = _supervisor(clock, timeouts)
+
+    # when
+    supervisor.on_source_failure("error")
+    supervisor.on_source_failure("end of stream")
+    supervisor._check_stall()
+
+    # then
+    assert len(timeouts.scheduled) == 1
+
+
+def test_long_outage_keeps_reconnecting_at_the_maximum_backoff() -> None:
+    # given
+    clock, timeouts = FakeClock(), FakeTimeouts()
+    supervisor, pipeline = _supervisor(clock, timeouts)
+    supervisor.on_source_failure("error")
+    timeouts.run_next()
+
+    # when
+    # about a year of attempts failing at the cap
+    supervisor._attempt = 10 ** 6
+    supervisor.on_source_failure("error")
+
+    # then
+    assert timeouts.run_next() == 30000
+    assert pipeline.replaced_sources == 2
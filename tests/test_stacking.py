@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.detectors.frame_diff import FrameDiffDetector
+from src.detectors.projection import SlidingMaxProjection, SlidingSumProjection
+from src.detectors.stacking import StackingDetector
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 5, 8])
+def test_sliding_projections_match_brute_force(window: int) -> None:
+    # given
+    images = np.random.default_rng(window).integers(0, 255, size=(17, 4, 6), dtype=np.uint8)
+    max_projection = SlidingMaxProjection(window=window, shape=(4, 6))
+    sum_projection = SlidingSumProjection(window=window, shape=(4, 6))
+
+    for index, image in enumerate(images):
+        # when
+        maximum = max_projection.push(image)
+        total = sum_projection.push(image)
+
+        # then
+        in_window = images[max(0, index - window + 1):index + 1]
+        np.testing.assert_array_equal(maximum, in_window.max(axis=0))
+        np.testing.assert_array_equal(total, np.minimum(in_window.sum(axis=0, dtype=np.int32), 255))
+
+
+def test_stacking_detects_streak_too_small_in_a_single_difference() -> None:
+    # given
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur((rng.random((360, 640, 3)) * 40).astype(np.uint8), (5, 5), 0)
+    frames = []
+    for frame_number in range(12):
+        frame = cv2.add(background, (rng.random(background.shape) * 3).astype(np.uint8))
+        x, y = 100 + 12 * frame_number, 100 + 4 * frame_number
+        cv2.line(frame, (x, y), (x + 12, y + 4), (60, 60, 60), 2)
+        frames.append(frame)
+    single_pair_detector = FrameDiffDetector(bbox_threshold=800)
+    stacking_detector = StackingDetector(bbox_threshold=800, window=8, scale=0.5)
+
+    # when
+    single_pair_outputs = [single_pair_detector.update(frame) for frame in frames]
+    stacking_outputs = [stacking_detector.update(frame) for frame in frames]
+
+    # then
+    assert all(len(output) == 0 for output in single_pair_outputs)
+    assert len(stacking_outputs[-1]) == 1
+    x0, y0, x1, y1, _ = stacking_outputs[-1][0]
+    # the box covers the trail of the streak within the window
+    assert x0 < 100 + 12 * 5 and x1 > 100 + 12 * 11
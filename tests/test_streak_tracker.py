@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.trackers.streak import StreakTracker
+
+
+def _streak_box(frame_number: int, x0: float = 10.0, y0: float = 20.0, speed: float = 40.0) -> list[float]:
+    x = x0 + speed * frame_number
+    y = y0 + speed / 2 * frame_number
+    return [x, y, x + 12, y + 6, 72]
+
+
+def test_fast_streak_keeps_single_track_id() -> None:
+    # given
+    # consecutive boxes of the streak do not overlap at all, IoU based association would fail
+    tracker = StreakTracker(min_hits=3, max_age=2)
+
+    # when
+    outputs = [
+        tracker.update(np.array([_streak_box(frame_number)], dtype=np.float32))
+        for frame_number in range(8)
+    ]
+
+    # then
+    assert all(len(output) == 0 for output in outputs[:2])
+    assert all(len(output) == 1 for output in outputs[2:])
+    assert len({output[0, 4] for output in outputs[2:]}) == 1
+    np.testing.assert_allclose(outputs[-1][0, :4], _streak_box(7)[:4], atol=1.0)
+
+
+def test_stationary_and_missing_tracks() -> None:
+    # given
+    tracker = StreakTracker(min_hits=2, max_age=1, min_speed=2.0)
+    star = [500, 500, 504, 504, 16]
+
+    # when
+    for frame_number in range(5):
+        output = tracker.update(np.array([star, _streak_box(frame_number)], dtype=np.float32))
+    reported_ids = set(output[:, 4])
+    for _ in range(3):
+        tracker.update(np.zeros((0, 5), dtype=np.float32))
+
+    # then
+    # the star is tracked but never reported because it does not move
+    assert len(reported_ids) == 1
+    assert tracker.live_tracks == 0
+
+
+def test_capacity_grows_for_many_candidates() -> None:
+    # given
+    tracker = StreakTracker(initial_capacity=4, min_hits=1)
+    xs = np.arange(300, dtype=np.float32) * 50
+    boxes = np.stack([xs, np.zeros_like(xs), xs + 5, np.full_like(xs, 5), np.full_like(xs, 25)], axis=1)
+
+    # when
+    tracker.update(boxes)
+    output = tracker.update(boxes + np.array([2, 0, 2, 0, 0], dtype=np.float32))
+
+    # then
+    assert tracker.live_tracks == 300
+    assert len(output) == 300
+    assert len(set(output[:, 4])) == 300
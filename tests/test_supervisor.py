@@ -0,0 +1,175 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.metrics.registry import MetricsRegistry
+from src.supervisor.config import CameraConfig, assign_cpus, parse_cameras, parse_cpu_list
+from src.supervisor.supervisor import merge_expositions, Supervisor
+from src.supervisor.worker import CameraWorker
+
+
+def _camera(camera_id: str, numa_node: int | None = None, cpus: tuple[int, ...] | None = None) -> CameraConfig:
+    return CameraConfig(
+        camera_id=camera_id,
+        rtsp_url=f"rtsp://{camera_id}",
+        data_dir=Path("/tmp") / camera_id,
+        metrics_port=0,
+        cpus=cpus,
+        numa_node=numa_node
+    )
+
+
+def test_cameras_are_parsed_with_defaults_and_ports() -> None:
+    # given
+    config = {
+        "metrics_base_port": 9200,
+        "defaults": {"bbox-th": 30, "tracker": "streak"},
+        "cameras": [
+            {"id": "north", "rtsp_url": "rtsp://north", "data_dir": "/data/north", "cpus": [2, 3]},
+            {"id": "south", "rtsp_url": "rtsp://south", "data_dir": "/data/south", "options": {"bbox-th": 50}},
+        ],
+    }
+
+    # when
+    north, south = parse_cameras(config)
+
+    # then
+    assert (north.metrics_port, south.metrics_port) == (9200, 9201)
+    assert north.cpus == (2, 3)
+    assert south.options == {"bbox-th": 50, "tracker": "streak"}
+    assert south.command("python")[-4:] == ["--bbox-th", "50", "--tracker", "streak"]
+
+
+def test_flags_and_lists_are_passed_the_way_argparse_expects_them() -> None:
+    # given
+    camera = CameraConfig(
+        camera_id="north",
+        rtsp_url="rtsp://north",
+        data_dir=Path("/data/north"),
+        metrics_port=9200,
+        options={"verify-candidates": True, "suppress-hot-pixels": False, "bbox-th": 30, "sizes": [1, 2]}
+    )
+
+    # when
+    command = camera.command("python")
+
+    # then
+    assert command[-6:] == ["--verify-candidates", "--bbox-th", "30", "--sizes", "1", "2"]
+    assert "--suppress-hot-pixels" not in command
+
+
+def test_cpus_are_split_per_numa_node() -> None:
+    # given
+    numa_cpus = {0: parse_cpu_list("0-3"), 1: parse_cpu_list("4-7")}
+    cameras = [_camera("a", numa_node=1), _camera("b", numa_node=1), _camera("c"), _camera("d", cpus=(0,))]
+
+    # when
+    assigned = assign_cpus(cameras, available_cpus=range(8), numa_cpus=numa_cpus)
+
+    # then
+    assert [camera.cpus for camera in assigned] == [(4, 5), (6, 7), tuple(range(8)), (0,)]
+
+
+def test_expositions_are_merged_per_family() -> None:
+    # given
+    first = '# HELP meteor_up Up\n# TYPE meteor_up gauge\nmeteor_up{camera="a"} 1\n'
+    second = '# HELP meteor_up Up\n# TYPE meteor_up gauge\nmeteor_up{camera="b"} 0\n# TYPE other counter\nother 2\n'
+
+    # when
+    merged = merge_expositions([first, second])
+
+    # then
+    assert merged.splitlines() == [
+        "# HELP meteor_up Up",
+        "# TYPE meteor_up gauge",
+        'meteor_up{camera="a"} 1',
+        'meteor_up{camera="b"} 0',
+        "# TYPE other counter",
+        "other 2",
+    ]
+
+
+def test_crashed_worker_is_restarted() -> None:
+    # given
+    # `false -m src ...` exits immediately with a non-zero code
+    worker = CameraWorker(config=_camera("a"), python="false", initial_backoff_seconds=0.0)
+
+    # when
+    worker.start()
+    deadline = time.monotonic() + 5
+    while worker.restarts < 2 and time.monotonic() < deadline:
+        worker.poll()
+        time.sleep(0.01)
+    worker.stop()
+
+    # then
+    assert worker.restarts >= 2
+
+
+def test_worker_crashing_for_a_long_time_is_restarted_at_the_maximum_backoff() -> None:
+    # given
+    worker = CameraWorker(config=_camera("a"), python="false", max_backoff_seconds=60.0)
+    worker._failures = 5000
+
+    # when
+    worker.start()
+    worker._process.wait()
+    worker.poll()
+
+    # then
+    assert 0 < worker._restart_at - time.monotonic() <= 60.0 * 1.3
+
+
+@dataclass
+class FakeWorker:
+    config: CameraConfig
+    healthy: bool = False
+    crashed: bool = False
+    restarts: int = 0
+    running: bool = False
+
+    def start(self) -> None:
+        self.running = True
+
+    def stop(self) -> None:
+        self.running = False
+
+    def poll(self) -> None:
+        if self.crashed:
+            self.crashed = False
+            self.restarts += 1
+
+    def health(self) -> tuple[bool, dict]:
+        return self.healthy, {}
+
+
+def test_rolling_restart_does_not_block_restarts_of_crashed_workers(tmp_path: Path) -> None:
+    # given
+    registry = MetricsRegistry()
+    supervisor = Supervisor(
+        config_path=tmp_path / "cameras.json",
+        port=0,
+        registry=registry,
+        load_function=lambda _: [_camera("a"), _camera("b")],
+        worker_factory=FakeWorker
+    )
+    for config in supervisor.load_function(supervisor.config_path):
+        supervisor._start_worker(config)
+    first_b = supervisor.workers["b"]
+
+    # when
+    supervisor.reload()
+    supervisor.step()
+    restarted_a = supervisor.workers["a"]
+    # the restarted worker of "a" is not healthy yet, "b" crashes meanwhile
+    first_b.crashed = True
+    supervisor.step()
+    restarts_while_waiting = first_b.restarts
+    restarted_a.healthy = True
+    supervisor.step()
+
+    # then
+    assert restarts_while_waiting == 1
+    assert supervisor.workers["b"] is not first_b
+    assert not first_b.running
+    assert 'meteor_worker_restarts_total{camera="b"} 1' in registry.render()
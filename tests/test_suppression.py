@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+
+from src.detectors.frame_diff import FrameDiffDetector
+from src.detectors.suppression import SuppressionMap
+from src.metrics.camera import CameraMetrics
+from src.metrics.registry import MetricsRegistry
+
+HOT_PIXELS = [(40, 50), (200, 100), (120, 280)]
+
+
+def _frame(background: np.ndarray, index: int, meteor: bool = False) -> np.ndarray:
+    frame = background.copy()
+    if index % 2 == 0:
+        # hot pixels blink every other frame
+        for y, x in HOT_PIXELS:
+            frame[y - 1:y + 2, x - 1:x + 2] = 255
+    if meteor:
+        x = 20 + 8 * (index % 30)
+        cv2.line(frame, (x, 150), (x + 15, 160), 255, 2)
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+
+def test_recurring_hot_pixels_are_suppressed_and_meteors_are_not() -> None:
+    # given
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 60, (240, 320), dtype=np.uint8), (0, 0), 5)
+    registry = MetricsRegistry()
+    suppression = SuppressionMap(metrics=CameraMetrics(camera_id="cam", registry=registry))
+    detector = FrameDiffDetector(bbox_threshold=4, suppression=suppression)
+
+    # when
+    detections = [len(detector.update(_frame(background, index))) for index in range(260)]
+    meteor_detections = [
+        detector.update(_frame(background, index, meteor=True)) for index in range(260, 280)
+    ]
+
+    # then
+    assert max(detections[:10]) == len(HOT_PIXELS)
+    assert max(detections[-20:]) == 0
+    assert all(len(bboxes) == 1 for bboxes in meteor_detections[1:])
+    assert suppression.shape == (30, 40)
+    assert suppression.suppressed_cells > 0
+    assert suppression.suppressed_contour_share > 0.5
+    rendered = registry.render()
+    assert 'meteor_suppression_map_cells{camera="cam"} 1200' in rendered
+    assert 'meteor_suppressed_cells{camera="cam"} 0' not in rendered
+
+
+def test_suppressed_cells_are_released_when_the_artefact_goes_away() -> None:
+    # given
+    suppression = SuppressionMap(update_every_n_frames=5, decay=0.9)
+    mask = np.zeros((64, 64), dtype=np.uint8)
+    mask[10:12, 10:12] = 255
+    for _ in range(100):
+        suppression.apply(mask.copy())
+    suppressed_while_active = suppression.suppressed_cells
+
+    # when
+    mask[:] = 0
+    for _ in range(100):
+        suppression.apply(mask.copy())
+
+    # then
+    assert suppressed_while_active == 1
+    assert suppression.suppressed_cells == 0
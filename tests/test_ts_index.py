@@ -0,0 +1,94 @@
+from pathlib import Path
+
+from src.file_operations.ts_index import Clock, DvrIndex, scan_keyframes, SegmentIndex, TS_PACKET_SIZE
+
+VIDEO_PID = 0x100
+FRAME_PACKETS = 3
+
+
+def _packet(pid: int, payload_unit_start: bool = False, random_access: bool = False, payload: bytes = b"") -> bytes:
+    header = bytes([0x47, (0x40 if payload_unit_start else 0) | (pid >> 8), pid & 0xFF])
+    if random_access:
+        # adaptation field with the random access indicator followed by payload
+        header += bytes([0x30, 1, 0x40])
+    else:
+        header += bytes([0x10])
+    return (header + payload).ljust(TS_PACKET_SIZE, b"\xff")
+
+
+def _pes_header(pts: int) -> bytes:
+    return bytes([
+        0, 0, 1, 0xE0, 0, 0, 0x80, 0x80, 5,
+        0x21 | ((pts >> 29) & 0x0E), (pts >> 22) & 0xFF, 0x01 | ((pts >> 14) & 0xFE), (pts >> 7) & 0xFF,
+        0x01 | ((pts << 1) & 0xFE),
+    ])
+
+
+def _segment(path: Path, first_frame: int, frames: int, gop: int) -> Path:
+    """ 25 fps segment starting with a PAT packet, key frame every `gop` frames """
+    data = _packet(0, payload_unit_start=True)
+    for frame in range(first_frame, first_frame + frames):
+        pts = frame * 3600
+        data += _packet(VIDEO_PID, True, random_access=frame % gop == 0, payload=_pes_header(pts))
+        data += b"".join(_packet(VIDEO_PID) for _ in range(FRAME_PACKETS - 1))
+    path.write_bytes(data)
+    return path
+
+
+def _frame_offset(frame_in_segment: int) -> int:
+    return TS_PACKET_SIZE * (1 + FRAME_PACKETS * frame_in_segment)
+
+
+def test_keyframes_are_found_with_pts(tmp_path) -> None:
+    # given
+    data = _segment(tmp_path / "segment.ts", first_frame=0, frames=50, gop=25).read_bytes()
+
+    # when
+    keyframes = scan_keyframes(data)
+
+    # then
+    assert [(keyframe.offset, keyframe.pts) for keyframe in keyframes] == [
+        (_frame_offset(0), 0), (_frame_offset(25), 25 * 3600)
+    ]
+
+
+def test_clip_is_cut_at_keyframes_across_segments(tmp_path) -> None:
+    # given
+    index = DvrIndex(directory=tmp_path / "segments", budget_bytes=10 ** 9)
+    for number in range(3):
+        path = _segment(tmp_path / "segments" / f"segment-{number}.ts", first_frame=number * 50, frames=50, gop=25)
+        index.add(SegmentIndex.build(
+            path, run_id="run", start_running_time=number * 2 * 10 ** 9,
+            end_running_time=(number + 1) * 2 * 10 ** 9, start_epoch=1000.0 + number * 2
+        ))
+
+    # when
+    # 1.5 s - 2.5 s: from the key frame at 1 s in the first segment up to the key frame at 3 s in the second
+    extracted = index.extract_clip(1.5e9, 2.5e9, tmp_path / "clip.ts", Clock.RUNNING_TIME, run_id="run")
+    clip = (tmp_path / "clip.ts").read_bytes()
+
+    # then
+    assert extracted
+    first = (tmp_path / "segments" / "segment-0.ts").read_bytes()
+    second = (tmp_path / "segments" / "segment-1.ts").read_bytes()
+    assert clip == first[:TS_PACKET_SIZE] + first[_frame_offset(25):] + second[:_frame_offset(25)]
+    assert index.covers(6e9, Clock.RUNNING_TIME, "run")
+    assert not index.covers(7e9, Clock.RUNNING_TIME, "run")
+
+
+def test_oldest_segments_are_evicted_and_index_reloaded(tmp_path) -> None:
+    # given
+    directory = tmp_path / "segments"
+    segment_size = _frame_offset(50)
+    index = DvrIndex(directory=directory, budget_bytes=2 * segment_size)
+
+    # when
+    for number in range(4):
+        path = _segment(directory / f"segment-{number}.ts", first_frame=number * 50, frames=50, gop=25)
+        index.add(SegmentIndex.build(path, "run", number, number + 1, start_epoch=float(number)))
+    reloaded = DvrIndex(directory=directory, budget_bytes=2 * segment_size)
+
+    # then
+    assert [segment.path.name for segment in index.segments] == ["segment-2.ts", "segment-3.ts"]
+    assert not (directory / "segment-0.ts").exists()
+    assert [segment.path.name for segment in reloaded.segments] == ["segment-2.ts", "segment-3.ts"]